@@ -0,0 +1,285 @@
+import sys
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+from mongo_db.mongodb_connection import CollectionType, MongoDBConnection
+from mongo_db_search.prefetch import grid_size
+from mongo_db_search.search import SearchQuery, Searcher
+from benchmarks.synthetic import EVENT_DURATION, SyntheticDataset
+
+FEATURES = {
+    CollectionType.IR_DATA: ["ir_front_left", "ir_front_right", "timestamp"],
+    CollectionType.MPU_DATA: ["gyro_z_angle", "acc_x_axis", "timestamp"],
+    CollectionType.SYSTEM_DATA: ["motor_speed_left", "motor_speed_right", "timestamp"],
+}
+
+# SearchQuery arguments of every engine, as function of the resolution and result size
+ENGINES = {
+    "fetch": lambda resolution, size: {"prefetch": False},
+    "prefetch": lambda resolution, size: {"prefetch": True},
+    "no-pruning": lambda resolution, size: {"prefetch": True, "prune": False},
+    "window": lambda resolution, size: {"prefetch": True, "window": 5},
+    "prefilter": lambda resolution, size: {"prefetch": True, "prefilter": 4 * size},
+    "coarse": lambda resolution, size: {
+        "prefetch": True,
+        "coarse_resolution": 4 * resolution,
+    },
+    "sessions": lambda resolution, size: {"prefetch": True, "sessions": "all"},
+    "mass": lambda resolution, size: {"mode": "mass"},
+    "spring": lambda resolution, size: {"mode": "spring"},
+}
+
+# "fetch" sends one request per window and is only useful for short ranges
+DEFAULT_ENGINES = [engine for engine in ENGINES if engine != "fetch"]
+
+# a result finds an event, if it starts at most this far from the event
+RECALL_TOLERANCE = EVENT_DURATION / 4
+
+
+def in_memory_connection() -> MongoDBConnection:
+    """Creates a connection to an empty in-memory database (needs mongomock)
+
+    :raises exception: raise exception when mongomock is not installed
+    :return: the connection
+    :rtype: MongoDBConnection
+    """
+    try:
+        import mongomock
+    except ImportError:
+        raise Exception(
+            "mongomock is not installed, install it or benchmark a local mongoDB (--uri)"
+        )
+    client = mongomock.MongoClient()
+    for c_type in CollectionType:
+        client.zumi.create_collection(c_type.value)
+    return MongoDBConnection(None, client)
+
+
+def _overlaps(start: datetime, end: datetime, window: tuple) -> bool:
+    return start < window[1] and window[0] < end
+
+
+def recall(results: list, events: list, query: tuple = None) -> float:
+    """Fraction of the events found by the results, see RECALL_TOLERANCE
+
+    The query is taken from the data, it always finds itself. The window of the
+    query is neither an event to find nor a result: the results overlapping it are
+    dropped and only the len(events) best remaining results count.
+
+    :param results: list of SearchResult objects sorted by distance
+    :type results: list
+    :param events: list of event start times, without the query
+    :type events: list
+    :param query: (start, end) of the window the query was taken from, defaults to None
+    :type query: tuple, optional
+    :return: recall between 0 and 1, 1 if there are no events
+    :rtype: float
+    """
+    if len(events) == 0:
+        return 1.0
+    if query is not None:
+        results = [
+            result
+            for result in results
+            if not _overlaps(result.start, result.end, query)
+        ]
+    results = results[: len(events)]
+    found = [
+        event
+        for event in events
+        if any(abs(result.start - event) <= RECALL_TOLERANCE for result in results)
+    ]
+    return len(found) / len(events)
+
+
+def run_benchmarks(
+    connection: MongoDBConnection,
+    dataset: SyntheticDataset,
+    engines: list = None,
+    resolutions: list = None,
+    steps: list = None,
+    ranges: list = None,
+    repeats: int = 3,
+) -> list:
+    """Searches the first event of a dataset with every combination of the parameters
+
+    The search range starts at the start of the dataset, the result size is the number
+    of events in the range and overlapping results are suppressed, so that the recall
+    measures how many of the other events are found (see recall, the first event is
+    the query). Every configuration is searched repeats times
+    with Searcher.explain, the latency is the median of the repeats.
+
+    :param connection: connection to the mongoDB containing the dataset
+    :type connection: MongoDBConnection
+    :param dataset: the loaded dataset
+    :type dataset: SyntheticDataset
+    :param engines: names of ENGINES, defaults to DEFAULT_ENGINES
+    :type engines: list, optional
+    :param resolutions: list of timedelta interpolation resolutions, defaults to 1s
+    :type resolutions: list, optional
+    :param steps: list of steps (None is the default step of SearchQuery),
+    defaults to [1, None]
+    :type steps: list, optional
+    :param ranges: list of timedelta lengths of the search range, defaults to the
+    whole dataset
+    :type ranges: list, optional
+    :param repeats: number of measurements per configuration, defaults to 3
+    :type repeats: int, optional
+    :return: list of dicts, one per configuration
+    :rtype: list
+    """
+    engines = DEFAULT_ENGINES if engines is None else engines
+    resolutions = [timedelta(seconds=1)] if resolutions is None else resolutions
+    steps = [1, None] if steps is None else steps
+    ranges = [dataset.end - dataset.start] if ranges is None else ranges
+    query = dataset.query(connection, FEATURES)
+    # the query is the first event, it is found by every engine and does not count
+    query_window = (dataset.events[0], dataset.events[0] + EVENT_DURATION)
+    searcher = Searcher(connection)
+    results = []
+    for length in ranges:
+        end = min(dataset.start + length, dataset.end)
+        events = [
+            event
+            for event in dataset.events
+            if event + EVENT_DURATION <= end
+            and not _overlaps(event, event + EVENT_DURATION, query_window)
+        ]
+        # one more result for the query itself
+        size = len(events) + 1
+        for resolution in resolutions:
+            for step in steps:
+                for engine in engines:
+                    search_query = SearchQuery(
+                        query,
+                        dataset.start,
+                        end,
+                        resolution,
+                        step,
+                        size,
+                        suppress_overlap=True,
+                        **ENGINES[engine](resolution, size)
+                    )
+                    profiles = [searcher.explain(search_query) for _ in range(repeats)]
+                    latency = statistics.median(p.total_seconds for p in profiles)
+                    profile = profiles[-1]
+                    result = {
+                        "engine": engine,
+                        "resolution_seconds": resolution.total_seconds(),
+                        "step": step,
+                        "range_seconds": (end - dataset.start).total_seconds(),
+                        "events": len(events),
+                        "latency_seconds": latency,
+                        "min_latency_seconds": min(p.total_seconds for p in profiles),
+                        "rows_per_second": grid_size(dataset.start, end, resolution)
+                        / latency,
+                        "recall": recall(profile.results, events, query_window),
+                        "profile": profile.report(),
+                    }
+                    print(
+                        "{engine:>10} resolution {resolution_seconds}s step {step} "
+                        "range {range_seconds:.0f}s: {latency_seconds:.3f}s, "
+                        "recall {recall:.2f}".format(**result)
+                    )
+                    results.append(result)
+    return results
+
+
+def _commit() -> str:
+    """Returns the checked out git commit or None"""
+    try:
+        return (
+            subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=SCRIPT_DIR,
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout.strip()
+            or None
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the search on synthetic sensor data"
+    )
+    parser.add_argument(
+        "--uri", help="mongoDB uri, defaults to an in-memory database (mongomock)"
+    )
+    parser.add_argument("--sessions", type=int, default=2)
+    parser.add_argument("--minutes", type=float, default=15, help="per session")
+    parser.add_argument("--events", type=int, default=3, help="per session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--engines", nargs="+", choices=list(ENGINES), default=DEFAULT_ENGINES
+    )
+    parser.add_argument(
+        "--resolutions", nargs="+", type=float, default=[1.0], help="in seconds"
+    )
+    parser.add_argument(
+        "--steps", nargs="+", default=["1", "auto"], help='"auto": 1/3 of the query'
+    )
+    parser.add_argument(
+        "--ranges",
+        nargs="+",
+        type=float,
+        default=None,
+        help="lengths of the search range in minutes, defaults to the whole dataset",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    connection = (
+        in_memory_connection() if args.uri is None else MongoDBConnection(args.uri)
+    )
+    dataset = SyntheticDataset(args.sessions, args.minutes, args.events, args.seed)
+    print(str(dataset.load(connection)) + " measurements written")
+    results = run_benchmarks(
+        connection,
+        dataset,
+        args.engines,
+        [timedelta(seconds=seconds) for seconds in args.resolutions],
+        [None if step == "auto" else int(step) for step in args.steps],
+        (
+            None
+            if args.ranges is None
+            else [timedelta(minutes=minutes) for minutes in args.ranges]
+        ),
+        args.repeats,
+    )
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "created": datetime.now().isoformat(),
+                "commit": _commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "database": "in-memory" if args.uri is None else "mongodb",
+                "dataset": {
+                    "sessions": args.sessions,
+                    "minutes": args.minutes,
+                    "events": args.events,
+                    "seed": args.seed,
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print("Results written to " + args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import sys
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+import math
+import random
+from datetime import datetime, timedelta
+from mongo_db.mongodb_connection import CollectionType, MongoDBConnection
+
+# sampling intervals of load_default_session (data_monitor.zumi_data_monitor),
+# camera images are not searched and therefore not generated
+RATES = {
+    CollectionType.SYSTEM_DATA: timedelta(seconds=2),
+    CollectionType.IR_DATA: timedelta(seconds=0.5),
+    CollectionType.MPU_DATA: timedelta(seconds=0.1),
+}
+
+# maximal delay of a measurement after its sampling time, the recording threads
+# of a RecordingSession do not sample exactly at their frequency
+JITTER = 0.1
+
+EVENT_DURATION = timedelta(seconds=20)
+
+
+class SyntheticDataset:
+    """Reproducible sessions of synthetic Zumi sensor data with known events
+
+    The sensors are sampled at the rates of load_default_session. Between the events
+    the values are random walks in the ranges of the data classes (data_monitor.data_classes).
+    An event is an obstacle maneuver: the front infrared values drop, the Zumi stops,
+    turns by 90 degrees (gyro_z_angle) and drives on. Every event is the same pattern
+    with new noise, so a search for one event should find all of them.
+    """
+
+    def __init__(
+        self,
+        sessions: int = 2,
+        minutes: float = 15,
+        events: int = 3,
+        seed: int = 0,
+        start: datetime = datetime(2021, 11, 27, 19, 0),
+    ):
+        """Describes the dataset, the data is generated by the generate method
+
+        :param sessions: number of sessions, defaults to 2
+        :type sessions: int, optional
+        :param minutes: duration of a session, defaults to 15
+        :type minutes: float, optional
+        :param events: number of events per session, evenly spread, defaults to 3
+        :type events: int, optional
+        :param seed: seed of the random values, the same seed generates the same data,
+        defaults to 0
+        :type seed: int, optional
+        :param start: start of the first session, the sessions follow each other with
+        one minute without data, defaults to 2021-11-27 19:00
+        :type start: datetime, optional
+        :raises exception: raise exception when the events do not fit into a session
+        """
+        self.duration = timedelta(minutes=minutes)
+        if (events + 1) * EVENT_DURATION * 2 > self.duration:
+            raise Exception("The events do not fit into a session")
+        self.seed = seed
+        self.session_ids = [
+            "benchmark-{}-{}".format(seed, number) for number in range(sessions)
+        ]
+        self.session_starts = [
+            start + number * (self.duration + timedelta(minutes=1))
+            for number in range(sessions)
+        ]
+        # the events start on full seconds, so that they lie on the grid of the searches
+        self.events = []
+        for session_start in self.session_starts:
+            gap = self.duration / (events + 1)
+            for number in range(1, events + 1):
+                self.events.append(
+                    session_start
+                    + timedelta(seconds=int((gap * number).total_seconds()))
+                )
+
+    @property
+    def start(self) -> datetime:
+        return self.session_starts[0]
+
+    @property
+    def end(self) -> datetime:
+        return self.session_starts[-1] + self.duration
+
+    def generate(self, session: int) -> dict:
+        """Generates the measurements of a session
+
+        :param session: number of the session
+        :type session: int
+        :return: dict<CollectionType, list of measurement dicts>
+        :rtype: dict
+        """
+        rnd = random.Random("{}-{}".format(self.seed, session))
+        session_id = self.session_ids[session]
+        session_start = self.session_starts[session]
+        events = [
+            event
+            for event in self.events
+            if session_start <= event < session_start + self.duration
+        ]
+        data = {}
+        for c_type, rate in RATES.items():
+            state = _initial_state(c_type, rnd)
+            measurements = []
+            for number in range(int(self.duration / rate)):
+                time = session_start + number * rate
+                state = _random_walk(c_type, state, rnd)
+                values = dict(state)
+                for event in events:
+                    if event <= time < event + EVENT_DURATION:
+                        values.update(_event_values(c_type, time - event, state, rnd))
+                measurement = {
+                    "timestamp": time
+                    + timedelta(seconds=rnd.random() * JITTER * rate.total_seconds()),
+                    "session_id": session_id,
+                }
+                measurement.update(_round(c_type, values))
+                measurements.append(measurement)
+            data[c_type] = measurements
+        return data
+
+    def load(self, connection: MongoDBConnection) -> int:
+        """Writes the sessions to the mongoDB, sessions that already exist are kept
+
+        :param connection: connection to the mongoDB
+        :type connection: MongoDBConnection
+        :return: number of written measurements
+        :rtype: int
+        """
+        count = 0
+        sessions = connection.get_collection_by_type(CollectionType.SESSION_DATA)
+        for number, session_id in enumerate(self.session_ids):
+            if session_id in connection.get_session_ids():
+                continue
+            for c_type, measurements in self.generate(number).items():
+                collection = connection.get_collection_by_type(c_type)
+                # measurements of an interrupted load
+                collection.collection.delete_many({"session_id": session_id})
+                collection.write_many(measurements)
+                count += len(measurements)
+            # the session document is written last, it marks a complete session
+            sessions.write_one(
+                {
+                    "session_id": session_id,
+                    "session_name": "benchmark",
+                    "sensor_config": [],
+                }
+            )
+        return count
+
+    def query(self, connection: MongoDBConnection, features: dict) -> dict:
+        """Fetches the first event as query
+
+        :param connection: connection to the mongoDB
+        :type connection: MongoDBConnection
+        :param features: dict<CollectionType, list of features>, see
+        SearchQuery.selected_features
+        :type features: dict
+        :return: dict<CollectionType, list[Dict]>, the data_to_search of a SearchQuery
+        :rtype: dict
+        """
+        return connection.get_numeric_sensor_data_by_time(
+            self.events[0],
+            self.events[0] + EVENT_DURATION,
+            features,
+            self.session_ids[0],
+        )
+
+
+def _initial_state(c_type: CollectionType, rnd: random.Random) -> dict:
+    if c_type == CollectionType.IR_DATA:
+        return {
+            "ir_" + sensor: rnd.uniform(150, 250)
+            for sensor in (
+                "front_right",
+                "bottom_right",
+                "back_right",
+                "bottom_left",
+                "back_left",
+                "front_left",
+            )
+        }
+    if c_type == CollectionType.MPU_DATA:
+        state = {
+            "gyro_" + axis + "_angle": rnd.uniform(0, 360) for axis in ("x", "y", "z")
+        }
+        state.update({"acc_" + axis + "_axis": 1.0 for axis in ("x", "y", "z")})
+        return state
+    return {
+        "cpu_utilization": rnd.uniform(10, 30),
+        "ram_utilization": rnd.uniform(150, 250),
+        "motor_speed_right": 40.0,
+        "motor_speed_left": 40.0,
+    }
+
+
+def _random_walk(c_type: CollectionType, state: dict, rnd: random.Random) -> dict:
+    if c_type == CollectionType.IR_DATA:
+        return {
+            name: min(max(value + rnd.gauss(0, 3), 100), 255)
+            for name, value in state.items()
+        }
+    if c_type == CollectionType.MPU_DATA:
+        return {
+            name: (
+                (value + rnd.gauss(0, 0.5)) % 360
+                if name.startswith("gyro")
+                else min(max(value + rnd.gauss(0, 0.05), 0), 5)
+            )
+            for name, value in state.items()
+        }
+    return {
+        "cpu_utilization": min(max(state["cpu_utilization"] + rnd.gauss(0, 1), 0), 100),
+        "ram_utilization": min(max(state["ram_utilization"] + rnd.gauss(0, 2), 0), 512),
+        "motor_speed_right": 40.0,
+        "motor_speed_left": 40.0,
+    }
+
+
+def _event_values(
+    c_type: CollectionType, offset: timedelta, state: dict, rnd: random.Random
+) -> dict:
+    """The values of an obstacle maneuver at an offset from its start, with noise"""
+    # 0: obstacle appears, 0.25: stop, 0.25 - 0.75: turn, 0.75 - 1: drive on
+    phase = offset / EVENT_DURATION
+    closeness = math.sin(math.pi * min(phase / 0.5, 1.0)) if phase < 0.75 else 0.0
+    turn = min(max((phase - 0.25) / 0.5, 0.0), 1.0)
+    if c_type == CollectionType.IR_DATA:
+        return {
+            "ir_front_right": 200 - 170 * closeness + rnd.gauss(0, 3),
+            "ir_front_left": 200 - 160 * closeness + rnd.gauss(0, 3),
+        }
+    if c_type == CollectionType.MPU_DATA:
+        return {
+            "gyro_z_angle": 90 * turn + rnd.gauss(0, 0.5),
+            "acc_x_axis": 1 + 2 * closeness + rnd.gauss(0, 0.05),
+        }
+    speed = 0.0 if 0.25 <= phase < 0.75 else 40.0
+    return {"motor_speed_right": speed, "motor_speed_left": speed}
+
+
+def _round(c_type: CollectionType, values: dict) -> dict:
+    """Rounds the values to the types of the data classes"""
+    if c_type == CollectionType.MPU_DATA:
+        return {
+            name: round(value, 2) if name.startswith("gyro") else int(round(value))
+            for name, value in values.items()
+        }
+    return {name: int(round(value)) for name, value in values.items()}
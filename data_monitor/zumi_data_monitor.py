@@ -139,7 +139,14 @@ def start_random_walk(
 
 
 def save_logs_to_database(
-    config_path: str = None, log_path: str = None, mongodb_uri: str = None
+    config_path: str = None,
+    log_path: str = None,
+    mongodb_uri: str = None,
+    standing_queries: bool = False,
+    sax_index: str = None,
+    feature_store: str = None,
+    workers: int = None,
+    manifest: bool = True,
 ) -> None:
     """Save the Zumi logs to a mongodb database
 
@@ -147,6 +154,20 @@ def save_logs_to_database(
     :type mongodb_uri: str
     :param log_path: path where to read the log files from
     :type log_path: str
+    :param standing_queries: evaluate the standing queries on the saved data, defaults to False
+    :type standing_queries: bool, optional
+    :param sax_index: path of a SaxIndex file, which is updated with the saved data,
+    defaults to None
+    :type sax_index: str, optional
+    :param feature_store: directory of a FeatureStore, which is updated with the saved
+    data, defaults to None
+    :type feature_store: str, optional
+    :param workers: number of threads transferring the log files, defaults to None
+    (see mongo_db.save_in_mongodb.transfer_json_files)
+    :type workers: int, optional
+    :param manifest: skip the log files that were already transferred and did not
+    change, see mongo_db.save_in_mongodb.IngestManifest, defaults to True
+    :type manifest: bool, optional
     """
     if config_path is not None:
         with open(config_path, "r") as ymlfile:
@@ -155,9 +176,31 @@ def save_logs_to_database(
         log_path = cfg["logs"]["path"]
     logging.debug("mongodb_uri: {}, log_path: {}".format(mongodb_uri, log_path))
     connection = MongoDBConnection(mongodb_uri)
-    collections = connection.get_all_collections()
-    for ctype in collections:
-        transfer_all_json_files(connection, ctype, log_path)
+    stats = transfer_json_files(
+        connection,
+        log_path,
+        workers=workers,
+        manifest=IngestManifest(connection) if manifest else None,
+    )
+    logging.info(str(stats))
+    if sax_index is not None:
+        from mongo_db_search.sax_index import SaxIndex
+
+        index = SaxIndex(sax_index)
+        count = index.update(connection)
+        index.close()
+        logging.info("{} new windows in the SAX index".format(count))
+    if feature_store is not None:
+        from mongo_db_search.feature_store import FeatureStore
+
+        count = FeatureStore(feature_store).update(connection)
+        logging.info("{} feature matrices written".format(count))
+    if standing_queries:
+        # the search dependencies are only needed, if standing queries are evaluated
+        from mongo_db_search.standing import StandingQueries
+
+        count = StandingQueries(connection).evaluate()
+        logging.info("{} new matches of standing queries".format(count))
     connection.close()
 
 
@@ -1,6 +1,35 @@
-from datetime import datetime
+import math
+from datetime import datetime, timedelta
+from typing import Generator
+import numpy as np
+from bson import decode_all
+from bson.codec_options import CodecOptions
 from pymongo.collection import Collection
-from pymongo import ASCENDING
+from pymongo import ASCENDING, DESCENDING
+
+# number of documents per request of the "stream" and "columns" modes
+BATCH_SIZE = 10000
+
+try:
+    from bson.codec_options import DatetimeConversion
+
+    # decodes dates as milliseconds since the epoch instead of datetime objects
+    _RAW_OPTIONS = CodecOptions(datetime_conversion=DatetimeConversion.DATETIME_MS)
+except ImportError:
+    # pymongo < 4.3 decodes dates as datetime objects, _column converts them
+    _RAW_OPTIONS = CodecOptions()
+
+# aggregations of resampled_by_time, as accumulator of the $group stage
+AGGREGATIONS = {"mean": "$avg", "min": "$min", "max": "$max", "last": "$last"}
+
+# first server version with the $densify and $fill stages
+SERVER_RESAMPLING_VERSION = (5, 3)
+
+# collection recording the time ranges of every write to a time series
+INGEST_LOG = "ingest_log"
+
+MILLISECOND = timedelta(milliseconds=1)
+MICROSECOND = timedelta(microseconds=1)
 
 
 class MongoCollectionWrapper:
@@ -19,15 +48,21 @@ class MongoCollectionWrapper:
         """
         return self.collection.insert_one(data).inserted_id is not None
 
-    def write_many(self, data: list) -> bool:
+    def write_many(self, data: list, ordered: bool = True) -> bool:
         """Write many objects to the zumi database
 
         :param data: a list of zumi data dicts
         :type data: list
+        :param ordered: stop at the first failed object, false writes the other objects
+        anyway (and faster), the failed objects are reported by the raised
+        pymongo.errors.BulkWriteError, defaults to True
+        :type ordered: bool, optional
         :return: true if transmission was successful, else false
         :rtype: bool
         """
-        return len(self.collection.insert_many(data).inserted_ids) == len(data)
+        return len(
+            self.collection.insert_many(data, ordered=ordered).inserted_ids
+        ) == len(data)
 
 
 class MongoDBTimeSeriesData(MongoCollectionWrapper):
@@ -35,6 +70,65 @@ class MongoDBTimeSeriesData(MongoCollectionWrapper):
 
     def __init__(self, collection: Collection):
         super().__init__(collection)
+        self.__server_resampling = None
+        self.ingest_log = collection.database[INGEST_LOG]
+        self.ingest_log.create_index(
+            [("collection", ASCENDING), ("ingested", ASCENDING)]
+        )
+
+    def write_one(self, data: dict) -> bool:
+        """Write one object to the zumi database and record it in the ingest log,
+        see MongoCollectionWrapper.write_one and ingested_since
+        """
+        try:
+            return super().write_one(data)
+        finally:
+            self.__log_ingest([data])
+
+    def write_many(self, data: list, ordered: bool = True) -> bool:
+        """Write many objects to the zumi database and record them in the ingest log,
+        see MongoCollectionWrapper.write_many and ingested_since
+        """
+        try:
+            return super().write_many(data, ordered)
+        finally:
+            self.__log_ingest(data)
+
+    def __log_ingest(self, data: list) -> None:
+        """Records the time range of the written measurements per session in the ingest log
+
+        The range is also recorded if the write failed (partially), a range without
+        new measurements is only searched once more.
+
+        :param data: the written measurement dicts
+        :type data: list
+        """
+        ingested = datetime.utcnow()
+        sessions = {}
+        for d in data:
+            if "timestamp" not in d:
+                continue
+            session = sessions.setdefault(
+                d.get("session_id"), [d["timestamp"], d["timestamp"], 0]
+            )
+            session[0] = min(session[0], d["timestamp"])
+            session[1] = max(session[1], d["timestamp"])
+            session[2] += 1
+        if len(sessions) == 0:
+            return
+        self.ingest_log.insert_many(
+            [
+                {
+                    "collection": self.collection.name,
+                    "session_id": session_id,
+                    "first": first,
+                    "last": last,
+                    "count": count,
+                    "ingested": ingested,
+                }
+                for session_id, (first, last, count) in sessions.items()
+            ]
+        )
 
     def data_by_timestamp(self, timestamp: datetime) -> dict:
         """Get all sensor data from the time series for a specific timestamp
@@ -50,6 +144,24 @@ class MongoDBTimeSeriesData(MongoCollectionWrapper):
             }
         )
 
+    def existing_timestamps(self, timestamps: list) -> set:
+        """Find which timestamps are already stored in the time series, with one query
+
+        :param timestamps: list of python datetime objects
+        :type timestamps: list
+        :return: set of the stored timestamps
+        :rtype: set
+        """
+        if len(timestamps) == 0:
+            return set()
+        return {
+            doc["timestamp"]
+            for doc in self.collection.find(
+                {"timestamp": {"$in": list(timestamps)}},
+                {"timestamp": True, "_id": False},
+            )
+        }
+
     def count_by_timestamp(self, timestamp: datetime) -> int:
         """Get the amount of documents stored in a time series for a specific timestamp
 
@@ -64,9 +176,177 @@ class MongoDBTimeSeriesData(MongoCollectionWrapper):
             }
         )
 
-    def sensor_data_by_time(
-        self, timestamp_start: datetime, timestamp_end: datetime, features: list
+    def session_id_by_time(
+        self, timestamp_start: datetime, timestamp_end: datetime
+    ) -> str:
+        """Get the session id of the first measurement between a start and end time
+
+        :param timestamp_start: starting time, a python datetime object
+        :type timestamp_start: datetime
+        :param timestamp_end: end time, a python datetime object
+        :type timestamp_end: datetime
+        :return: the session id or None if there is no measurement
+        :rtype: str
+        """
+        sd = self.collection.find_one(
+            {"timestamp": {"$gte": timestamp_start, "$lte": timestamp_end}},
+            {"session_id": True, "_id": False},
+            sort=[("timestamp", ASCENDING)],
+        )
+        return None if sd is None else sd.get("session_id")
+
+    def latest_timestamp(
+        self, timestamp_end: datetime = None, session_id: str = None
+    ) -> datetime:
+        """Get the timestamp of the latest measurement of the time series
+
+        :param timestamp_end: only measurements at or before this time, defaults to None
+        :type timestamp_end: datetime, optional
+        :param session_id: only measurements of this session, defaults to None
+        :type session_id: str, optional
+        :return: the latest timestamp or None if there is no measurement
+        :rtype: datetime
+        """
+        query = {}
+        if timestamp_end is not None:
+            query["timestamp"] = {"$lte": timestamp_end}
+        if session_id is not None:
+            query["session_id"] = session_id
+        latest = self.collection.find_one(
+            query, {"timestamp": True, "_id": False}, sort=[("timestamp", DESCENDING)]
+        )
+        return None if latest is None else latest["timestamp"]
+
+    def data_version(self, timestamp_start: datetime, timestamp_end: datetime) -> tuple:
+        """Get the number of documents and the latest timestamp between a start and end time,
+        which changes when new data is ingested into the range
+
+        :param timestamp_start: starting time, a python datetime object
+        :type timestamp_start: datetime
+        :param timestamp_end: end time, a python datetime object
+        :type timestamp_end: datetime
+        :return: tuple of the number of documents and the latest timestamp (None if empty)
+        :rtype: tuple
+        """
+        query = {"timestamp": {"$gte": timestamp_start, "$lte": timestamp_end}}
+        latest = self.collection.find_one(
+            query, {"timestamp": True, "_id": False}, sort=[("timestamp", DESCENDING)]
+        )
+        return (
+            self.collection.count_documents(query),
+            None if latest is None else latest["timestamp"],
+        )
+
+    def session_ids(
+        self, timestamp_start: datetime = None, timestamp_end: datetime = None
     ) -> list:
+        """Get the ids of all sessions with measurements in the time series
+
+        :param timestamp_start: only sessions with measurements after this time,
+        defaults to None
+        :type timestamp_start: datetime, optional
+        :param timestamp_end: only sessions with measurements before this time,
+        defaults to None
+        :type timestamp_end: datetime, optional
+        :return: list of session ids
+        :rtype: list
+        """
+        query = {}
+        if timestamp_start is not None:
+            query["$gte"] = timestamp_start
+        if timestamp_end is not None:
+            query["$lte"] = timestamp_end
+        return self.collection.distinct(
+            "session_id", {"timestamp": query} if query else {}
+        )
+
+    def session_extent(self, session_id: str) -> tuple:
+        """Get the timestamps of the first and the last measurement of a session
+
+        :param session_id: id of the session
+        :type session_id: str
+        :return: tuple of the first and the last timestamp or None if the session has
+        no measurements in the time series
+        :rtype: tuple
+        """
+        projection = {"timestamp": True, "_id": False}
+        first = self.collection.find_one(
+            {"session_id": session_id}, projection, sort=[("timestamp", ASCENDING)]
+        )
+        if first is None:
+            return None
+        last = self.collection.find_one(
+            {"session_id": session_id}, projection, sort=[("timestamp", DESCENDING)]
+        )
+        return first["timestamp"], last["timestamp"]
+
+    def ingested_since(
+        self, since: datetime = None, timestamp_start: datetime = None
+    ) -> list:
+        """Get the time ranges of the measurements inserted since a time, per session
+
+        The writes of write_one and write_many are recorded with their insertion time in
+        the indexed ingest log, so the costs are proportional to the writes since `since`,
+        not to the stored measurements. The insertion time does not depend on the
+        timestamps, so late uploads and old sessions are found as well.
+        Without `since` all stored measurements are scanned, including those written
+        before the ingest log existed.
+
+        :param since: insertion time (UTC), defaults to None (all measurements)
+        :type since: datetime, optional
+        :param timestamp_start: only measurements at or after this time, defaults to None
+        :type timestamp_start: datetime, optional
+        :return: list of (session id, first timestamp, last timestamp) tuples
+        :rtype: list
+        """
+        if since is not None:
+            query = {"collection": self.collection.name, "ingested": {"$gte": since}}
+            if timestamp_start is not None:
+                query["last"] = {"$gte": timestamp_start}
+            sessions = {}
+            for doc in self.ingest_log.find(query):
+                first = doc["first"]
+                if timestamp_start is not None:
+                    first = max(first, timestamp_start)
+                if doc["session_id"] in sessions:
+                    known = sessions[doc["session_id"]]
+                    first = min(first, known[0])
+                    last = max(doc["last"], known[1])
+                else:
+                    last = doc["last"]
+                sessions[doc["session_id"]] = (first, last)
+            return [
+                (session_id, first, last)
+                for session_id, (first, last) in sessions.items()
+            ]
+        query = {}
+        if timestamp_start is not None:
+            query["timestamp"] = {"$gte": timestamp_start}
+        return [
+            (doc["_id"], doc["first"], doc["last"])
+            for doc in self.collection.aggregate(
+                [
+                    {"$match": query},
+                    {
+                        "$group": {
+                            "_id": "$session_id",
+                            "first": {"$min": "$timestamp"},
+                            "last": {"$max": "$timestamp"},
+                        }
+                    },
+                ]
+            )
+        ]
+
+    def sensor_data_by_time(
+        self,
+        timestamp_start: datetime,
+        timestamp_end: datetime,
+        features: list,
+        session_id: str = None,
+        mode: str = "list",
+        batch_size: int = None,
+    ):
         """Get sensor data from the mongoDB collection between a start and end time, filtered for selected features
 
         :param timestamp_start: starting time, a python datetime object
@@ -75,17 +355,132 @@ class MongoDBTimeSeriesData(MongoCollectionWrapper):
         :type timestamp_end: datetime
         :param features: list of the features to filter
         :type features: list
-        :return: list of all matching data
-        :rtype: list
+        :param session_id: only data of this session, defaults to None (all sessions)
+        :type session_id: str, optional
+        :param mode: "list" returns a list of dicts, "stream" a generator of dicts which
+        fetches batch_size documents at a time, "columns" a dict<feature, np.array>
+        (see read_columns), defaults to "list"
+        :type mode: str, optional
+        :param batch_size: number of documents per request in the "stream" and
+        "columns" modes, defaults to None (BATCH_SIZE)
+        :type batch_size: int, optional
+        :return: all matching data sorted by time, see mode
+        :rtype: list | Generator | dict
         """
-        results = []
-        cursor = self.collection.find(
-            {"timestamp": {"$gte": timestamp_start, "$lte": timestamp_end}},
+        query = {"timestamp": {"$gte": timestamp_start, "$lte": timestamp_end}}
+        if session_id is not None:
+            query["session_id"] = session_id
+        return read(
+            self.collection,
+            query,
             {key: True for key in features} | {"_id": False},
-        ).sort("timestamp", ASCENDING)
-        for sd in cursor:
-            results.append(sd)
-        return results
+            [("timestamp", ASCENDING)],
+            mode,
+            batch_size,
+        )
+
+    def resampled_by_time(
+        self,
+        timestamp_start: datetime,
+        timestamp_end: datetime,
+        features: list,
+        resolution: timedelta,
+        aggregation: str = "mean",
+        session_id: str = None,
+        server: bool = None,
+    ) -> list:
+        """Get sensor data aggregated onto a time grid, with one document per grid point
+
+        The grid points are timestamp_start + k * resolution, every grid point aggregates
+        the measurements from its time until the next grid point, the measurements at or
+        after timestamp_end are excluded. Grid points without measurements are linearly
+        interpolated between their neighbors, grid points before the first or after the
+        last measurement of a feature have the value None. "last" holds the previous
+        value instead, also after the last measurement.
+        On a server with $densify and $fill (MongoDB 5.3) the documents are aggregated
+        by the server and only one document per grid point is transferred, otherwise
+        the measurements are fetched (columns mode) and aggregated with NumPy. Both
+        produce the same grid points, BSON dates limit them to whole milliseconds.
+
+        :param timestamp_start: first grid point, a python datetime object
+        :type timestamp_start: datetime
+        :param timestamp_end: end time, a python datetime object
+        :type timestamp_end: datetime
+        :param features: list of the numeric features, "timestamp" is ignored
+        :type features: list
+        :param resolution: distance between two grid points, whole milliseconds
+        :type resolution: timedelta
+        :param aggregation: one of AGGREGATIONS, defaults to "mean"
+        :type aggregation: str, optional
+        :param session_id: only data of this session, defaults to None (all sessions)
+        :type session_id: str, optional
+        :param server: True aggregates on the server, False on the client, defaults to
+        None (the server, if supported)
+        :type server: bool, optional
+        :raises exception: raise exception when the aggregation is unknown or the
+        resolution is not a positive number of milliseconds
+        :return: list of dicts with the timestamp and the features, sorted by time
+        :rtype: list
+        """
+        if aggregation not in AGGREGATIONS:
+            raise Exception("Unknown aggregation: " + str(aggregation))
+        if resolution < MILLISECOND or resolution % MILLISECOND:
+            raise Exception(
+                "The resolution has to be a positive number of milliseconds"
+            )
+        start = timestamp_start.replace(
+            microsecond=timestamp_start.microsecond // 1000 * 1000
+        )
+        features = [key for key in features if key != "timestamp"]
+        buckets = max(math.ceil((timestamp_end - start) / resolution), 0)
+        if buckets == 0:
+            return []
+        query = {"timestamp": {"$gte": start, "$lt": timestamp_end}}
+        if session_id is not None:
+            query["session_id"] = session_id
+        if server is None:
+            server = self.supports_server_resampling()
+        if server:
+            documents = {
+                d["timestamp"]: d
+                for d in self.collection.aggregate(
+                    _resampling_pipeline(
+                        query, features, start, resolution, buckets, aggregation
+                    )
+                )
+            }
+            # $densify creates no grid points if no measurement matches
+            return [
+                {"timestamp": start + k * resolution}
+                | {
+                    key: documents.get(start + k * resolution, {}).get(key)
+                    for key in features
+                }
+                for k in range(buckets)
+            ]
+        columns = read(
+            self.collection,
+            query,
+            {key: True for key in features} | {"timestamp": True, "_id": False},
+            [("timestamp", ASCENDING)],
+            "columns",
+        )
+        return _resample_columns(
+            columns, features, start, resolution, buckets, aggregation
+        )
+
+    def supports_server_resampling(self) -> bool:
+        """Checks once if the server supports the stages of resampled_by_time
+
+        :return: false for in-memory stand-ins (e.g. mongomock) and MongoDB before 5.3
+        :rtype: bool
+        """
+        if self.__server_resampling is None:
+            self.__server_resampling = isinstance(self.collection, Collection) and (
+                tuple(self.collection.database.client.server_info()["versionArray"][:2])
+                >= SERVER_RESAMPLING_VERSION
+            )
+        return self.__server_resampling
 
 
 class MongoDBSensorData(MongoDBTimeSeriesData):
@@ -94,7 +489,14 @@ class MongoDBSensorData(MongoDBTimeSeriesData):
     def __init__(self, collection: Collection):
         super().__init__(collection)
 
-    def sensor_data_by_event(self, sensor: str, ineqs: str, value: float) -> list:
+    def sensor_data_by_event(
+        self,
+        sensor: str,
+        ineqs: str,
+        value: float,
+        mode: str = "list",
+        batch_size: int = None,
+    ):
         """Get all sensor data based on the value of a specific sensor
 
         :param sensor: sensor name
@@ -103,14 +505,258 @@ class MongoDBSensorData(MongoDBTimeSeriesData):
         :type ineqs: Literal["<", ">"]
         :param value: value to compare against
         :type value: float
-        :return: list of sensor data dictionaries
-        :rtype: list
+        :param mode: "list", "stream" or "columns", see
+        MongoDBTimeSeriesData.sensor_data_by_time, defaults to "list"
+        :type mode: str, optional
+        :param batch_size: see MongoDBTimeSeriesData.sensor_data_by_time, defaults to None
+        :type batch_size: int, optional
+        :return: sensor data dictionaries, see mode
+        :rtype: list | Generator | dict
         """
-        results = []
         if ineqs == "<":
-            cursor = self.collection.find({sensor: {"$lt": value}})
+            query = {sensor: {"$lt": value}}
         elif ineqs == ">":
-            cursor = self.collection.find({sensor: {"$gt": value}})
-        for sd in cursor:
-            results.append(sd)
-        return results
+            query = {sensor: {"$gt": value}}
+        return read(self.collection, query, None, None, mode, batch_size)
+
+
+def read(
+    collection: Collection,
+    query: dict,
+    projection: dict = None,
+    sort: list = None,
+    mode: str = "list",
+    batch_size: int = None,
+):
+    """Runs a find query and returns the documents in one of the access modes
+
+    :param collection: the mongoDB collection
+    :type collection: Collection
+    :param query: filter of the find query
+    :type query: dict
+    :param projection: projection of the find query, defaults to None (all fields)
+    :type projection: dict, optional
+    :param sort: list of (key, direction) pairs, defaults to None
+    :type sort: list, optional
+    :param mode: "list", "stream" or "columns", defaults to "list"
+    :type mode: str, optional
+    :param batch_size: number of documents per request, defaults to None (BATCH_SIZE)
+    :type batch_size: int, optional
+    :raises exception: raise exception when the mode is unknown
+    :return: list of dicts, generator of dicts or dict<feature, np.array>
+    :rtype: list | Generator | dict
+    """
+    batch_size = BATCH_SIZE if batch_size is None else batch_size
+    if mode == "list":
+        return list(collection.find(query, projection, sort=sort))
+    if mode == "stream":
+        cursor = collection.find(query, projection, sort=sort, batch_size=batch_size)
+        return (document for document in cursor)
+    if mode == "columns":
+        return read_columns(collection, query, projection, sort, batch_size)
+    raise Exception("Unknown mode: " + str(mode))
+
+
+def read_columns(
+    collection: Collection,
+    query: dict,
+    projection: dict = None,
+    sort: list = None,
+    batch_size: int = BATCH_SIZE,
+) -> dict:
+    """Runs a find query and decodes the documents into one NumPy array per feature
+
+    The documents are fetched as raw BSON batches and decoded batch by batch, the
+    dates as integers, so that only one batch of dicts exists at a time. Collections
+    that do not support raw batches (e.g. mongomock) are read with a normal cursor.
+    The features are the fields of the first document. Dates become int64 nanoseconds
+    since the epoch, numbers float64 (nan if the field is missing), other values object
+    arrays.
+
+    :param collection: the mongoDB collection
+    :type collection: Collection
+    :param query: filter of the find query
+    :type query: dict
+    :param projection: projection of the find query, defaults to None (all fields)
+    :type projection: dict, optional
+    :param sort: list of (key, direction) pairs, defaults to None
+    :type sort: list, optional
+    :param batch_size: number of documents per request, defaults to BATCH_SIZE
+    :type batch_size: int, optional
+    :return: dict<feature, np.array>, empty if no document matches
+    :rtype: dict
+    """
+    parts = {}
+    for batch in _document_batches(collection, query, projection, sort, batch_size):
+        if len(parts) == 0:
+            parts = {key: [] for key in batch[0]}
+        for key in parts:
+            parts[key].append(_column([d.get(key) for d in batch]))
+    return {
+        key: np.concatenate(arrays) if len(arrays) > 1 else arrays[0]
+        for key, arrays in parts.items()
+    }
+
+
+def _document_batches(
+    collection: Collection,
+    query: dict,
+    projection: dict,
+    sort: list,
+    batch_size: int,
+) -> Generator:
+    """Yields lists of at most batch_size decoded documents, see read_columns"""
+    try:
+        raw_batches = collection.find_raw_batches(
+            query, projection, sort=sort, batch_size=batch_size
+        )
+        for raw_batch in raw_batches:
+            yield decode_all(raw_batch, _RAW_OPTIONS)
+        return
+    except NotImplementedError:
+        pass
+    batch = []
+    for document in collection.find(
+        query, projection, sort=sort, batch_size=batch_size
+    ):
+        batch.append(document)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def _column(values: list) -> np.array:
+    """Converts the values of one feature of a batch to an array, see read_columns"""
+    first = next((v for v in values if v is not None), None)
+    if isinstance(first, datetime):
+        return np.array(values, dtype="datetime64[ns]").astype(np.int64)
+    if hasattr(first, "as_datetime"):
+        # DatetimeMS
+        return np.array([int(v) for v in values], dtype=np.int64) * 1000000
+    if isinstance(first, (int, float)) and not isinstance(first, bool):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array(values, dtype=object)
+
+
+def _resampling_pipeline(
+    query: dict,
+    features: list,
+    start: datetime,
+    resolution: timedelta,
+    buckets: int,
+    aggregation: str,
+) -> list:
+    """Aggregation pipeline of resampled_by_time on the server"""
+    step = resolution // MILLISECOND
+    bucket = {
+        "$add": [
+            start,
+            {
+                "$multiply": [
+                    {
+                        "$floor": {
+                            "$divide": [{"$subtract": ["$timestamp", start]}, step]
+                        }
+                    },
+                    step,
+                ]
+            },
+        ]
+    }
+    # $last needs the measurements of a group in time order
+    pipeline = [{"$match": query}, {"$sort": {"timestamp": 1}}]
+    pipeline.append(
+        {
+            "$group": {"_id": bucket}
+            | {key: {AGGREGATIONS[aggregation]: "$" + key} for key in features}
+        }
+    )
+    pipeline.append(
+        {
+            "$project": {"_id": False, "timestamp": "$_id"}
+            | {key: True for key in features}
+        }
+    )
+    pipeline.append(
+        {
+            "$densify": {
+                "field": "timestamp",
+                "range": {
+                    "step": step,
+                    "unit": "millisecond",
+                    "bounds": [start, start + buckets * resolution],
+                },
+            }
+        }
+    )
+    method = "locf" if aggregation == "last" else "linear"
+    pipeline.append(
+        {
+            "$fill": {
+                "sortBy": {"timestamp": 1},
+                "output": {key: {"method": method} for key in features},
+            }
+        }
+    )
+    pipeline.append({"$sort": {"timestamp": 1}})
+    return pipeline
+
+
+def _resample_columns(
+    columns: dict,
+    features: list,
+    start: datetime,
+    resolution: timedelta,
+    buckets: int,
+    aggregation: str,
+) -> list:
+    """Client side of resampled_by_time, aggregates the columns (see read_columns)"""
+    result = [{"timestamp": start + k * resolution} for k in range(buckets)]
+    if len(columns) == 0:
+        for document in result:
+            document.update({key: None for key in features})
+        return result
+    start_ns = np.datetime64(start, "ns").astype(np.int64)
+    index = (columns["timestamp"] - start_ns) // (resolution // MICROSECOND * 1000)
+    grid = np.arange(buckets)
+    for key in features:
+        if key in columns:
+            values = columns[key].astype(np.float64)
+        else:
+            values = np.full(len(index), np.nan)
+        valid = ~np.isnan(values)
+        key_index = index[valid]
+        values = values[valid]
+        counts = np.bincount(key_index, minlength=buckets)
+        if aggregation == "mean":
+            aggregated = np.divide(
+                np.bincount(key_index, weights=values, minlength=buckets),
+                counts,
+                out=np.full(buckets, np.nan),
+                where=counts > 0,
+            )
+        elif aggregation == "last":
+            aggregated = np.full(buckets, np.nan)
+            # without values of the feature in the range every grid point stays nan
+            if len(key_index) > 0:
+                last = np.append(key_index[1:] != key_index[:-1], True)
+                aggregated[key_index[last]] = values[last]
+        else:
+            aggregated = np.full(buckets, np.inf if aggregation == "min" else -np.inf)
+            ufunc = np.minimum if aggregation == "min" else np.maximum
+            ufunc.at(aggregated, key_index, values)
+            aggregated[counts == 0] = np.nan
+        filled = np.flatnonzero(counts > 0)
+        if len(filled) > 0 and aggregation == "last":
+            previous = np.maximum.accumulate(np.where(counts > 0, grid, -1))
+            aggregated = np.where(
+                previous >= 0, aggregated[np.maximum(previous, 0)], np.nan
+            )
+        elif len(filled) > 0:
+            inside = (grid > filled[0]) & (grid < filled[-1]) & (counts == 0)
+            aggregated[inside] = np.interp(grid[inside], filled, aggregated[filled])
+        for document, value in zip(result, aggregated.tolist()):
+            document[key] = None if math.isnan(value) else value
+    return result
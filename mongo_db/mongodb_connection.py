@@ -1,6 +1,6 @@
 import enum
 from pymongo import MongoClient
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict
 from .mongodb_collections import MongoCollectionWrapper, MongoDBTimeSeriesData
 
@@ -21,8 +21,17 @@ class MongoDBConnection:
     and to request the MongoDBCollection objects to run predefined queries.
     """
 
-    def __init__(self, mongodb_uri):
-        self.client = MongoClient(mongodb_uri)
+    def __init__(self, mongodb_uri, client: MongoClient = None):
+        """Connects to the mongoDB and creates the missing collections
+
+        :param mongodb_uri: uri of the mongoDB
+        :type mongodb_uri: str
+        :param client: use this client instead of connecting to mongodb_uri, e.g. an
+        in-memory mongomock.MongoClient with already created collections (mongomock does
+        not support time series collections), defaults to None
+        :type client: MongoClient, optional
+        """
+        self.client = MongoClient(mongodb_uri) if client is None else client
         self.database = self.client.zumi
         self.__collections = {}
 
@@ -78,8 +87,45 @@ class MongoDBConnection:
         """
         return self.__collections
 
+    def get_session_ids(self) -> list:
+        """Returns the ids of all recorded sessions from the session_data collection
+
+        :return: list of session ids
+        :rtype: list
+        """
+        return self.__collections[CollectionType.SESSION_DATA].collection.distinct(
+            "session_id"
+        )
+
+    def get_session_extent(self, session_id: str, c_types: list) -> tuple:
+        """Get the time range of a session in which all collections have measurements
+
+        :param session_id: id of the session
+        :type session_id: str
+        :param c_types: the CollectionTypes of the time series
+        :type c_types: list
+        :return: tuple of the latest first measurement, the earliest last measurement and
+        the latest last measurement of the collections or None if a collection has no
+        measurement of the session
+        :rtype: tuple
+        """
+        extents = [self.__collections[t].session_extent(session_id) for t in c_types]
+        if any(extent is None for extent in extents):
+            return None
+        return (
+            max(extent[0] for extent in extents),
+            min(extent[1] for extent in extents),
+            max(extent[1] for extent in extents),
+        )
+
     def get_numeric_sensor_data_by_time(
-        self, timestamp_start: datetime, timestamp_end: datetime, c_types: dict
+        self,
+        timestamp_start: datetime,
+        timestamp_end: datetime,
+        c_types: dict,
+        session_id: str = None,
+        mode: str = "list",
+        batch_size: int = None,
     ) -> dict:
         """Get selected sensor data from the mongoDB between a start and end time
 
@@ -89,6 +135,15 @@ class MongoDBConnection:
         :type timestamp_end: datetime
         :param c_types: a dict containing the CollectionTypes to search for
         :type c_types: dict
+        :param session_id: only data of this session, defaults to None (all sessions)
+        :type session_id: str, optional
+        :param mode: "list" (list of dicts), "stream" (generator of dicts) or "columns"
+        (dict<feature, np.array>) per collection, see
+        MongoDBTimeSeriesData.sensor_data_by_time, defaults to "list"
+        :type mode: str, optional
+        :param batch_size: number of documents per request in the "stream" and
+        "columns" modes, defaults to None (mongodb_collections.BATCH_SIZE)
+        :type batch_size: int, optional
         :return: dict containing all found sensor data
         :rtype: dict
         """
@@ -96,7 +151,47 @@ class MongoDBConnection:
         for t in c_types:
             collection = self.__collections[t]
             result[t] = collection.sensor_data_by_time(
-                timestamp_start, timestamp_end, c_types[t]
+                timestamp_start, timestamp_end, c_types[t], session_id, mode, batch_size
+            )
+        return result
+
+    def get_resampled_sensor_data_by_time(
+        self,
+        timestamp_start: datetime,
+        timestamp_end: datetime,
+        c_types: dict,
+        resolution: timedelta,
+        aggregation: str = "mean",
+        session_id: str = None,
+    ) -> dict:
+        """Get selected sensor data aggregated onto a time grid, see
+        MongoDBTimeSeriesData.resampled_by_time
+
+        :param timestamp_start: first grid point, a python datetime object
+        :type timestamp_start: datetime
+        :param timestamp_end: end time, a python datetime object
+        :type timestamp_end: datetime
+        :param c_types: a dict containing the CollectionTypes to search for
+        :type c_types: dict
+        :param resolution: distance between two grid points, whole milliseconds
+        :type resolution: timedelta
+        :param aggregation: "mean", "min", "max" or "last", defaults to "mean"
+        :type aggregation: str, optional
+        :param session_id: only data of this session, defaults to None (all sessions)
+        :type session_id: str, optional
+        :return: dict<CollectionType, list of dicts>, one dict per grid point
+        :rtype: dict
+        """
+        result = {}
+        for t in c_types:
+            collection = self.__collections[t]
+            result[t] = collection.resampled_by_time(
+                timestamp_start,
+                timestamp_end,
+                c_types[t],
+                resolution,
+                aggregation,
+                session_id,
             )
         return result
 
@@ -1,43 +1,462 @@
 from .mongodb_connection import CollectionType, MongoDBConnection
+from .mongodb_collections import MongoCollectionWrapper
 import os
 import glob
-from bson.json_util import loads
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from threading import Lock
+from typing import Generator, TextIO
+from bson.json_util import object_hook
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
 import json
 
+# number of documents checked and written with one request each
+BATCH_SIZE = 5000
 
-def transfer_all_json_files(
-    connection: MongoDBConnection, ctype: CollectionType, target_folder: str
+# number of characters read from a log file at once
+READ_SIZE = 1 << 20
+
+MANIFEST = "ingest_manifest"
+
+PARTIAL = "partial"
+DONE = "done"
+FAILED = "failed"
+
+
+class IngestStats:
+    """Counts the documents of an ingest"""
+
+    def __init__(self):
+        self.files = 0
+        self.unchanged = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def merge(self, other: "IngestStats") -> None:
+        """Adds the counts of another IngestStats object
+
+        :param other: stats to add
+        :type other: IngestStats
+        """
+        self.files += other.files
+        self.unchanged += other.unchanged
+        self.inserted += other.inserted
+        self.skipped += other.skipped
+        self.failed += other.failed
+
+    def __str__(self) -> str:
+        return (
+            "{} measurements of {} files saved, {} already saved, {} failed, "
+            "{} unchanged files skipped".format(
+                self.inserted, self.files, self.skipped, self.failed, self.unchanged
+            )
+        )
+
+
+class IngestManifest:
+    """Records the transferred log files in the collection ingest_manifest
+
+    Every file is recorded with its path, size, modification time, SHA-256 hash, status
+    and the number of documents of the committed batches. A completely transferred file
+    is skipped as long as its size and modification time do not change (or its content,
+    if only the modification time changed). A partially transferred file is resumed
+    after its last committed batch.
+    """
+
+    def __init__(self, connection: MongoDBConnection):
+        """Opens the manifest
+
+        :param connection: the mongoDB connection class
+        :type connection: MongoDBConnection
+        """
+        self.files = connection.database[MANIFEST]
+        self.files.create_index([("path", ASCENDING)], unique=True)
+
+    def entries(self) -> dict:
+        """Returns all recorded files with one query
+
+        :return: dict<absolute path, recorded dict>
+        :rtype: dict
+        """
+        return {doc["path"]: doc for doc in self.files.find({}, {"_id": False})}
+
+    def record(
+        self,
+        path: str,
+        stat: os.stat_result,
+        sha256: str,
+        documents: int,
+        status: str,
+    ) -> None:
+        """Records the state of a file
+
+        :param path: absolute path of the file
+        :type path: str
+        :param stat: result of os.stat of the file
+        :type stat: os.stat_result
+        :param sha256: hex digest of the content
+        :type sha256: str
+        :param documents: number of documents of the committed batches
+        :type documents: int
+        :param status: "partial", "done" or "failed"
+        :type status: str
+        """
+        self.files.update_one(
+            {"path": path},
+            {
+                "$set": {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "sha256": sha256,
+                    "documents": documents,
+                    "status": status,
+                    "updated": datetime.now(),
+                }
+            },
+            upsert=True,
+        )
+
+    def clear(self) -> None:
+        """Removes all records, the next ingest checks all files again"""
+        self.files.delete_many({})
+
+
+def unchanged(entry: dict, stat: os.stat_result) -> bool:
+    """Checks if a file has the recorded size and modification time
+
+    :param entry: the recorded file, see IngestManifest.entries
+    :type entry: dict
+    :param stat: result of os.stat of the file
+    :type stat: os.stat_result
+    :return: true if size and modification time are unchanged
+    :rtype: bool
+    """
+    return (
+        entry is not None
+        and entry["size"] == stat.st_size
+        and entry["mtime"] == stat.st_mtime_ns
+    )
+
+
+def file_hash(file_name: str) -> str:
+    """Calculates the SHA-256 hash of a file, reading it in blocks
+
+    :param file_name: path of the file
+    :type file_name: str
+    :return: hex digest
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for block in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_batch(
+    collection: MongoCollectionWrapper, batch: list, stats: IngestStats
 ) -> None:
+    """Writes the documents of a batch whose timestamp is not stored yet
+
+    The stored timestamps are found with one query, the new documents are written with
+    one unordered insert_many. Documents without timestamp are always written.
+
+    :param collection: the target collection
+    :type collection: MongoCollectionWrapper
+    :param batch: list of documents
+    :type batch: list
+    :param stats: collects the counts
+    :type stats: IngestStats
+    """
+    seen = set()
+    timestamps = [d["timestamp"] for d in batch if "timestamp" in d]
+    if len(timestamps) > 0:
+        seen = collection.existing_timestamps(timestamps)
+    new = []
+    for d in batch:
+        if "timestamp" in d:
+            # also skips repeated timestamps inside the batch
+            if d["timestamp"] in seen:
+                stats.skipped += 1
+                continue
+            seen.add(d["timestamp"])
+        new.append(d)
+    if len(new) == 0:
+        return
+    try:
+        collection.write_many(new, ordered=False)
+        stats.inserted += len(new)
+    except BulkWriteError as e:
+        stats.inserted += e.details["nInserted"]
+        stats.failed += len(new) - e.details["nInserted"]
+
+
+def iter_json_array(f: TextIO, read_size: int = READ_SIZE) -> Generator:
+    """Decodes the elements of a JSON array (MongoDB extended JSON) one by one
+
+    Only the current element and one read_size block are kept in memory, so the memory
+    usage does not depend on the size of the file.
+
+    :param f: the opened file
+    :type f: TextIO
+    :param read_size: number of characters read at once, defaults to READ_SIZE
+    :type read_size: int, optional
+    :raises json.decoder.JSONDecodeError: raise exception (a ValueError) when the file
+    is not a JSON array or has data after the array, e.g. a truncated or concatenated
+    log file, after the elements before the error were generated
+    :yield: the decoded elements
+    :rtype: Generator
+    """
+    decoder = json.JSONDecoder(object_hook=object_hook)
+    buffer = ""
+    position = 0
+    eof = False
+
+    def more() -> bool:
+        """Appends the next block to the buffer, false at the end of the file"""
+        nonlocal buffer, position, eof
+        # an element larger than the buffer doubles the read size (linear decoding time)
+        block = f.read(max(read_size, len(buffer) - position))
+        buffer = buffer[position:] + block
+        position = 0
+        eof = len(block) == 0
+        return not eof
+
+    expected = "["
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer) or not more():
+                break
+        if position >= len(buffer):
+            raise json.decoder.JSONDecodeError(
+                "Unexpected end of file", buffer, position
+            )
+        char = buffer[position]
+        if expected == "[":
+            if char != "[":
+                raise json.decoder.JSONDecodeError("Expecting '['", buffer, position)
+            position += 1
+            expected = "value or ]"
+        elif char == "]" and expected != "value":
+            position += 1
+            # only whitespace may follow the array
+            while True:
+                while position < len(buffer) and buffer[position].isspace():
+                    position += 1
+                if position < len(buffer):
+                    raise json.decoder.JSONDecodeError("Extra data", buffer, position)
+                if not more():
+                    return
+        elif expected == ", or ]":
+            if char != ",":
+                raise json.decoder.JSONDecodeError(
+                    "Expecting ',' delimiter", buffer, position
+                )
+            position += 1
+            expected = "value"
+        else:
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # a number at the end of the buffer may continue in the next block
+                    if end < len(buffer) or eof:
+                        break
+                except json.decoder.JSONDecodeError:
+                    if eof:
+                        raise
+                more()
+            position = end
+            expected = ", or ]"
+            yield value
+
+
+def transfer_json_file(
+    connection: MongoDBConnection,
+    ctype: CollectionType,
+    file_name: str,
+    batch_size: int = BATCH_SIZE,
+    lock: Lock = None,
+    manifest: IngestManifest = None,
+    entry: dict = None,
+) -> IngestStats:
+    """Transfers one JSON file to mongoDB in batches, while it is decoded, see write_batch
+
+    :param connection: the mongoDB connection class
+    :type connection: MongoDBConnection
+    :param ctype: the collection type of the file
+    :type ctype: CollectionType
+    :param file_name: path of the log file
+    :type file_name: str
+    :param batch_size: number of documents checked and written at once,
+    defaults to BATCH_SIZE
+    :type batch_size: int, optional
+    :param lock: held while a batch is checked and written, files of the same
+    collection transferred at the same time have to share a lock, defaults to None
+    :type lock: Lock, optional
+    :param manifest: records the progress of the file, defaults to None
+    :type manifest: IngestManifest, optional
+    :param entry: the recorded state of the file, see IngestManifest.entries,
+    defaults to None
+    :type entry: dict, optional
+    :return: the inserted, skipped and failed counts
+    :rtype: IngestStats
+    """
+    collection = connection.get_collection_by_type(ctype)
+    stats = IngestStats()
+    path = os.path.abspath(file_name)
+    stat = os.stat(file_name)
+    committed = 0
+    sha256 = None
+    if manifest is not None:
+        if unchanged(entry, stat):
+            sha256 = entry["sha256"]
+        else:
+            sha256 = file_hash(file_name)
+            if entry is not None and entry["sha256"] != sha256:
+                entry = None
+        if entry is not None:
+            if entry["status"] == DONE:
+                # only the modification time changed
+                manifest.record(path, stat, sha256, entry["documents"], DONE)
+                stats.unchanged += 1
+                return stats
+            if entry["status"] == PARTIAL:
+                committed = entry["documents"]
+        manifest.record(path, stat, sha256, committed, PARTIAL)
+    with open(file_name, "r") as f:
+        documents = iter_json_array(f)
+        try:
+            # the batches committed by a previous ingest, an uncommitted but written
+            # batch is skipped by write_batch
+            for _ in islice(documents, committed):
+                pass
+            while True:
+                batch = list(islice(documents, batch_size))
+                if len(batch) == 0:
+                    break
+                if lock is None:
+                    write_batch(collection, batch, stats)
+                else:
+                    with lock:
+                        write_batch(collection, batch, stats)
+                committed += len(batch)
+                if manifest is not None:
+                    manifest.record(path, stat, sha256, committed, PARTIAL)
+        except json.decoder.JSONDecodeError as e:
+            print(str(e))
+            print("Failed to save: " + file_name)
+            if manifest is not None:
+                manifest.record(path, stat, sha256, committed, FAILED)
+            return stats
+    if manifest is not None:
+        manifest.record(path, stat, sha256, committed, DONE)
+    stats.files += 1
+    if stats.failed > 0:
+        print("Failed to save: " + file_name)
+    return stats
+
+
+def transfer_json_files(
+    connection: MongoDBConnection,
+    target_folder: str,
+    ctypes: list = None,
+    workers: int = None,
+    batch_size: int = BATCH_SIZE,
+    manifest: IngestManifest = None,
+) -> IngestStats:
+    """Transfers the JSON files of several collection types concurrently to mongoDB
+
+    Every worker thread decodes one file at a time and writes its documents in
+    batches. A worker only decodes the next batch, after the previous one is written,
+    therefore at most workers batches are in memory, regardless of the file sizes.
+    The batches of one collection are checked and written one after another, so that
+    no timestamp is written twice.
+
+    :param connection: the mongoDB connection class
+    :type connection: MongoDBConnection
+    :param target_folder: path to the folder containing the log files
+    :type target_folder: str
+    :param ctypes: list of collection types, defaults to all
+    :type ctypes: list, optional
+    :param workers: number of threads, defaults to None (see
+    concurrent.futures.ThreadPoolExecutor)
+    :type workers: int, optional
+    :param batch_size: number of documents checked and written at once,
+    defaults to BATCH_SIZE
+    :type batch_size: int, optional
+    :param manifest: skips the unchanged files and resumes the partially transferred
+    files, defaults to None (all files are transferred)
+    :type manifest: IngestManifest, optional
+    :return: the inserted, skipped and failed counts
+    :rtype: IngestStats
+    """
+    ctypes = list(connection.get_all_collections()) if ctypes is None else ctypes
+    entries = {} if manifest is None else manifest.entries()
+    stats = IngestStats()
+    files = []
+    for ctype in ctypes:
+        for file_name in glob.glob(
+            os.path.join(target_folder, "{}*.json".format(ctype.value))
+        ):
+            stat = os.stat(file_name)
+            entry = entries.get(os.path.abspath(file_name))
+            # unchanged files are skipped without opening them
+            if unchanged(entry, stat) and entry["status"] == DONE:
+                stats.unchanged += 1
+            else:
+                files.append((ctype, file_name, stat.st_size, entry))
+    # the largest files first, so that no worker starts a large file at the end
+    files.sort(key=lambda file: file[2], reverse=True)
+    locks = {ctype: Lock() for ctype in ctypes}
+    with ThreadPoolExecutor(workers) as executor:
+        for file_stats in executor.map(
+            lambda file: transfer_json_file(
+                connection,
+                file[0],
+                file[1],
+                batch_size,
+                locks[file[0]],
+                manifest,
+                file[3],
+            ),
+            files,
+        ):
+            stats.merge(file_stats)
+    print(stats)
+    return stats
+
+
+def transfer_all_json_files(
+    connection: MongoDBConnection,
+    ctype: CollectionType,
+    target_folder: str,
+    batch_size: int = BATCH_SIZE,
+    manifest: IngestManifest = None,
+) -> IngestStats:
     """transfers all JSON files from a specified folder to mongoDB
 
+    Measurements with a timestamp that is already stored are skipped.
+
     :param connection: the mongoDB connection class
     :type connection: MongoDBConnection
     :param ctype: filters the log files for this specific connection type
     :type ctype: CollectionType
     :param target_folder: path to the folder containing the log files
     :type target_folder: str
+    :param batch_size: number of documents checked and written at once,
+    defaults to BATCH_SIZE
+    :type batch_size: int, optional
+    :param manifest: see transfer_json_files, defaults to None
+    :type manifest: IngestManifest, optional
+    :return: the inserted, skipped and failed counts
+    :rtype: IngestStats
     """
-    files = glob.glob(os.path.join(target_folder, "{}*.json".format(ctype.value)))
-    collection = connection.get_collection_by_type(ctype)
-    successful = 0
-    for file_name in files:
-        with open(file_name, "r") as f:
-            try:
-                data = loads(f.read())
-            except json.decoder.JSONDecodeError as e:
-                print(str(e))
-                print("Failed to save: " + file_name)
-                continue
-        for d in data:
-            if "timestamp" not in d:
-                if collection.write_one(d):
-                    successful += 1
-                else:
-                    print("Failed to save: " + file_name)
-            else:
-                if not collection.data_by_timestamp(d["timestamp"]):
-                    if collection.write_one(d):
-                        successful += 1
-                    else:
-                        print("Failed to save: " + file_name)
-    print(str(successful) + "measurements of " + str(len(files)) + " files saved")
+    return transfer_json_files(
+        connection, target_folder, [ctype], 1, batch_size, manifest
+    )
@@ -0,0 +1,221 @@
+import math
+from datetime import datetime, timedelta
+from typing import List, Tuple
+import numpy as np
+from mongo_db_search.parallel import score_batch, score_batch_c
+from mongo_db_search.prefetch import ResampledRange, grid_size
+from mongo_db_search.pruning import PruningStats
+from mongo_db_search.resample import feature_names
+from mongo_db_search.topk import TopK
+
+
+def union_features(selected_features: List[dict]) -> dict:
+    """Combines the selected features of several queries
+
+    :param selected_features: list of dict<CollectionType, list of features>,
+    see SearchQuery.selected_features
+    :type selected_features: List[dict]
+    :return: dict<CollectionType, sorted list of features> containing every feature once
+    :rtype: dict
+    """
+    features = {}
+    for selected in selected_features:
+        for c_type in selected:
+            features.setdefault(c_type, set()).update(selected[c_type])
+    return {c_type: sorted(features[c_type]) for c_type in features}
+
+
+def column_index(features: dict, data_to_search: dict) -> Tuple[np.array, np.array]:
+    """Finds the columns and collections of a query in the resampled data of the union features
+
+    :param features: union of the features, see union_features
+    :type features: dict
+    :param data_to_search: dict<CollectionType, list[Dict]> of the query
+    :type data_to_search: dict
+    :return: column indices in the feature order of the query
+    (see resample.resample) and the indices of its collections
+    :rtype: Tuple[np.array, np.array]
+    """
+    offsets = {}
+    offset = 0
+    for c_type in features:
+        offsets[c_type] = offset
+        offset += len(feature_names({key: None for key in features[c_type]}))
+    columns = []
+    for c_type in data_to_search:
+        names = feature_names({key: None for key in features[c_type]})
+        for name in feature_names(data_to_search[c_type][0]):
+            columns.append(offsets[c_type] + names.index(name))
+    collections = [list(features).index(c_type) for c_type in data_to_search]
+    return np.array(columns), np.array(collections)
+
+
+def feature_columns(features: dict, data_to_search: dict) -> np.array:
+    """Finds the columns of a query in data resampled with other features,
+    e.g. of a SaxIndex or FeatureStore
+
+    :param features: dict<CollectionType, list of features> of the resampled data
+    :type features: dict
+    :param data_to_search: dict<CollectionType, list[Dict]> of the query
+    :type data_to_search: dict
+    :return: column of every feature of the query or None if the query does not use the
+    same collections or uses other features
+    :rtype: np.array
+    """
+    if set(data_to_search) != set(features):
+        return None
+    for c_type in data_to_search:
+        if not set(data_to_search[c_type][0]) <= set(features[c_type]) | {"timestamp"}:
+            return None
+    return column_index(features, data_to_search)[0]
+
+
+class BatchPattern:
+    """One query of a batch search, compares its windows of the shared chunks"""
+
+    def __init__(
+        self,
+        seq: np.array,
+        columns: np.array,
+        collections: np.array,
+        start: datetime,
+        first: int,
+        last: int,
+        step: int,
+        topk: TopK,
+        distance_function: callable,
+        resolution: timedelta,
+        prune: bool = False,
+        window: int = None,
+    ):
+        """Initializes the pattern
+
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :param columns: columns of the pattern in the shared chunks, see column_index
+        :type columns: np.array
+        :param collections: collections of the pattern in the shared chunks, see column_index
+        :type collections: np.array
+        :param start: time of global index 0 of the shared chunks
+        :type start: datetime
+        :param first: global index of the first window
+        :type first: int
+        :param last: largest global start index of a window
+        :type last: int
+        :param step: number of rows between two windows
+        :type step: int
+        :param topk: collects the best results of the pattern
+        :type topk: TopK
+        :param distance_function: distance function used for calculation
+        :type distance_function: callable
+        :param resolution: interpolation resolution
+        :type resolution: timedelta
+        :param prune: reject windows with a PruningCascade, defaults to False
+        :type prune: bool, optional
+        :param window: warping window of the distance function
+        :type window: int, optional
+        """
+        self.seq = seq
+        self.columns = columns
+        self.collections = collections
+        self.start = start
+        self.first = first
+        self.last = last
+        self.step = step
+        self.topk = topk
+        self.distance_function = distance_function
+        self.length = len(seq) * resolution
+        self.prune = prune
+        self.window = window
+        self.stats = PruningStats()
+        # the chunks overlap by the length of the longest pattern, windows before
+        # this global index were already compared in the previous chunk
+        self.next = first
+
+    @staticmethod
+    def index_range(
+        start: datetime,
+        query_start: datetime,
+        query_end: datetime,
+        resolution: timedelta,
+        length: int,
+    ) -> Tuple[int, int]:
+        """Returns the global indices of the first and last window of a query
+
+        :param start: time of global index 0 of the shared chunks
+        :type start: datetime
+        :param query_start: starting time of the query
+        :type query_start: datetime
+        :param query_end: end time of the query
+        :type query_end: datetime
+        :param resolution: interpolation resolution
+        :type resolution: timedelta
+        :param length: number of rows of a window
+        :type length: int
+        :return: first and last global start index
+        :rtype: Tuple[int, int]
+        """
+        first = math.ceil((query_start - start) / resolution)
+        return first, first + grid_size(query_start, query_end, resolution) - length
+
+    def windows(self, chunk: ResampledRange) -> list:
+        """Returns the windows of the pattern inside a chunk
+
+        :param chunk: a chunk of the shared data
+        :type chunk: ResampledRange
+        :return: list of (timestamp, sequence) tuples
+        :rtype: list
+        """
+        length = len(self.seq)
+        starts = chunk.offset + np.arange(max(len(chunk) - length + 1, 0))
+        keep = (
+            chunk.valid(length, self.collections)
+            & (starts >= self.next)
+            & (starts <= self.last)
+            & ((starts - self.first) % self.step == 0)
+        )
+        if len(starts) > 0:
+            self.next = max(self.next, int(starts[-1]) + 1)
+        data = chunk.data[:, self.columns]
+        return [
+            (
+                chunk.timestamp(int(i)),
+                data[i - chunk.offset : i - chunk.offset + length],
+            )
+            for i in starts[keep]
+        ]
+
+    def score(self, chunk: ResampledRange, use_c: bool = False) -> None:
+        """Compares the windows of a chunk and adds the best ones to topk
+
+        :param chunk: a chunk of the shared data
+        :type chunk: ResampledRange
+        :param use_c: use the parallel C dtw of dtaidistance, defaults to False
+        :type use_c: bool, optional
+        """
+        batch = self.windows(chunk)
+        if len(batch) == 0:
+            return
+        if use_c:
+            results, stats = score_batch_c(
+                self.seq,
+                batch,
+                self.topk.empty(),
+                self.length,
+                self.prune,
+                self.window,
+                self.topk.threshold,
+            )
+        else:
+            results, stats = score_batch(
+                self.seq,
+                batch,
+                self.distance_function,
+                self.topk.empty(),
+                self.length,
+                self.prune,
+                self.window,
+                self.topk.threshold,
+            )
+        self.topk.merge(results)
+        self.stats.merge(stats)
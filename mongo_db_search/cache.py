@@ -0,0 +1,227 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import numpy as np
+from mongo_db_search.topk import results_from_documents, results_to_documents
+
+
+def query_fingerprint(
+    query, seq: np.array, source: str = "database", generation: str = None
+) -> str:
+    """Hash of everything that determines the results of a query, except result_size
+
+    The results of suppress_overlap can not be truncated to a smaller result_size,
+    their result_size is part of the fingerprint.
+
+    :param query: the SearchQuery
+    :type query: SearchQuery
+    :param seq: the resampled query array
+    :type seq: np.array
+    :param source: where the windows are read from, "database", "index" (SaxIndex) or
+    "store" (FeatureStore), defaults to "database"
+    :type source: str, optional
+    :param generation: generation of the index or store (see SaxIndex.generation and
+    FeatureStore.generation), so that their entries are not used after a rebuild,
+    defaults to None
+    :type generation: str, optional
+    :return: hex digest of the fingerprint
+    :rtype: str
+    """
+    seq = np.ascontiguousarray(seq, dtype=np.float64)
+    description = {
+        "shape": seq.shape,
+        "features": {
+            str(c_type): sorted(query.selected_features[c_type])
+            for c_type in query.selected_features
+        },
+        "start": query.start.isoformat(),
+        "end": query.end.isoformat(),
+        "resolution": str(query.interpolation_resolution),
+        "step": query.step,
+        "mode": query.mode,
+        "prefetch": query.prefetch,
+        "window": query.window,
+        "prefilter": query.prefilter,
+        "coarse_resolution": str(query.coarse_resolution),
+        "coarse_candidates": query.coarse_candidates,
+        "keep_ties": query.keep_ties,
+        "suppress_overlap": query.suppress_overlap,
+        "session_id": query.session_id,
+        "source": source,
+        "generation": generation,
+    }
+    if query.suppress_overlap:
+        description["result_size"] = query.result_size
+    digest = hashlib.sha256(seq.tobytes())
+    digest.update(json.dumps(description, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def truncate(results: list, size: int, keep_ties: bool = False) -> list:
+    """Returns the best size results of a sorted result list of a larger size
+
+    :param results: list of SearchResult objects sorted by distance
+    :type results: list
+    :param size: number of results
+    :type size: int
+    :param keep_ties: keep the results with the same distance as the last one
+    :type keep_ties: bool, optional
+    :return: the best results
+    :rtype: list
+    """
+    if not keep_ties or len(results) <= size:
+        return results[:size]
+    last = results[size - 1].distance
+    return [result for result in results if result.distance <= last]
+
+
+class ResultCache:
+    """Persistent least recently used cache of search results in a SQLite file
+
+    An entry stores the results of the largest result_size searched so far, so that
+    searches with a smaller result_size are answered from it. Every entry records the
+    data version of the searched collections (see MongoDBTimeSeriesData.data_version),
+    it is invalid as soon as data in the search range changes.
+    The results are stored as JSON (see results_to_documents), nothing in the file is
+    executed. The cache can be shared by several threads.
+    """
+
+    def __init__(self, path: str = ":memory:", max_entries: int = 1000):
+        """Opens or creates the cache
+
+        :param path: path of the SQLite file, defaults to ":memory:" (not persistent)
+        :type path: str, optional
+        :param max_entries: maximal number of entries, the least recently used entries
+        are evicted, defaults to 1000
+        :type max_entries: int, optional
+        """
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, version TEXT, "
+            "size INTEGER, results TEXT, used INTEGER)"
+        )
+        self.__db.commit()
+        self.__clock = self.__db.execute(
+            "SELECT COALESCE(MAX(used), 0) FROM results"
+        ).fetchone()[0]
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def get(
+        self,
+        key: str,
+        version: dict,
+        size: int,
+        keep_ties: bool = False,
+        suppress_overlap: bool = False,
+    ) -> list:
+        """Returns the cached results of a query
+
+        :param key: fingerprint of the query, see query_fingerprint
+        :type key: str
+        :param version: current data version of the search range
+        :type version: dict
+        :param size: result_size of the query
+        :type size: int
+        :param keep_ties: keep_ties of the query
+        :type keep_ties: bool, optional
+        :param suppress_overlap: suppress_overlap of the query, the greedy results
+        are only reused for the same result_size
+        :type suppress_overlap: bool, optional
+        :return: list of SearchResult objects or None if there is no valid entry
+        :rtype: list
+        """
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT version, size, results FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] != _dump_version(version):
+                self.__db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.__db.commit()
+                return None
+            if row[1] < size or (suppress_overlap and row[1] != size):
+                return None
+            try:
+                results = results_from_documents(json.loads(row[2]))
+            except (ValueError, TypeError, KeyError):
+                # entry of an older format, e.g. pickled results
+                self.__db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.__db.commit()
+                return None
+            self.__clock += 1
+            self.__db.execute(
+                "UPDATE results SET used = ? WHERE key = ?", (self.__clock, key)
+            )
+            self.__db.commit()
+        return truncate(results, size, keep_ties)
+
+    def put(self, key: str, version: dict, size: int, results: list) -> None:
+        """Stores the results of a query and evicts the least recently used entries
+
+        A valid entry of a larger result_size is kept, it also answers this query.
+
+        :param key: fingerprint of the query, see query_fingerprint
+        :type key: str
+        :param version: data version of the search range
+        :type version: dict
+        :param size: result_size of the query
+        :type size: int
+        :param results: list of SearchResult objects
+        :type results: list
+        """
+        with self.__lock:
+            self.__clock += 1
+            row = self.__db.execute(
+                "SELECT version, size FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] == _dump_version(version) and row[1] > size:
+                self.__db.execute(
+                    "UPDATE results SET used = ? WHERE key = ?", (self.__clock, key)
+                )
+                self.__db.commit()
+                return
+            self.__db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (
+                    key,
+                    _dump_version(version),
+                    size,
+                    json.dumps(results_to_documents(results)),
+                    self.__clock,
+                ),
+            )
+            self.__db.execute(
+                "DELETE FROM results WHERE key NOT IN "
+                "(SELECT key FROM results ORDER BY used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self.__db.commit()
+
+    def clear(self) -> None:
+        """Removes all entries"""
+        with self.__lock:
+            self.__db.execute("DELETE FROM results")
+            self.__db.commit()
+
+    def close(self) -> None:
+        """Closes the SQLite file"""
+        with self.__lock:
+            self.__db.close()
+
+
+def _dump_version(version: dict) -> str:
+    """Serializes a data version dict<str, (count, latest timestamp)>"""
+    return json.dumps(
+        {
+            str(c_type): [count, str(latest)]
+            for c_type, (count, latest) in version.items()
+        },
+        sort_keys=True,
+    )
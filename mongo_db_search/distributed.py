@@ -0,0 +1,488 @@
+import sys
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+import argparse
+import copy
+import math
+import socket
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Process
+from threading import Event, Thread
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from mongo_db.mongodb_connection import CollectionType, MongoDBConnection
+from mongo_db_search.progress import Progress
+from mongo_db_search.resample import MICROSECOND, resample
+from mongo_db_search.search import SearchQuery, Searcher
+from mongo_db_search.topk import (
+    TopK,
+    from_micros,
+    results_from_documents,
+    results_to_documents,
+    to_micros,
+)
+
+SHARDS = "search_shards"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# the arguments of SearchQuery stored in a shard, besides data_to_search and the times
+QUERY_FIELDS = [
+    "step",
+    "result_size",
+    "prefetch",
+    "chunk_size",
+    "workers",
+    "prune",
+    "keep_ties",
+    "suppress_overlap",
+    "window",
+    "mode",
+    "prefilter",
+    "coarse_candidates",
+    "sessions",
+    "session_workers",
+]
+
+
+class Coordinator:
+    """Splits searches into shards and publishes them to the collection search_shards
+
+    Workers (see Worker), on this or other hosts, claim the shards, search them and
+    store their partial results. The queries and results are stored as plain documents
+    (see query_to_document and results_to_documents), nothing in the collection is
+    executed. A claimed shard has a lease, which the worker renews
+    while it searches. If a worker dies, its lease expires and the shard is claimed
+    again by another worker. A shard that fails max_attempts times fails the search.
+    """
+
+    def __init__(
+        self,
+        connection: MongoDBConnection,
+        progress: callable = None,
+        max_attempts: int = 3,
+    ):
+        """Initializes the coordinator
+
+        :param connection: connection to the mongoDB
+        :type connection: MongoDBConnection
+        :param progress: called with a progress.Progress object for every finished shard,
+        None disables the reports, defaults to None
+        :type progress: callable, optional
+        :param max_attempts: number of times a shard is searched before the search
+        fails, defaults to 3
+        :type max_attempts: int, optional
+        """
+        self.connection = connection
+        self.progress = progress
+        self.max_attempts = max_attempts
+        self.shards = connection.database[SHARDS]
+        _create_indexes(self.shards)
+
+    def search(
+        self,
+        query: SearchQuery,
+        shards: int = 4,
+        timeout: timedelta = None,
+        poll_interval: timedelta = timedelta(seconds=1),
+    ) -> list:
+        """Searches a query with the workers, see submit and wait
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param shards: number of time shards, see submit, defaults to 4
+        :type shards: int, optional
+        :param timeout: see wait, defaults to None
+        :type timeout: timedelta, optional
+        :param poll_interval: see wait, defaults to 1 second
+        :type poll_interval: timedelta, optional
+        :return: list of the query.result_size best SearchResult objects, sorted by distance
+        :rtype: list
+        """
+        job = self.submit(query, shards)
+        try:
+            return self.wait(job, query, timeout, poll_interval)
+        finally:
+            self.shards.delete_many({"job": job})
+
+    def split(self, query: SearchQuery, shards: int = 4) -> list:
+        """Splits a query into queries of shards
+
+        A query with sessions is split into one shard per session, other queries into
+        shards of consecutive time ranges. The windows of a time shard start on the step
+        grid of query.start, every shard ends one query length after the start of the
+        next shard, so that every window is searched by at least one shard.
+        Matches of mode "spring" are warped and not bound to the step grid, they could
+        cross a shard border, so spring queries are only split by sessions.
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param shards: number of time shards, defaults to 4
+        :type shards: int, optional
+        :raises exception: raise exception for a spring query without sessions
+        :return: list of SearchQuery objects
+        :rtype: list
+        """
+        seq = resample(query.data_to_search, query.interpolation_resolution)
+        if query.sessions is not None:
+            return Searcher(self.connection).session_queries(query, len(seq))
+        if query.mode == "spring":
+            raise Exception(
+                "Spring queries can only be distributed by sessions, set sessions"
+            )
+        resolution = query.interpolation_resolution
+        step = int(len(seq) / 3) if query.step is None else query.step
+        duration = len(seq) * resolution
+        windows = max(math.ceil((query.end - query.start) / (resolution * step)), 1)
+        per_shard = math.ceil(windows / shards)
+        queries = []
+        start = query.start
+        while start < query.end:
+            next_start = start + per_shard * step * resolution
+            # one resolution more, so that the first window of the next shard is included
+            end = min(next_start + duration + resolution, query.end)
+            shard_query = copy.copy(query)
+            shard_query.start = start
+            shard_query.end = end
+            shard_query.search_range_size = math.ceil((end - start) / resolution)
+            queries.append(shard_query)
+            if end >= query.end:
+                break
+            start = next_start
+        return queries
+
+    def submit(self, query: SearchQuery, shards: int = 4) -> ObjectId:
+        """Publishes the shards of a query, see split
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param shards: number of time shards, defaults to 4
+        :type shards: int, optional
+        :raises exception: raise exception for a spring query without sessions
+        :return: id of the job, used by wait
+        :rtype: ObjectId
+        """
+        job = ObjectId()
+        now = datetime.utcnow()
+        documents = [
+            {
+                "job": job,
+                "number": number,
+                "query": query_to_document(shard_query),
+                "status": PENDING,
+                "attempts": 0,
+                "max_attempts": self.max_attempts,
+                "lease": now,
+                "created": now,
+            }
+            for number, shard_query in enumerate(self.split(query, shards))
+        ]
+        if len(documents) > 0:
+            self.shards.insert_many(documents)
+        return job
+
+    def wait(
+        self,
+        job: ObjectId,
+        query: SearchQuery,
+        timeout: timedelta = None,
+        poll_interval: timedelta = timedelta(seconds=1),
+    ) -> list:
+        """Waits until all shards of a job are searched and merges their results
+
+        :param job: id of the job, see submit
+        :type job: ObjectId
+        :param query: the submitted query, defines the size of the merged results
+        :type query: SearchQuery
+        :param timeout: maximal time to wait, defaults to None (no limit)
+        :type timeout: timedelta, optional
+        :param poll_interval: time between two checks, defaults to 1 second
+        :type poll_interval: timedelta, optional
+        :raises exception: raise exception when a shard failed or the timeout expired
+        :return: list of the query.result_size best SearchResult objects, sorted by distance
+        :rtype: list
+        """
+        begin = datetime.now()
+        total = self.shards.count_documents({"job": job})
+        if self.progress is not None:
+            self.progress(Progress("shards", "started"))
+        reported = 0
+        while True:
+            # the worker of the last attempt died
+            self.shards.update_many(
+                {
+                    "job": job,
+                    "status": RUNNING,
+                    "lease": {"$lt": datetime.utcnow()},
+                    "attempts": {"$gte": self.max_attempts},
+                },
+                {"$set": {"status": FAILED, "error": "lease expired"}},
+            )
+            failed = self.shards.find_one({"job": job, "status": FAILED})
+            if failed is not None:
+                raise Exception(
+                    "Shard "
+                    + str(failed["number"])
+                    + " failed: "
+                    + str(failed.get("error"))
+                )
+            done = self.shards.count_documents({"job": job, "status": DONE})
+            if self.progress is not None and done > reported:
+                reported = done
+                timesum = datetime.now() - begin
+                self.progress(
+                    Progress(
+                        "shards",
+                        "running",
+                        done / total * 100,
+                        timesum / done * (total - done),
+                    )
+                )
+            if done == total:
+                break
+            if timeout is not None and datetime.now() - begin > timeout:
+                raise Exception(
+                    "Timeout: " + str(total - done) + " shards are not searched"
+                )
+            time.sleep(poll_interval.total_seconds())
+        if self.progress is not None:
+            self.progress(Progress("shards", "done", 100.0, timedelta(0)))
+        topk = TopK(query.result_size, query.keep_ties, query.suppress_overlap)
+        # neighboring time shards share the windows at their borders
+        seen = set()
+        for shard in self.shards.find({"job": job}).sort("number", ASCENDING):
+            for result in results_from_documents(shard["results"]):
+                if (result.start, result.session_id) not in seen:
+                    seen.add((result.start, result.session_id))
+                    topk.push(result)
+        return topk.results()
+
+
+class Worker:
+    """Claims shards from the collection search_shards and searches them, see Coordinator"""
+
+    def __init__(
+        self,
+        connection: MongoDBConnection,
+        searcher: Searcher = None,
+        name: str = None,
+        lease: timedelta = timedelta(minutes=1),
+    ):
+        """Initializes the worker
+
+        :param connection: connection to the mongoDB
+        :type connection: MongoDBConnection
+        :param searcher: Searcher used for the shards, defaults to a silent Searcher
+        :type searcher: Searcher, optional
+        :param name: name of the worker stored in the claimed shards,
+        defaults to host name and process id
+        :type name: str, optional
+        :param lease: a claimed shard is claimed again by another worker, if the lease is
+        not renewed for this time, the worker renews it every quarter, defaults to 1 minute
+        :type lease: timedelta, optional
+        """
+        self.connection = connection
+        self.searcher = Searcher(connection) if searcher is None else searcher
+        self.name = (
+            socket.gethostname() + "-" + str(os.getpid()) if name is None else name
+        )
+        self.lease = lease
+        self.shards = connection.database[SHARDS]
+        _create_indexes(self.shards)
+
+    def claim(self) -> dict:
+        """Claims the oldest pending shard or a shard with an expired lease
+
+        Shards that were already claimed max_attempts times are not claimed again.
+
+        :return: the claimed shard or None if there is none
+        :rtype: dict
+        """
+        now = datetime.utcnow()
+        return self.shards.find_one_and_update(
+            {
+                "$or": [
+                    {"status": PENDING},
+                    {"status": RUNNING, "lease": {"$lt": now}},
+                ],
+                "$expr": {"$lt": ["$attempts", "$max_attempts"]},
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker": self.name,
+                    "lease": now + self.lease,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created", ASCENDING), ("number", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def work_one(self) -> bool:
+        """Claims and searches one shard
+
+        :return: true if a shard was claimed
+        :rtype: bool
+        """
+        shard = self.claim()
+        if shard is None:
+            return False
+        stop = Event()
+        renewal = Thread(target=self.__renew, args=(shard["_id"], stop), daemon=True)
+        renewal.start()
+        try:
+            results = self.searcher.search(query_from_document(shard["query"]))
+        except Exception as e:
+            status = FAILED if shard["attempts"] >= shard["max_attempts"] else PENDING
+            self.__finish(shard["_id"], {"status": status, "error": str(e)})
+        else:
+            self.__finish(
+                shard["_id"],
+                {"status": DONE, "results": results_to_documents(results)},
+            )
+        finally:
+            stop.set()
+            renewal.join()
+        return True
+
+    def run(self, stop: Event = None, poll_interval: timedelta = timedelta(seconds=1)):
+        """Searches shards until stop is set
+
+        :param stop: the worker returns when the event is set, defaults to None (runs forever)
+        :type stop: Event, optional
+        :param poll_interval: time to wait if there is no shard, defaults to 1 second
+        :type poll_interval: timedelta, optional
+        """
+        stop = Event() if stop is None else stop
+        while not stop.is_set():
+            if not self.work_one():
+                stop.wait(poll_interval.total_seconds())
+
+    def __renew(self, shard_id: ObjectId, stop: Event) -> None:
+        """Renews the lease of a shard until stop is set"""
+        while not stop.wait(self.lease.total_seconds() / 4):
+            self.shards.update_one(
+                {"_id": shard_id, "worker": self.name, "status": RUNNING},
+                {"$set": {"lease": datetime.utcnow() + self.lease}},
+            )
+
+    def __finish(self, shard_id: ObjectId, update: dict) -> None:
+        """Stores the outcome of a shard, unless another worker claimed it meanwhile"""
+        self.shards.update_one(
+            {"_id": shard_id, "worker": self.name, "status": RUNNING},
+            {"$set": update},
+        )
+
+
+def query_to_document(query: SearchQuery) -> dict:
+    """Converts a SearchQuery to a BSON document, see query_from_document
+
+    :param query: the query
+    :type query: SearchQuery
+    :return: document with the arguments of the query
+    :rtype: dict
+    """
+    document = {key: getattr(query, key) for key in QUERY_FIELDS}
+    document.update(
+        {
+            "data_to_search": {
+                c_type.value: [
+                    measurement | {"timestamp": to_micros(measurement["timestamp"])}
+                    for measurement in query.data_to_search[c_type]
+                ]
+                for c_type in query.data_to_search
+            },
+            "start": to_micros(query.start),
+            "end": to_micros(query.end),
+            "interpolation_resolution": query.interpolation_resolution // MICROSECOND,
+            "coarse_resolution": (
+                None
+                if query.coarse_resolution is None
+                else query.coarse_resolution // MICROSECOND
+            ),
+            "session_id": query.session_id,
+            "search_range_size": query.search_range_size,
+        }
+    )
+    return document
+
+
+def query_from_document(document: dict) -> SearchQuery:
+    """Rebuilds a SearchQuery from a document of query_to_document
+
+    :param document: the document
+    :type document: dict
+    :return: the query
+    :rtype: SearchQuery
+    """
+    query = SearchQuery(
+        {
+            CollectionType(value): [
+                measurement | {"timestamp": from_micros(measurement["timestamp"])}
+                for measurement in measurements
+            ]
+            for value, measurements in document["data_to_search"].items()
+        },
+        from_micros(document["start"]),
+        from_micros(document["end"]),
+        document["interpolation_resolution"] * MICROSECOND,
+        coarse_resolution=(
+            None
+            if document["coarse_resolution"] is None
+            else document["coarse_resolution"] * MICROSECOND
+        ),
+        **{key: document[key] for key in QUERY_FIELDS}
+    )
+    query.session_id = document["session_id"]
+    query.search_range_size = document["search_range_size"]
+    return query
+
+
+def _create_indexes(shards) -> None:
+    shards.create_index([("status", ASCENDING), ("created", ASCENDING)])
+    shards.create_index([("job", ASCENDING)])
+
+
+def _run_worker(mongodb_uri: str, lease: timedelta) -> None:
+    """Entry point of a worker process"""
+    Worker(MongoDBConnection(mongodb_uri), lease=lease).run()
+
+
+def start_workers(
+    mongodb_uri: str, count: int, lease: timedelta = timedelta(minutes=1)
+) -> list:
+    """Starts worker processes on this host, each with its own connection
+
+    :param mongodb_uri: uri of the mongoDB
+    :type mongodb_uri: str
+    :param count: number of processes
+    :type count: int
+    :param lease: see Worker, defaults to 1 minute
+    :type lease: timedelta, optional
+    :return: list of the started multiprocessing.Process objects, stop them with terminate
+    :rtype: list
+    """
+    processes = [
+        Process(target=_run_worker, args=(mongodb_uri, lease), daemon=True)
+        for _ in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return processes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs search workers")
+    parser.add_argument("uri", help="mongoDB uri")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    for process in start_workers(args.uri, args.workers):
+        process.join()
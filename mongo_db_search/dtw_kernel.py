@@ -0,0 +1,156 @@
+import math
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def band(len1: int, len2: int, window: int = None) -> tuple:
+    """Returns the allowed range of j - i for the warping window,
+    the window has the same meaning as in dtaidistance
+
+    :param len1: length of the first sequence
+    :type len1: int
+    :param len2: length of the second sequence
+    :type len2: int
+    :param window: maximal shift from the two diagonals, None is unconstrained
+    :type window: int, optional
+    :return: tuple of the smallest and largest allowed j - i
+    :rtype: tuple
+    """
+    window = max(len1, len2) if window is None else window
+    return -(max(0, len1 - len2) + window - 1), max(0, len2 - len1) + window - 1
+
+
+def __take(values: np.array, start: int, index: np.array) -> np.array:
+    """Returns the values of a diagonal at the row indices, inf outside of the diagonal
+
+    :param values: values of the diagonal
+    :type values: np.array
+    :param start: row index of the first value
+    :type start: int
+    :param index: row indices
+    :type index: np.array
+    :return: values at the row indices
+    :rtype: np.array
+    """
+    position = index - start
+    inside = (position >= 0) & (position < len(values))
+    result = np.full(len(index), np.inf)
+    result[inside] = values[position[inside]]
+    return result
+
+
+def dtw_numpy(
+    seq1: np.array, seq2: np.array, window: int = None, max_dist: float = None
+) -> float:
+    """Multivariate dtw with squared euclidean costs, calculated along the anti-diagonals
+    of the cost matrix with numpy, every anti-diagonal is one vectorized step
+
+    :param seq1: first sequence with shape (length, features)
+    :type seq1: np.array
+    :param seq2: second sequence with shape (length, features)
+    :type seq2: np.array
+    :param window: warping window, see band, defaults to None
+    :type window: int, optional
+    :param max_dist: return inf as soon as the distance exceeds max_dist, defaults to None
+    :type max_dist: float, optional
+    :return: the dtw distance
+    :rtype: float
+    """
+    len1, len2 = len(seq1), len(seq2)
+    low, high = band(len1, len2, window)
+    limit = np.inf if max_dist is None else max_dist**2
+    before = (0, np.empty(0))
+    previous = (0, np.empty(0))
+    previous_min = np.inf
+    for k in range(len1 + len2 - 1):
+        first = max(0, k - len2 + 1, math.ceil((k - high) / 2))
+        last = min(len1 - 1, k, (k - low) // 2)
+        rows = np.arange(first, last + 1)
+        cols = k - rows
+        costs = np.sum((seq1[rows] - seq2[cols]) ** 2, axis=1)
+        if k == 0:
+            values = costs
+        else:
+            values = costs + np.minimum(
+                __take(before[1], before[0], rows - 1),
+                np.minimum(
+                    __take(previous[1], previous[0], rows - 1),
+                    __take(previous[1], previous[0], rows),
+                ),
+            )
+        current_min = values.min() if len(values) > 0 else np.inf
+        if current_min > limit and previous_min > limit:
+            return np.inf
+        before, previous, previous_min = previous, (first, values), current_min
+    distance = previous[1][-1]
+    if distance > limit:
+        return np.inf
+    return math.sqrt(distance)
+
+
+def __dtw_numba(
+    seq1: np.array, seq2: np.array, low: int, high: int, limit: float
+) -> float:
+    """Row by row dtw with squared euclidean costs, compiled by numba, see dtw_numpy"""
+    len1, len2 = seq1.shape[0], seq2.shape[0]
+    previous = np.full(len2 + 1, np.inf)
+    current = np.full(len2 + 1, np.inf)
+    previous[0] = 0.0
+    for i in range(len1):
+        current[:] = np.inf
+        row_min = np.inf
+        for j in range(max(0, i + low), min(len2, i + high + 1)):
+            cost = 0.0
+            for f in range(seq1.shape[1]):
+                diff = seq1[i, f] - seq2[j, f]
+                cost += diff * diff
+            value = cost + min(previous[j], previous[j + 1], current[j])
+            current[j + 1] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return np.inf
+        previous, current = current, previous
+        previous[0] = np.inf
+    if previous[len2] > limit:
+        return np.inf
+    return math.sqrt(previous[len2])
+
+
+if numba is not None:
+    __dtw_numba = numba.njit(cache=True, nogil=True)(__dtw_numba)
+
+
+def dtw_distance(
+    seq1: np.array, seq2: np.array, max_dist: float = None, window: int = None
+) -> float:
+    """Multivariate dtw with a Sakoe-Chiba band and early abandoning, gives the same
+    distances as dtw_ndim.distance of dtaidistance. Uses numba if it is installed,
+    else the anti-diagonal numpy implementation. The costs are O(length * window)
+
+    :param seq1: first sequence with shape (length, features)
+    :type seq1: np.array
+    :param seq2: second sequence with shape (length, features)
+    :type seq2: np.array
+    :param max_dist: return inf as soon as the distance exceeds max_dist, defaults to None
+    :type max_dist: float, optional
+    :param window: warping window, see band, defaults to None
+    :type window: int, optional
+    :return: the dtw distance
+    :rtype: float
+    """
+    if numba is None:
+        return dtw_numpy(seq1, seq2, window, max_dist)
+    low, high = band(len(seq1), len(seq2), window)
+    limit = np.inf if max_dist is None else max_dist**2
+    return __dtw_numba(
+        np.ascontiguousarray(seq1, dtype=np.float64),
+        np.ascontiguousarray(seq2, dtype=np.float64),
+        low,
+        high,
+        limit,
+    )
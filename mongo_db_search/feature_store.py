@@ -0,0 +1,377 @@
+import json
+import math
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Generator, Tuple
+import numpy as np
+from mongo_db.mongodb_connection import CollectionType, MongoDBConnection
+from mongo_db_search.batch import feature_columns
+from mongo_db_search.prefetch import ResampledRange, grid_size, iter_chunks
+from mongo_db_search.resample import MICROSECOND
+
+META = "store.json"
+
+
+class FeatureStore:
+    """Pre-resampled feature matrices of every session, one per resolution
+
+    Every session is resampled once on its own grid, from its first to its last
+    measurement in all collections of the store (see
+    MongoDBConnection.get_session_extent), and written as a float32 .npy file, together
+    with the measurement counts needed to skip windows without data (see
+    prefetch.ResampledRange) and the mean and standard deviation of every feature.
+    A search reads the files memory-mapped instead of fetching and resampling the
+    documents. The files of a session are rewritten when the session has new data.
+    """
+
+    def __init__(self, path: str, features: dict = None, resolutions: list = None):
+        """Opens a store or creates a new one
+
+        :param path: directory of the store
+        :type path: str
+        :param features: dict<CollectionType, list of features> to store, only needed
+        when the store is created
+        :type features: dict, optional
+        :param resolutions: list of timedelta resolutions, only needed when the store
+        is created
+        :type resolutions: list, optional
+        :raises exception: raise exception when a new store is created without features
+        and resolutions
+        """
+        self.path = path
+        self.__lock = threading.Lock()
+        meta = os.path.join(path, META)
+        if os.path.exists(meta):
+            with open(meta, "r") as f:
+                self.__meta = json.load(f)
+        else:
+            if features is None or resolutions is None:
+                raise Exception("A new FeatureStore needs features and resolutions")
+            os.makedirs(path, exist_ok=True)
+            self.__meta = {
+                "features": {
+                    c_type.value: sorted(set(features[c_type]) | {"timestamp"})
+                    for c_type in features
+                },
+                "resolutions": [
+                    resolution // MICROSECOND for resolution in resolutions
+                ],
+                "sessions": {},
+            }
+        if "generation" not in self.__meta:
+            # a new id for every new store, the number counts the written sessions
+            self.__meta["generation"] = [uuid.uuid4().hex, 0]
+            self.__save()
+        self.features = {
+            CollectionType(value): self.__meta["features"][value]
+            for value in self.__meta["features"]
+        }
+        self.resolutions = [
+            resolution * MICROSECOND for resolution in self.__meta["resolutions"]
+        ]
+
+    @property
+    def generation(self) -> str:
+        """Changes with every written session and when the store is rebuilt"""
+        with self.__lock:
+            return "{}-{}".format(*self.__meta["generation"])
+
+    def __save(self) -> None:
+        file_name = os.path.join(self.path, META)
+        with open(file_name + ".tmp", "w") as f:
+            json.dump(self.__meta, f)
+        os.replace(file_name + ".tmp", file_name)
+
+    def __file(self, session_id: str, resolution: timedelta, kind: str) -> str:
+        return os.path.join(
+            self.path,
+            str(resolution // MICROSECOND),
+            "{}.{}.npy".format(session_id, kind),
+        )
+
+    def columns(self, data_to_search: dict) -> np.array:
+        """Finds the columns of a query in the stored features
+
+        :param data_to_search: dict<CollectionType, list[Dict]>, see SearchQuery
+        :type data_to_search: dict
+        :return: stored column of every feature of the query or None if the query does
+        not use the same collections or uses other features
+        :rtype: np.array
+        """
+        return feature_columns(self.features, data_to_search)
+
+    def sessions(self) -> dict:
+        """Returns the stored sessions
+
+        :return: dict<session id, (first grid row, last grid row)> as datetime
+        :rtype: dict
+        """
+        with self.__lock:
+            return {
+                session_id: (
+                    datetime.fromisoformat(session["start"]),
+                    datetime.fromisoformat(session["end"]),
+                )
+                for session_id, session in self.__meta["sessions"].items()
+            }
+
+    def has(self, session_id: str, resolution: timedelta) -> bool:
+        """Checks if a session is stored at a resolution
+
+        :param session_id: id of the session
+        :type session_id: str
+        :param resolution: interpolation resolution
+        :type resolution: timedelta
+        :return: true if the matrix exists
+        :rtype: bool
+        """
+        with self.__lock:
+            session = self.__meta["sessions"].get(session_id)
+        return (
+            session is not None
+            and str(resolution // MICROSECOND) in session["resolutions"]
+        )
+
+    def stats(
+        self, session_id: str, resolution: timedelta
+    ) -> Tuple[np.array, np.array]:
+        """Returns the mean and standard deviation of every stored feature of a session
+
+        :param session_id: id of the session
+        :type session_id: str
+        :param resolution: interpolation resolution
+        :type resolution: timedelta
+        :return: mean and standard deviation, in the column order of the store
+        :rtype: Tuple[np.array, np.array]
+        """
+        with self.__lock:
+            stored = self.__meta["sessions"][session_id]["resolutions"][
+                str(resolution // MICROSECOND)
+            ]
+        return np.array(stored["mean"]), np.array(stored["std"])
+
+    def update(self, connection: MongoDBConnection, chunk_size: int = 100000) -> int:
+        """Writes the matrices of new sessions and rewrites sessions with new data
+
+        :param connection: connection to the mongoDB
+        :type connection: MongoDBConnection
+        :param chunk_size: number of grid rows resampled at once, defaults to 100000
+        :type chunk_size: int, optional
+        :return: number of written matrices
+        :rtype: int
+        """
+        c_type = next(iter(self.features))
+        session_ids = set(connection.get_session_ids()) | set(
+            connection.get_collection_by_type(c_type).session_ids()
+        )
+        count = 0
+        for session_id in sorted(session_ids):
+            extent = connection.get_session_extent(session_id, list(self.features))
+            if extent is None:
+                continue
+            start, end, _ = extent
+            with self.__lock:
+                stored = self.__meta["sessions"].get(session_id)
+            if (
+                stored is not None
+                and stored["start"] == start.isoformat()
+                and stored["end"] == end.isoformat()
+            ):
+                continue
+            session = {"start": start.isoformat(), "end": end.isoformat()}
+            session["resolutions"] = {}
+            for resolution in self.resolutions:
+                stats = self.__write(
+                    connection, session_id, start, end, resolution, chunk_size
+                )
+                if stats is not None:
+                    session["resolutions"][str(resolution // MICROSECOND)] = stats
+                    count += 1
+            with self.__lock:
+                self.__meta["sessions"][session_id] = session
+                self.__meta["generation"][1] += 1
+                self.__save()
+        return count
+
+    def __write(
+        self,
+        connection: MongoDBConnection,
+        session_id: str,
+        start: datetime,
+        end: datetime,
+        resolution: timedelta,
+        chunk_size: int,
+    ) -> dict:
+        """Resamples a session and writes its matrices, see update
+
+        :return: dict with the number of rows and the mean and standard deviation of
+        every feature or None if the session has no data
+        :rtype: dict
+        """
+        os.makedirs(
+            os.path.dirname(self.__file(session_id, resolution, "data")), exist_ok=True
+        )
+        rows = grid_size(start, end, resolution)
+        columns = sum(len(self.features[c_type]) - 1 for c_type in self.features)
+        files = {
+            kind: self.__file(session_id, resolution, kind)
+            for kind in ("data", "left", "right")
+        }
+        data = np.lib.format.open_memmap(
+            files["data"] + ".tmp", "w+", np.float32, (rows, columns)
+        )
+        left = np.lib.format.open_memmap(
+            files["left"] + ".tmp", "w+", np.int64, (rows, len(self.features))
+        )
+        right = np.lib.format.open_memmap(
+            files["right"] + ".tmp", "w+", np.int64, (rows, len(self.features))
+        )
+        total = np.zeros(columns)
+        squares = np.zeros(columns)
+        written = 0
+        for chunk in iter_chunks(
+            connection,
+            self.features,
+            start,
+            end,
+            resolution,
+            chunk_size=chunk_size,
+            session_id=session_id,
+        ):
+            data[chunk.offset : chunk.offset + len(chunk)] = chunk.data
+            left[chunk.offset : chunk.offset + len(chunk)] = chunk.left
+            right[chunk.offset : chunk.offset + len(chunk)] = chunk.right
+            total += chunk.data.sum(axis=0)
+            squares += (chunk.data**2).sum(axis=0)
+            written = chunk.offset + len(chunk)
+        for array in (data, left, right):
+            array.flush()
+        del data, left, right
+        if written < rows:
+            for file_name in files.values():
+                os.remove(file_name + ".tmp")
+            return None
+        for file_name in files.values():
+            os.replace(file_name + ".tmp", file_name)
+        mean = total / rows
+        return {
+            "rows": rows,
+            "mean": mean.tolist(),
+            "std": np.sqrt(np.maximum(squares / rows - mean**2, 0.0)).tolist(),
+        }
+
+    def load(self, session_id: str, resolution: timedelta) -> ResampledRange:
+        """Opens the matrix of a session memory-mapped
+
+        :param session_id: id of the session
+        :type session_id: str
+        :param resolution: interpolation resolution
+        :type resolution: timedelta
+        :return: the whole session as float32 ResampledRange, nothing is read until
+        the data is accessed
+        :rtype: ResampledRange
+        """
+        with self.__lock:
+            start = datetime.fromisoformat(self.__meta["sessions"][session_id]["start"])
+        arrays = [
+            np.load(self.__file(session_id, resolution, kind), mmap_mode="r")
+            for kind in ("data", "left", "right")
+        ]
+        return ResampledRange(start, resolution, 0, *arrays)
+
+    def chunks(
+        self,
+        session_id: str,
+        resolution: timedelta,
+        columns: np.array = None,
+        first: int = 0,
+        last: int = None,
+        overlap: int = 0,
+        chunk_size: int = None,
+    ) -> Generator[ResampledRange, None, None]:
+        """Reads the rows of a session in chunks of float64 arrays, like prefetch.iter_chunks
+
+        :param session_id: id of the session
+        :type session_id: str
+        :param resolution: interpolation resolution
+        :type resolution: timedelta
+        :param columns: columns to read, defaults to all
+        :type columns: np.array, optional
+        :param first: first row, defaults to 0
+        :type first: int, optional
+        :param last: last row, defaults to the last row of the session
+        :type last: int, optional
+        :param overlap: number of rows repeated from the previous chunk, defaults to 0
+        :type overlap: int, optional
+        :param chunk_size: number of rows read at once, None reads all rows at once
+        :type chunk_size: int, optional
+        :yield: the chunks, the row indices are relative to the first row of the session
+        :rtype: Generator[ResampledRange, None, None]
+        """
+        stored = self.load(session_id, resolution)
+        last = len(stored) - 1 if last is None else min(last, len(stored) - 1)
+        size = last - first + 1 if chunk_size is None else max(chunk_size, overlap + 1)
+        row = max(first, 0)
+        while row <= last:
+            end = min(row + size, last + 1)
+            data = stored.data[row:end]
+            if columns is not None:
+                data = data[:, columns]
+            yield ResampledRange(
+                stored.start,
+                resolution,
+                row,
+                np.ascontiguousarray(data, dtype=np.float64),
+                np.asarray(stored.left[row:end]),
+                np.asarray(stored.right[row:end]),
+            )
+            if end > last:
+                return
+            row = end - overlap
+
+    def windows(
+        self,
+        session_id: str,
+        resolution: timedelta,
+        columns: np.array,
+        start: datetime,
+        end: datetime,
+        length: int,
+        step: int,
+        chunk_size: int = None,
+    ) -> Generator[Tuple[datetime, np.array], None, None]:
+        """Generates the windows of a session between start and end, like prefetch.iter_windows
+
+        The windows start at every step-th row of the grid of the session.
+
+        :param session_id: id of the session
+        :type session_id: str
+        :param resolution: interpolation resolution
+        :type resolution: timedelta
+        :param columns: columns of the windows
+        :type columns: np.array
+        :param start: first possible start of a window
+        :type start: datetime
+        :param end: windows have to end before the first grid row at or after this time
+        :type end: datetime
+        :param length: number of rows of a window
+        :type length: int
+        :param step: number of rows between two windows
+        :type step: int
+        :param chunk_size: number of rows read at once, None reads all rows at once
+        :type chunk_size: int, optional
+        :yield: start time of the window and the window as view into the chunk
+        :rtype: Generator[Tuple[datetime, np.array], None, None]
+        """
+        with self.__lock:
+            session_start = datetime.fromisoformat(
+                self.__meta["sessions"][session_id]["start"]
+            )
+        first = max(math.ceil((start - session_start) / resolution), 0)
+        last = math.ceil((end - session_start) / resolution)
+        for chunk in self.chunks(
+            session_id, resolution, columns, first, last, length - 1, chunk_size
+        ):
+            yield from chunk.windows(length, step, first, last - length + 1)
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+
+class SearchSnapshot:
+    """Intermediate or final state of an incremental search, see Searcher.iter_search
+
+    A snapshot can be pickled and passed as resume to a later search with the same
+    query, which then continues after position.
+    """
+
+    def __init__(
+        self,
+        results: list,
+        position: datetime,
+        complete: bool,
+        elapsed: timedelta,
+    ):
+        """Initializes a snapshot
+
+        :param results: list of the best SearchResult objects so far, sorted by distance
+        :type results: list
+        :param position: start time of the last compared window, None if no window
+        was compared yet
+        :type position: datetime
+        :param complete: true if all windows of the query were compared
+        :type complete: bool
+        :param elapsed: time since the start of the search
+        :type elapsed: timedelta
+        """
+        self.results = results
+        self.position = position
+        self.complete = complete
+        self.elapsed = elapsed
+
+    def __repr__(self) -> str:
+        return (
+            "SearchSnapshot(results={}, position={}, complete={}, elapsed={})".format(
+                len(self.results), self.position, self.complete, self.elapsed
+            )
+        )
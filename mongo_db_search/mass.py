@@ -0,0 +1,185 @@
+from datetime import datetime
+from typing import Generator, List, Tuple
+import numpy as np
+from scipy import fft
+from mongo_db_search.prefetch import ResampledRange
+from mongo_db_search.topk import SearchResult, TopK
+
+# Standard deviations below this value are treated as constant sequences
+EPSILON = 1e-8
+
+
+def sliding_dot_product(query: np.array, data: np.array) -> np.array:
+    """Dot products of the query with every window of the data, per feature,
+    calculated as convolution with the FFT in O(n log n)
+
+    :param query: query with shape (length, features)
+    :type query: np.array
+    :param data: data with shape (rows, features), at least as long as the query
+    :type data: np.array
+    :return: dot products with shape (rows - length + 1, features)
+    :rtype: np.array
+    """
+    length, rows = len(query), len(data)
+    size = fft.next_fast_len(rows + length - 1, real=True)
+    product = fft.rfft(data, size, axis=0) * fft.rfft(query[::-1], size, axis=0)
+    return fft.irfft(product, size, axis=0)[length - 1 : rows]
+
+
+def moving_mean_std(data: np.array, length: int) -> Tuple[np.array, np.array]:
+    """Mean and standard deviation of every window of the data, per feature
+
+    :param data: data with shape (rows, features)
+    :type data: np.array
+    :param length: number of rows of a window
+    :type length: int
+    :return: mean and standard deviation with shape (rows - length + 1, features)
+    :rtype: Tuple[np.array, np.array]
+    """
+    # centering keeps the cumulative sums small, which reduces the cancellation
+    center = data.mean(axis=0)
+    centered = data - center
+    zeros = np.zeros((1, data.shape[1]))
+    sums = np.cumsum(np.vstack([zeros, centered]), axis=0)
+    squares = np.cumsum(np.vstack([zeros, centered**2]), axis=0)
+    mean = (sums[length:] - sums[:-length]) / length
+    variance = (squares[length:] - squares[:-length]) / length - mean**2
+    return mean + center, np.sqrt(np.maximum(variance, 0.0))
+
+
+def constant_windows(data: np.array, length: int) -> np.array:
+    """Checks which windows of the data are constant, per feature. Unlike a small standard
+    deviation of moving_mean_std, which suffers from cancellation for large values, this is exact
+
+    :param data: data with shape (rows, features)
+    :type data: np.array
+    :param length: number of rows of a window
+    :type length: int
+    :return: boolean array with shape (rows - length + 1, features)
+    :rtype: np.array
+    """
+    # number of value changes up to every row
+    changes = np.cumsum(
+        np.vstack([np.zeros((1, data.shape[1]), dtype=bool), data[1:] != data[:-1]]),
+        axis=0,
+    )
+    return changes[length - 1 :] == changes[: len(data) - length + 1]
+
+
+def distance_profile(query: np.array, data: np.array) -> np.array:
+    """Multivariate z-normalized euclidean distance of the query to every window
+    of the data (MASS). Every feature is z-normalized on its own and the squared
+    distances of the features are summed up. A constant sequence is z-normalized to zeros.
+
+    :param query: query with shape (length, features)
+    :type query: np.array
+    :param data: data with shape (rows, features), at least as long as the query
+    :type data: np.array
+    :return: distances with shape (rows - length + 1,)
+    :rtype: np.array
+    """
+    length = len(query)
+    query_mean, query_std = query.mean(axis=0), query.std(axis=0)
+    mean, std = moving_mean_std(data, length)
+    dot = sliding_dot_product(query, data)
+    query_constant = query_std < EPSILON
+    constant = constant_windows(data, length) | (std < EPSILON)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = (dot - length * query_mean * mean) / (length * query_std * std)
+    squared = 2 * length * (1 - np.clip(correlation, -1.0, 1.0))
+    squared = np.where(constant | query_constant, length, squared)
+    squared = np.where(constant & query_constant, 0.0, squared)
+    return np.sqrt(np.sum(squared, axis=1))
+
+
+def mass_search(
+    seq: np.array,
+    chunks: Generator[ResampledRange, None, None],
+    topk: TopK,
+    step: int = 1,
+    last: int = None,
+) -> Generator[Tuple[datetime, int], None, None]:
+    """Adds the windows with the smallest z-normalized distance to topk
+
+    :param seq: numpy array to search for
+    :type seq: np.array
+    :param chunks: chunks of the search range, which repeat the last len(seq) - 1 rows
+    of the previous chunk, see prefetch.iter_chunks
+    :type chunks: Generator[ResampledRange, None, None]
+    :param topk: collects the best results
+    :type topk: TopK
+    :param step: number of rows between two windows, defaults to 1
+    :type step: int, optional
+    :param last: largest global start index of a window, defaults to None
+    :type last: int, optional
+    :yield: time of the last window of a chunk and the number of windows of the chunk
+    :rtype: Generator[Tuple[datetime, int], None, None]
+    """
+    length = len(seq)
+    for chunk in chunks:
+        if len(chunk) < length:
+            continue
+        starts = chunk.offset + np.arange(len(chunk) - length + 1)
+        keep = chunk.valid(length) & (starts % step == 0)
+        if last is not None:
+            keep &= starts <= last
+        if not np.any(keep):
+            continue
+        distances = distance_profile(seq, chunk.data)[keep]
+        starts = starts[keep]
+        for i in np.argsort(distances, kind="stable"):
+            if distances[i] > topk.threshold:
+                break
+            topk.push(
+                SearchResult(
+                    float(distances[i]),
+                    chunk.timestamp(int(starts[i])),
+                    length * chunk.resolution,
+                )
+            )
+        yield chunk.timestamp(int(starts[-1])), len(starts)
+
+
+def mass_candidates(
+    seq: np.array,
+    chunks: Generator[ResampledRange, None, None],
+    count: int,
+    step: int = 1,
+    last: int = None,
+) -> List[Tuple[datetime, np.array]]:
+    """Selects the windows with the smallest z-normalized distance as candidates
+    for an exact search, e.g. with dtw
+
+    :param seq: numpy array to search for
+    :type seq: np.array
+    :param chunks: see mass_search
+    :type chunks: Generator[ResampledRange, None, None]
+    :param count: number of candidates
+    :type count: int
+    :param step: number of rows between two windows, defaults to 1
+    :type step: int, optional
+    :param last: largest global start index of a window, defaults to None
+    :type last: int, optional
+    :return: list of (timestamp, window) tuples sorted by time
+    :rtype: List[Tuple[datetime, np.array]]
+    """
+    topk = TopK(count)
+    windows = {}
+
+    def keep_windows() -> Generator[ResampledRange, None, None]:
+        for chunk in chunks:
+            yield chunk
+            # windows of the chunk, which are still among the candidates, are copied
+            # before the chunk is released
+            for result in topk.results():
+                if result.start not in windows:
+                    index = round((result.start - chunk.start) / chunk.resolution)
+                    windows[result.start] = chunk.window(index, len(seq)).copy()
+            kept = set(result.start for result in topk.results())
+            for start in list(windows):
+                if start not in kept:
+                    del windows[start]
+
+    for _ in mass_search(seq, keep_windows(), topk, step, last):
+        pass
+    return sorted(windows.items(), key=lambda item: item[0])
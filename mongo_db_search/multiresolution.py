@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from typing import Generator, List, Tuple
+
+
+class SearchLevel:
+    """Timing and counts of one level of a coarse-to-fine search"""
+
+    def __init__(self, name: str, resolution: timedelta):
+        """Initializes the report of a level
+
+        :param name: name of the level, e.g. "coarse" or "fine"
+        :type name: str
+        :param resolution: interpolation resolution of the level
+        :type resolution: timedelta
+        """
+        self.name = name
+        self.resolution = resolution
+        self.windows = 0
+        self.candidates = 0
+        self.duration = timedelta(0)
+
+    def count(self, windows: Generator) -> Generator:
+        """Counts the compared windows of a generator of (timestamp, sequence) tuples
+
+        :param windows: generator of (timestamp, sequence) tuples, a sequence of None is skipped
+        :type windows: Generator
+        :yield: the tuples of windows
+        :rtype: Generator
+        """
+        for i, seq2 in windows:
+            if seq2 is not None:
+                self.windows += 1
+            yield i, seq2
+
+    def __str__(self) -> str:
+        return "{} level ({}): {} windows, {} candidates in {}".format(
+            self.name, self.resolution, self.windows, self.candidates, self.duration
+        )
+
+
+def candidate_regions(
+    starts: List[datetime],
+    radius: timedelta,
+    start: datetime,
+    last: datetime,
+    resolution: timedelta,
+) -> List[Tuple[datetime, datetime]]:
+    """Merges the neighborhoods of the start times of candidate windows into regions
+
+    :param starts: start times of the candidate windows
+    :type starts: List[datetime]
+    :param radius: a neighborhood reaches radius before and after the start time
+    :type radius: timedelta
+    :param start: starting time of the search range, the regions are aligned to its grid
+    :type start: datetime
+    :param last: latest start time of a window
+    :type last: datetime
+    :param resolution: resolution of the grid the regions are aligned to
+    :type resolution: timedelta
+    :return: sorted list of disjoint (first start time, last start time) tuples
+    :rtype: List[Tuple[datetime, datetime]]
+    """
+    regions = []
+    for i in sorted(starts):
+        first = max(start + ((i - radius - start) // resolution) * resolution, start)
+        end = min(i + radius, last)
+        if first > end:
+            continue
+        if regions and first <= regions[-1][1] + resolution:
+            regions[-1] = (regions[-1][0], max(regions[-1][1], end))
+        else:
+            regions.append((first, end))
+    return regions
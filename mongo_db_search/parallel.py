@@ -0,0 +1,206 @@
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Generator, Tuple
+import numpy as np
+from dtaidistance import dtw_ndim
+from mongo_db_search.pruning import PruningCascade, PruningStats, with_tolerance
+from mongo_db_search.topk import SearchResult, TopK
+
+
+def score_batch(
+    seq: np.array,
+    batch: list,
+    distance_function: callable,
+    topk: TopK,
+    length: timedelta,
+    prune: bool = False,
+    window: int = None,
+    bound: float = math.inf,
+) -> Tuple[list, PruningStats]:
+    """Calculates the distances of a batch of windows and keeps the best ones
+
+    :param seq: numpy array to search for
+    :type seq: np.array
+    :param batch: list of (timestamp, sequence) tuples
+    :type batch: list
+    :param distance_function: distance function used for calculation
+    :type distance_function: callable
+    :param topk: empty TopK which collects the best results of the batch
+    :type topk: TopK
+    :param length: duration of the windows
+    :type length: timedelta
+    :param prune: reject windows with a PruningCascade, defaults to False
+    :type prune: bool, optional
+    :param window: warping window of the distance function
+    :type window: int, optional
+    :param bound: threshold of the results of previous batches
+    :type bound: float, optional
+    :return: list of the best SearchResult objects of the batch and the pruning stats
+    :rtype: Tuple[list, PruningStats]
+    """
+    cascade = PruningCascade(seq, distance_function, window=window)
+    for i, seq2 in batch:
+        if prune:
+            distance = cascade.distance(seq2, min(topk.threshold, bound))
+            if distance is None:
+                continue
+        else:
+            distance = distance_function(seq, seq2)
+        topk.push(SearchResult(distance, i, length))
+    return topk.results(), cascade.stats
+
+
+def score_batch_c(
+    seq: np.array,
+    batch: list,
+    topk: TopK,
+    length: timedelta,
+    prune: bool = False,
+    window: int = None,
+    bound: float = math.inf,
+) -> Tuple[list, PruningStats]:
+    """Calculates the dtw distances of a batch of windows with the parallel C
+    implementation of dtaidistance (OpenMP, uses OMP_NUM_THREADS threads)
+
+    :param seq: numpy array to search for
+    :type seq: np.array
+    :param batch: list of (timestamp, sequence) tuples
+    :type batch: list
+    :param topk: empty TopK which collects the best results of the batch
+    :type topk: TopK
+    :param length: duration of the windows
+    :type length: timedelta
+    :param prune: reject windows with LB_Kim/LB_Keogh and early abandon the others
+    at the bound, defaults to False
+    :type prune: bool, optional
+    :param window: warping window of the dtw
+    :type window: int, optional
+    :param bound: threshold of the results of previous batches
+    :type bound: float, optional
+    :return: list of the best SearchResult objects of the batch and the pruning stats
+    :rtype: Tuple[list, PruningStats]
+    """
+    cascade = PruningCascade(seq, None, window=window)
+    max_dist = None
+    if prune:
+        batch = [(i, seq2) for i, seq2 in batch if cascade.bounds(seq2, bound)]
+        max_dist = None if math.isinf(bound) else with_tolerance(bound)
+    if len(batch) == 0:
+        return [], cascade.stats
+    distances = dtw_ndim.distance_matrix_fast(
+        [seq] + [seq2 for _, seq2 in batch],
+        block=((0, 1), (1, len(batch) + 1)),
+        compact=True,
+        parallel=True,
+        max_dist=max_dist,
+        window=window,
+    )
+    for (i, _), distance in zip(batch, distances):
+        if math.isinf(distance):
+            cascade.stats.abandoned += 1
+        else:
+            topk.push(SearchResult(distance, i, length))
+    return topk.results(), cascade.stats
+
+
+def iter_batches(
+    windows: Generator, batch_size: int
+) -> Generator[Tuple[datetime, list], None, None]:
+    """Groups the windows of a generator into lists, windows of None are dropped
+
+    :param windows: generator of (timestamp, sequence) tuples
+    :type windows: Generator
+    :param batch_size: maximum number of windows in one batch
+    :type batch_size: int
+    :yield: timestamp of the last window and list of (timestamp, sequence) tuples
+    :rtype: Generator[Tuple[datetime, list], None, None]
+    """
+    windows = iter(windows)
+    while True:
+        batch = list(islice(windows, batch_size))
+        if len(batch) == 0:
+            return
+        yield batch[-1][0], [(i, seq2) for i, seq2 in batch if seq2 is not None]
+
+
+def score_windows(
+    seq: np.array,
+    distance_function: callable,
+    windows: Generator,
+    topk: TopK,
+    length: timedelta,
+    workers: int = None,
+    batch_size: int = 256,
+    use_c: bool = False,
+    prune: bool = False,
+    window: int = None,
+) -> Generator[Tuple[datetime, PruningStats, bool], None, None]:
+    """Calculates the distances of all windows in parallel and adds the results to topk
+
+    The windows are split into batches which are scored by a process pool (or by the
+    parallel C implementation of dtaidistance), every batch returns its best results,
+    which are merged into topk. As the results are ordered by distance and start time,
+    the merged result equals the result of a serial calculation (except for greedy
+    overlap suppression). With pruning, every batch uses the threshold of topk at its
+    submission as bound.
+
+    :param seq: numpy array to search for
+    :type seq: np.array
+    :param distance_function: distance function used for calculation, has to be picklable
+    :type distance_function: callable
+    :param windows: generator of (timestamp, sequence) tuples, a sequence of None is skipped
+    :type windows: Generator
+    :param topk: collects the best results
+    :type topk: TopK
+    :param length: duration of the windows
+    :type length: timedelta
+    :param workers: number of processes, None uses all cores
+    :type workers: int, optional
+    :param batch_size: number of windows per batch, defaults to 256
+    :type batch_size: int, optional
+    :param use_c: score the batches with the parallel C dtw instead of a process pool
+    :type use_c: bool, optional
+    :param prune: reject windows with a PruningCascade, defaults to False
+    :type prune: bool, optional
+    :param window: warping window of the distance function, used for pruning
+    :type window: int, optional
+    :yield: timestamp of the last window of a merged batch, the pruning stats of the batch
+    and whether topk changed
+    :rtype: Generator[Tuple[datetime, PruningStats, bool], None, None]
+    """
+    batches = iter_batches(windows, batch_size)
+    if use_c:
+        for last, batch in batches:
+            results, stats = score_batch_c(
+                seq, batch, topk.empty(), length, prune, window, topk.threshold
+            )
+            yield last, stats, topk.merge(results)
+        return
+    workers = os.cpu_count() if workers is None else workers
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for last, batch in batches:
+            future = executor.submit(
+                score_batch,
+                seq,
+                batch,
+                distance_function,
+                topk.empty(),
+                length,
+                prune,
+                window,
+                topk.threshold,
+            )
+            pending.append((last, future))
+            while len(pending) >= 2 * workers or (pending and pending[0][1].done()):
+                last, future = pending.popleft()
+                results, stats = future.result()
+                yield last, stats, topk.merge(results)
+        while pending:
+            last, future = pending.popleft()
+            results, stats = future.result()
+            yield last, stats, topk.merge(results)
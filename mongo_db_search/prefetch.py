@@ -0,0 +1,322 @@
+import math
+from datetime import datetime, timedelta
+from typing import Generator, Tuple
+import numpy as np
+from mongo_db.mongodb_connection import MongoDBConnection
+from mongo_db_search.resample import MICROSECOND, interpolate_columns, to_columns
+
+
+class ResampledRange:
+    """A block of consecutive rows of the resampled time grid of a search range
+
+    Besides the resampled data, it stores for every row and collection how many
+    measurements lie before (left) and at or before (right) the row's time, which
+    allows to check whether a window contains measurements of every collection.
+    """
+
+    def __init__(
+        self,
+        start: datetime,
+        resolution: timedelta,
+        offset: int,
+        data: np.array,
+        left: np.array,
+        right: np.array,
+    ):
+        self.start = start
+        self.resolution = resolution
+        self.offset = offset
+        self.data = data
+        self.left = left
+        self.right = right
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def timestamp(self, index: int) -> datetime:
+        """Returns the time of a global grid index
+
+        :param index: global index of the grid row
+        :type index: int
+        :return: time of the grid row
+        :rtype: datetime
+        """
+        return self.start + index * self.resolution
+
+    def window(self, index: int, length: int) -> np.array:
+        """Returns a window as view into the data, without copying it
+
+        :param index: global index of the first row
+        :type index: int
+        :param length: number of rows
+        :type length: int
+        :return: view of the window
+        :rtype: np.array
+        """
+        i = index - self.offset
+        return self.data[i : i + length]
+
+    def has_data(self, index: int, length: int) -> bool:
+        """Checks if every collection has at least one measurement inside a window
+
+        :param index: global index of the first row
+        :type index: int
+        :param length: number of rows
+        :type length: int
+        :return: true if measurements of all collections are inside the window
+        :rtype: bool
+        """
+        i = index - self.offset
+        return bool(np.all(self.right[i + length - 1] - self.left[i] > 0))
+
+    def valid(self, length: int, collections: np.array = None) -> np.array:
+        """Checks has_data for all windows of the block at once
+
+        :param length: number of rows of a window
+        :type length: int
+        :param collections: indices of the collections to check, defaults to all
+        :type collections: np.array, optional
+        :return: boolean array with one entry per window start inside the block
+        :rtype: np.array
+        """
+        count = len(self) - length + 1
+        if count <= 0:
+            return np.zeros(0, dtype=bool)
+        counts = self.right[length - 1 :] - self.left[:count]
+        if collections is not None:
+            counts = counts[:, collections]
+        return np.all(counts > 0, axis=1)
+
+    def windows(
+        self, length: int, step: int, first: int = None, last: int = None
+    ) -> Generator[Tuple[datetime, np.array], None, None]:
+        """Generates all windows containing data of all collections
+
+        :param length: number of rows of a window
+        :type length: int
+        :param step: number of rows between two windows (relative to global index 0)
+        :type step: int
+        :param first: smallest global start index, defaults to the first row
+        :type first: int, optional
+        :param last: largest global start index, defaults to the last possible window
+        :type last: int, optional
+        :yield: start time of the window and the window
+        :rtype: Generator[Tuple[datetime, np.array], None, None]
+        """
+        first = self.offset if first is None else max(first, self.offset)
+        last_possible = self.offset + len(self) - length
+        last = last_possible if last is None else min(last, last_possible)
+        index = math.ceil(first / step) * step
+        while index <= last:
+            if self.has_data(index, length):
+                yield self.timestamp(index), self.window(index, length)
+            index += step
+
+
+def grid_size(start: datetime, end: datetime, resolution: timedelta) -> int:
+    """Number of rows of the time grid of a search range
+
+    :param start: starting time of the range
+    :type start: datetime
+    :param end: end time of the range
+    :type end: datetime
+    :param resolution: interpolation resolution
+    :type resolution: timedelta
+    :return: number of grid rows
+    :rtype: int
+    """
+    return math.ceil((end - start) / resolution) + 1
+
+
+def iter_chunks(
+    connection: MongoDBConnection,
+    features: dict,
+    start: datetime,
+    end: datetime,
+    resolution: timedelta,
+    overlap: int = 0,
+    chunk_size: int = None,
+    session_id: str = None,
+) -> Generator[ResampledRange, None, None]:
+    """Fetches and resamples a search range in chunks of consecutive grid rows
+
+    Every chunk repeats the last `overlap` rows of the previous chunk, so that windows of
+    length overlap + 1 can be taken from single chunks. The measurements next to a
+    chunk border are carried over to the next chunk, therefore the chunked result is
+    identical to resampling the whole range at once. Measurements are only fetched once.
+
+    :param connection: connection to the mongoDB
+    :type connection: MongoDBConnection
+    :param features: dict<CollectionType, list of features>, see SearchQuery.selected_features
+    :type features: dict
+    :param start: starting time of the range, the first grid row
+    :type start: datetime
+    :param end: end time of the range
+    :type end: datetime
+    :param resolution: interpolation resolution
+    :type resolution: timedelta
+    :param overlap: number of rows repeated from the previous chunk, defaults to 0
+    :type overlap: int, optional
+    :param chunk_size: number of grid rows fetched at once, None fetches the whole range
+    :type chunk_size: int, optional
+    :param session_id: only data of this session, defaults to None (all sessions)
+    :type session_id: str, optional
+    :yield: the resampled chunks
+    :rtype: Generator[ResampledRange, None, None]
+    """
+    size = grid_size(start, end, resolution)
+    step = resolution // MICROSECOND
+    fetch_duration = end - start if chunk_size is None else chunk_size * resolution
+    carry = {c_type: [] for c_type in features}
+    consumed = {c_type: 0 for c_type in features}
+    tail = None
+    row = 0
+    fetch_start = start
+    fetched_until = None
+    while row < size:
+        fetch_end = min(fetch_start + fetch_duration, end)
+        result = connection.get_numeric_sensor_data_by_time(
+            fetch_start, fetch_end, features, session_id
+        )
+        for c_type in features:
+            new = result[c_type]
+            if fetched_until is not None:
+                new = [m for m in new if m["timestamp"] > fetched_until]
+            carry[c_type].extend(new)
+        fetched_until = fetch_end
+        fetch_start = fetch_end
+        final = fetch_end >= end
+        if any(len(carry[c_type]) == 0 for c_type in features):
+            if final:
+                return
+            continue
+        columns = {c_type: to_columns(carry[c_type], start) for c_type in features}
+        if final:
+            rows = size
+        else:
+            known = min(columns[c_type].times[-1] for c_type in features)
+            rows = min(int(known // step) + 1, size)
+        if rows <= row:
+            continue
+        grid = np.arange(row, rows, dtype=np.float64) * step
+        data = np.hstack(
+            [interpolate_columns(columns[c_type], grid) for c_type in features]
+        )
+        left = np.stack(
+            [
+                np.searchsorted(columns[c_type].times, grid, side="left")
+                + consumed[c_type]
+                for c_type in features
+            ],
+            axis=1,
+        )
+        right = np.stack(
+            [
+                np.searchsorted(columns[c_type].times, grid, side="right")
+                + consumed[c_type]
+                for c_type in features
+            ],
+            axis=1,
+        )
+        offset = row
+        if tail is not None:
+            offset -= len(tail)
+            data = np.vstack([tail.data, data])
+            left = np.vstack([tail.left, left])
+            right = np.vstack([tail.right, right])
+        chunk = ResampledRange(start, resolution, offset, data, left, right)
+        yield chunk
+        keep = max(len(chunk) - overlap, 0)
+        tail = ResampledRange(
+            start, resolution, offset + keep, data[keep:], left[keep:], right[keep:]
+        )
+        row = rows
+        if row < size:
+            for c_type in features:
+                keep = max(
+                    int(
+                        np.searchsorted(columns[c_type].times, row * step, side="right")
+                    )
+                    - 1,
+                    0,
+                )
+                carry[c_type] = carry[c_type][keep:]
+                consumed[c_type] += keep
+
+
+def load_range(
+    connection: MongoDBConnection,
+    features: dict,
+    start: datetime,
+    end: datetime,
+    resolution: timedelta,
+) -> ResampledRange:
+    """Fetches and resamples a whole search range with one query per collection
+
+    :param connection: connection to the mongoDB
+    :type connection: MongoDBConnection
+    :param features: dict<CollectionType, list of features>, see SearchQuery.selected_features
+    :type features: dict
+    :param start: starting time of the range, the first grid row
+    :type start: datetime
+    :param end: end time of the range
+    :type end: datetime
+    :param resolution: interpolation resolution
+    :type resolution: timedelta
+    :return: the resampled range or None if a collection has no data in the range
+    :rtype: ResampledRange
+    """
+    for chunk in iter_chunks(connection, features, start, end, resolution):
+        return chunk
+    return None
+
+
+def iter_windows(
+    connection: MongoDBConnection,
+    features: dict,
+    start: datetime,
+    end: datetime,
+    resolution: timedelta,
+    length: int,
+    step: int,
+    chunk_size: int = None,
+    session_id: str = None,
+) -> Generator[Tuple[datetime, np.array], None, None]:
+    """Generates all windows of a search range from chunked prefetched data
+
+    A window starts at every step-th grid row and has to end before `end`,
+    windows without measurements of all collections are skipped.
+
+    :param connection: connection to the mongoDB
+    :type connection: MongoDBConnection
+    :param features: dict<CollectionType, list of features>, see SearchQuery.selected_features
+    :type features: dict
+    :param start: starting time of the range
+    :type start: datetime
+    :param end: end time of the range
+    :type end: datetime
+    :param resolution: interpolation resolution
+    :type resolution: timedelta
+    :param length: number of rows of a window
+    :type length: int
+    :param step: number of rows between two windows
+    :type step: int
+    :param chunk_size: number of grid rows fetched at once, None fetches the whole range
+    :type chunk_size: int, optional
+    :param session_id: only data of this session, defaults to None (all sessions)
+    :type session_id: str, optional
+    :yield: start time of the window and the window as view into the chunk
+    :rtype: Generator[Tuple[datetime, np.array], None, None]
+    """
+    last = grid_size(start, end, resolution) - length
+    for chunk in iter_chunks(
+        connection,
+        features,
+        start,
+        end,
+        resolution,
+        length - 1,
+        chunk_size,
+        session_id,
+    ):
+        yield from chunk.windows(length, step, last=last)
@@ -0,0 +1,295 @@
+import threading
+import time
+from datetime import datetime
+from typing import Generator, Tuple
+import numpy as np
+from bson import encode
+from mongo_db.mongodb_connection import MongoDBConnection
+from mongo_db_search.pruning import PruningStats
+
+PERCENTILES = (50, 90, 99)
+
+
+class SearchProfile:
+    """Timings and counts of the stages of a search, collected by Searcher.explain
+
+    All times are wall clock seconds. The fetches are counted by a ProfiledConnection,
+    the windows and distance calculations by the Searcher. A search can use several
+    threads (sessions), therefore all counters are protected by a lock.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.results = []
+        self.total_seconds = 0.0
+        self.fetches = 0
+        self.documents = 0
+        self.bytes = 0
+        self.fetch_seconds = 0.0
+        self.measure_seconds = 0.0
+        self.resample_seconds = 0.0
+        self.windows = 0
+        self.pruning = PruningStats()
+        self.kernel_calls = 0
+        self.kernel_seconds = 0.0
+        self.window_seconds = []
+        self.profiler_output = None
+
+    def add_fetch(
+        self,
+        seconds: float,
+        documents: int,
+        size: int,
+        measure_seconds: float = 0.0,
+        requests: int = 1,
+    ) -> None:
+        """Records a request to the mongoDB
+
+        :param seconds: duration of the request
+        :type seconds: float
+        :param documents: number of fetched documents
+        :type documents: int
+        :param size: size of the fetched documents in bytes
+        :type size: int
+        :param measure_seconds: time needed to count the documents and their size,
+        neither fetch nor resample time, defaults to 0.0
+        :type measure_seconds: float, optional
+        :param requests: number of requests, 0 for documents of a stream, defaults to 1
+        :type requests: int, optional
+        """
+        with self.__lock:
+            self.fetches += requests
+            self.documents += documents
+            self.bytes += size
+            self.fetch_seconds += seconds
+            self.measure_seconds += measure_seconds
+
+    def add_resample(self, seconds: float) -> None:
+        """Records time spent resampling (or reading a FeatureStore or SaxIndex)
+
+        :param seconds: duration without fetches
+        :type seconds: float
+        """
+        with self.__lock:
+            self.resample_seconds += seconds
+
+    def add_pruning(self, stats: PruningStats) -> None:
+        """Adds the pruning stats of a search stage
+
+        :param stats: the stats of the stage
+        :type stats: PruningStats
+        """
+        with self.__lock:
+            self.pruning.merge(stats)
+
+    def add_window(self, seconds: float) -> None:
+        """Records the time to score one window (bounds and distance)
+
+        :param seconds: duration
+        :type seconds: float
+        """
+        with self.__lock:
+            self.window_seconds.append(seconds)
+
+    def add_kernel(self, seconds: float) -> None:
+        """Records one call of the distance function
+
+        :param seconds: duration
+        :type seconds: float
+        """
+        with self.__lock:
+            self.kernel_calls += 1
+            self.kernel_seconds += seconds
+
+    def windows_of(self, windows: Generator) -> Generator:
+        """Counts the windows of a generator and the time needed to create them
+
+        The fetches of the ProfiledConnection while creating a window and the time to
+        measure them are subtracted, the rest of the time is recorded as resample time.
+
+        :param windows: generator of (timestamp, sequence) tuples
+        :type windows: Generator
+        :yield: the tuples of windows
+        :rtype: Generator
+        """
+        windows = iter(windows)
+        while True:
+            begin = time.perf_counter()
+            fetch_seconds = self.fetch_seconds + self.measure_seconds
+            try:
+                window = next(windows)
+            except StopIteration:
+                window = None
+            fetch_seconds = self.fetch_seconds + self.measure_seconds - fetch_seconds
+            # other threads may fetch at the same time, the resample time is an estimate
+            self.add_resample(max(time.perf_counter() - begin - fetch_seconds, 0.0))
+            if window is None:
+                return
+            if window[1] is not None:
+                with self.__lock:
+                    self.windows += 1
+            yield window
+
+    def kernel(self, distance_function: callable) -> callable:
+        """Wraps a distance function to count its calls and their duration
+
+        :param distance_function: the distance function
+        :type distance_function: callable
+        :return: the wrapped distance function with the same signature
+        :rtype: callable
+        """
+
+        def timed(*args, **kwargs):
+            begin = time.perf_counter()
+            distance = distance_function(*args, **kwargs)
+            self.add_kernel(time.perf_counter() - begin)
+            return distance
+
+        return timed
+
+    def percentiles(self) -> dict:
+        """Returns the percentiles of the time to score a window
+
+        :return: dict<"p50", "p90", "p99", "max", seconds>, empty without windows
+        :rtype: dict
+        """
+        if len(self.window_seconds) == 0:
+            return {}
+        seconds = np.array(self.window_seconds)
+        result = {
+            "p" + str(q): float(value)
+            for q, value in zip(PERCENTILES, np.percentile(seconds, PERCENTILES))
+        }
+        result["max"] = float(seconds.max())
+        return result
+
+    def report(self) -> dict:
+        """Returns the timings and counts as dict, e.g. to store them as json
+
+        :return: dict with one entry per stage
+        :rtype: dict
+        """
+        return {
+            "total_seconds": self.total_seconds,
+            "results": len(self.results),
+            "fetch": {
+                "requests": self.fetches,
+                "documents": self.documents,
+                "bytes": self.bytes,
+                "seconds": self.fetch_seconds,
+                "measure_seconds": self.measure_seconds,
+            },
+            "resample": {"seconds": self.resample_seconds},
+            "windows": {
+                "generated": self.windows,
+                "pruned": self.pruning.pruned,
+                "lb_kim": self.pruning.kim,
+                "lb_keogh": self.pruning.keogh,
+                "early_abandoned": self.pruning.abandoned,
+                "seconds": self.percentiles(),
+            },
+            "kernel": {"calls": self.kernel_calls, "seconds": self.kernel_seconds},
+        }
+
+    def __str__(self) -> str:
+        percentiles = self.percentiles()
+        lines = [
+            "Total: {:.3f}s, {} results".format(self.total_seconds, len(self.results)),
+            "Fetch: {:.3f}s, {} requests, {} documents, {:.1f} kB".format(
+                self.fetch_seconds, self.fetches, self.documents, self.bytes / 1000
+            ),
+            "Resample: {:.3f}s".format(self.resample_seconds),
+            "Windows: {} generated, {} pruned".format(
+                self.windows, self.pruning.pruned
+            ),
+            "Kernel: {:.3f}s, {} calls".format(self.kernel_seconds, self.kernel_calls),
+        ]
+        if len(percentiles) > 0:
+            lines.append(
+                "Per window: "
+                + ", ".join(
+                    "{} {:.3f}ms".format(name, value * 1000)
+                    for name, value in percentiles.items()
+                )
+            )
+        return "\n".join(lines)
+
+
+class ProfiledConnection:
+    """Wraps a MongoDBConnection and records the fetched sensor data in a SearchProfile
+
+    All other attributes are passed through to the wrapped connection.
+    """
+
+    def __init__(self, connection: MongoDBConnection, profile: SearchProfile):
+        """Initializes the wrapper
+
+        :param connection: the wrapped connection
+        :type connection: MongoDBConnection
+        :param profile: collects the fetches
+        :type profile: SearchProfile
+        """
+        self.__connection = connection
+        self.__profile = profile
+
+    def __getattr__(self, name: str):
+        return getattr(self.__connection, name)
+
+    def get_numeric_sensor_data_by_time(
+        self,
+        timestamp_start: datetime,
+        timestamp_end: datetime,
+        c_types: dict,
+        session_id: str = None,
+        mode: str = "list",
+        batch_size: int = None,
+    ) -> dict:
+        """See MongoDBConnection.get_numeric_sensor_data_by_time
+
+        The documents of the "stream" mode are recorded while they are consumed. The
+        size is the BSON size of the documents, in the "columns" mode the size of
+        the arrays.
+        """
+        begin = time.perf_counter()
+        result = self.__connection.get_numeric_sensor_data_by_time(
+            timestamp_start, timestamp_end, c_types, session_id, mode, batch_size
+        )
+        seconds = time.perf_counter() - begin
+        if mode == "stream":
+            self.__profile.add_fetch(seconds, 0, 0)
+            return {c_type: self.__stream(docs) for c_type, docs in result.items()}
+        begin = time.perf_counter()
+        documents, size = _measure(result, mode)
+        self.__profile.add_fetch(seconds, documents, size, time.perf_counter() - begin)
+        return result
+
+    def __stream(self, documents: Generator) -> Generator:
+        """Records every document of a stream when it is consumed"""
+        documents = iter(documents)
+        while True:
+            begin = time.perf_counter()
+            try:
+                document = next(documents)
+            except StopIteration:
+                return
+            seconds = time.perf_counter() - begin
+            begin = time.perf_counter()
+            size = len(encode(document))
+            self.__profile.add_fetch(
+                seconds, 1, size, time.perf_counter() - begin, requests=0
+            )
+            yield document
+
+
+def _measure(result: dict, mode: str = "list") -> Tuple[int, int]:
+    """Counts the documents of a fetch result and their size"""
+    documents = 0
+    size = 0
+    for docs in result.values():
+        if mode == "columns":
+            documents += len(docs.get("timestamp", ()))
+            size += sum(column.nbytes for column in docs.values())
+        else:
+            documents += len(docs)
+            size += sum(len(encode(doc)) for doc in docs)
+    return documents, size
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+
+class Progress:
+    """Progress of one stage of a search, passed to the progress callback of a Searcher"""
+
+    def __init__(
+        self,
+        stage: str,
+        state: str,
+        percent: float = 0.0,
+        time_left: timedelta = None,
+        position: datetime = None,
+    ):
+        """Initializes a progress report
+
+        :param stage: name of the stage, e.g. "search", "coarse", "fine", "spring" or "mass"
+        :type stage: str
+        :param state: "started", "running" or "done"
+        :type state: str
+        :param percent: progress of the stage in percent, defaults to 0.0
+        :type percent: float, optional
+        :param time_left: estimated time left of the stage, defaults to None
+        :type time_left: timedelta, optional
+        :param position: time of the current window, defaults to None
+        :type position: datetime, optional
+        """
+        self.stage = stage
+        self.state = state
+        self.percent = percent
+        self.time_left = time_left
+        self.position = position
+
+    def __repr__(self) -> str:
+        return "Progress(stage={}, state={}, percent={}, time_left={})".format(
+            self.stage, self.state, self.percent, self.time_left
+        )
+
+
+class ProgressTracker:
+    """Estimates the progress of a stage from the time of the current window
+    and reports it to a callback"""
+
+    def __init__(self, callback: callable, stage: str, start: datetime, end: datetime):
+        """Initializes the tracker and reports the start of the stage
+
+        :param callback: called with a Progress object, None disables the reports
+        :type callback: callable
+        :param stage: name of the stage, see Progress
+        :type stage: str
+        :param start: time of the first window
+        :type start: datetime
+        :param end: time after the last window
+        :type end: datetime
+        """
+        self.callback = callback
+        self.stage = stage
+        self.start = start
+        self.end = end
+        self.begin = datetime.now()
+        if callback is not None:
+            callback(Progress(stage, "started"))
+
+    def update(self, i: datetime) -> None:
+        """Reports the progress at the time of the current window
+
+        :param i: time of the current window
+        :type i: datetime
+        """
+        if self.callback is None:
+            return
+        timesum = datetime.now() - self.begin
+        if self.end > self.start:
+            percent = (i - self.start) / (self.end - self.start) * 100
+        else:
+            percent = 100.0
+        percent = max(min(percent, 100.0), 0.01)
+        self.callback(
+            Progress(
+                self.stage,
+                "running",
+                percent,
+                (timesum / percent) * (100 - percent),
+                i,
+            )
+        )
+
+    def finish(self) -> None:
+        """Reports the end of the stage"""
+        if self.callback is not None:
+            self.callback(Progress(self.stage, "done", 100.0, timedelta(0)))
+
+
+def print_progress(progress: Progress) -> None:
+    """Prints the progress and the estimated time left to stdout
+
+    :param progress: the progress report
+    :type progress: Progress
+    """
+    if progress.state == "started":
+        print("Progress: ")
+    elif progress.state == "done":
+        print("\nDone")
+    else:
+        print(
+            str(int(progress.percent))
+            + "%"
+            + " estimated time left: "
+            + str(progress.time_left),
+            end="\r",
+        )
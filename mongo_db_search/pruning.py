@@ -0,0 +1,210 @@
+import math
+from typing import Tuple
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+# Relative tolerance for the bounds, pruning must never drop a window whose distance
+# equals the current threshold (ties are kept by TopK(keep_ties=True))
+TOLERANCE = 1e-9
+
+
+class PruningStats:
+    """Counts how many windows were rejected by which stage of the PruningCascade"""
+
+    def __init__(self):
+        self.windows = 0
+        self.kim = 0
+        self.keogh = 0
+        self.abandoned = 0
+
+    @property
+    def pruned(self) -> int:
+        return self.kim + self.keogh + self.abandoned
+
+    @property
+    def calculated(self) -> int:
+        return self.windows - self.kim - self.keogh
+
+    def merge(self, other: "PruningStats") -> None:
+        """Adds the counts of another PruningStats object
+
+        :param other: stats to add
+        :type other: PruningStats
+        """
+        self.windows += other.windows
+        self.kim += other.kim
+        self.keogh += other.keogh
+        self.abandoned += other.abandoned
+
+    def __str__(self) -> str:
+        rate = self.pruned / self.windows * 100 if self.windows > 0 else 0.0
+        return (
+            "Pruned {:.1f}% of {} windows (LB_Kim: {}, LB_Keogh: {}, "
+            "early abandoned: {}), {} full distance calculations".format(
+                rate,
+                self.windows,
+                self.kim,
+                self.keogh,
+                self.abandoned,
+                self.calculated - self.abandoned,
+            )
+        )
+
+
+def envelope(seq: np.array, window: int = None) -> Tuple[np.array, np.array]:
+    """Calculates the lower and upper envelope of a sequence for LB_Keogh
+
+    :param seq: sequence with shape (length, features)
+    :type seq: np.array
+    :param window: warping window as in dtaidistance (maximal shift window - 1),
+    None results in an unconstrained envelope
+    :type window: int, optional
+    :return: lower and upper envelope, shape (length, features) or (1, features) if unconstrained
+    :rtype: Tuple[np.array, np.array]
+    """
+    if window is None or window >= len(seq):
+        return seq.min(axis=0, keepdims=True), seq.max(axis=0, keepdims=True)
+    size = 2 * window - 1
+    return (
+        minimum_filter1d(seq, size, axis=0, mode="nearest"),
+        maximum_filter1d(seq, size, axis=0, mode="nearest"),
+    )
+
+
+def lb_kim(seq: np.array, seq2: np.array, squared: bool = True) -> float:
+    """Lower bound of the dtw distance from the first and last points (LB_KimFL)
+
+    :param seq: first sequence
+    :type seq: np.array
+    :param seq2: second sequence
+    :type seq2: np.array
+    :param squared: true for dtw with squared euclidean cell costs and the square root
+    of the sum as distance (dtaidistance, dtw_kernel), false for summed euclidean costs
+    :type squared: bool, optional
+    :return: lower bound of the distance
+    :rtype: float
+    """
+    first = float(np.sum((seq[0] - seq2[0]) ** 2))
+    if len(seq) == 1 and len(seq2) == 1:
+        last = 0.0
+    else:
+        last = float(np.sum((seq[-1] - seq2[-1]) ** 2))
+    if squared:
+        return math.sqrt(first + last)
+    return math.sqrt(first) + math.sqrt(last)
+
+
+def lb_keogh(
+    lower: np.array, upper: np.array, seq2: np.array, squared: bool = True
+) -> float:
+    """Lower bound of the dtw distance from the envelope of the query (LB_Keogh)
+
+    :param lower: lower envelope of the query, see envelope
+    :type lower: np.array
+    :param upper: upper envelope of the query, see envelope
+    :type upper: np.array
+    :param seq2: the compared sequence, same length as the query if the envelope is constrained
+    :type seq2: np.array
+    :param squared: see lb_kim
+    :type squared: bool, optional
+    :return: lower bound of the distance
+    :rtype: float
+    """
+    excess = np.maximum(seq2 - upper, 0.0) + np.maximum(lower - seq2, 0.0)
+    costs = np.sum(excess**2, axis=1)
+    if squared:
+        return math.sqrt(float(np.sum(costs)))
+    return float(np.sum(np.sqrt(costs)))
+
+
+class PruningCascade:
+    """Calculates distances to a query, but rejects windows that can not be
+    among the best results with LB_Kim, LB_Keogh and early abandoning of the distance function
+
+    A window is only rejected if its distance is proven to be larger than the given
+    threshold (the distance of the worst kept result), so the best results are
+    identical to calculating all distances.
+    """
+
+    def __init__(
+        self,
+        seq: np.array,
+        distance_function: callable,
+        squared: bool = True,
+        window: int = None,
+    ):
+        """Initializes the cascade for one query
+
+        :param seq: the query sequence
+        :type seq: np.array
+        :param distance_function: distance function with the signature (seq1, seq2, max_dist),
+        returns inf if the distance exceeds max_dist
+        :type distance_function: callable
+        :param squared: see lb_kim
+        :type squared: bool, optional
+        :param window: warping window of the distance function, None if unconstrained
+        :type window: int, optional
+        """
+        self.seq = seq
+        self.distance_function = distance_function
+        self.squared = squared
+        self.window = window
+        self.lower, self.upper = envelope(seq, window)
+        self.global_lower, self.global_upper = envelope(seq)
+        self.stats = PruningStats()
+
+    def distance(self, seq2: np.array, threshold: float) -> float:
+        """Calculates the distance of a window or returns None if it was pruned
+
+        :param seq2: the compared window
+        :type seq2: np.array
+        :param threshold: windows with a larger distance are rejected
+        :type threshold: float
+        :return: the distance or None
+        :rtype: float
+        """
+        if not self.bounds(seq2, threshold):
+            return None
+        limit = with_tolerance(threshold)
+        distance = self.distance_function(
+            self.seq, seq2, None if math.isinf(limit) else limit
+        )
+        if math.isinf(distance):
+            self.stats.abandoned += 1
+            return None
+        return distance
+
+    def bounds(self, seq2: np.array, threshold: float) -> bool:
+        """Checks a window with LB_Kim and LB_Keogh only
+
+        :param seq2: the compared window
+        :type seq2: np.array
+        :param threshold: windows with a larger lower bound are rejected
+        :type threshold: float
+        :return: true if the window passed both lower bounds
+        :rtype: bool
+        """
+        self.stats.windows += 1
+        limit = with_tolerance(threshold)
+        if lb_kim(self.seq, seq2, self.squared) > limit:
+            self.stats.kim += 1
+            return False
+        if len(seq2) == len(self.seq):
+            lower, upper = self.lower, self.upper
+        else:
+            lower, upper = self.global_lower, self.global_upper
+        if lb_keogh(lower, upper, seq2, self.squared) > limit:
+            self.stats.keogh += 1
+            return False
+        return True
+
+
+def with_tolerance(threshold: float) -> float:
+    """Adds the tolerance to a threshold, so that windows with an equal distance are kept
+
+    :param threshold: the distance of the worst kept result
+    :type threshold: float
+    :return: the threshold including the tolerance
+    :rtype: float
+    """
+    return threshold * (1 + TOLERANCE) + TOLERANCE
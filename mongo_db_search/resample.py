@@ -0,0 +1,146 @@
+import math
+from datetime import datetime, timedelta
+from typing import List, Tuple
+import numpy as np
+
+MICROSECOND = timedelta(microseconds=1)
+
+
+class ColumnData:
+    """Column representation of the documents of one collection
+
+    The timestamps are stored as microseconds relative to a reference time,
+    the features as one float matrix with one column per feature (sorted by name).
+    """
+
+    def __init__(
+        self, reference: datetime, times: np.array, values: np.array, features: list
+    ):
+        self.reference = reference
+        self.times = times
+        self.values = values
+        self.features = features
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+def feature_names(measurement: dict) -> List[str]:
+    """Returns the sorted feature names of a measurement, this is the column order of all arrays
+
+    :param measurement: one measurement dict including the timestamp
+    :type measurement: dict
+    :return: sorted list of feature names without the timestamp
+    :rtype: List[str]
+    """
+    return [key for key in sorted(measurement) if key != "timestamp"]
+
+
+def to_columns(measurements: list, reference: datetime) -> ColumnData:
+    """Converts a list of measurement dicts to column arrays
+
+    :param measurements: list of measurement dicts sorted by timestamp
+    :type measurements: list
+    :param reference: the time which corresponds to 0 in the times array
+    :type reference: datetime
+    :return: the column data of the measurements
+    :rtype: ColumnData
+    """
+    features = feature_names(measurements[0])
+    times = np.fromiter(
+        ((m["timestamp"] - reference) // MICROSECOND for m in measurements),
+        dtype=np.float64,
+        count=len(measurements),
+    )
+    values = np.array(
+        [[m[key] for key in features] for m in measurements], dtype=float
+    ).reshape(len(measurements), len(features))
+    return ColumnData(reference, times, values, features)
+
+
+def interpolate_columns(columns: ColumnData, grid: np.array) -> np.array:
+    """Linear interpolation of all features of a collection onto a time grid.
+    Grid points before the first or after the last measurement hold the first/last value.
+
+    :param columns: column data of one collection
+    :type columns: ColumnData
+    :param grid: microseconds relative to columns.reference, sorted ascending
+    :type grid: np.array
+    :return: array with shape (len(grid), number of features)
+    :rtype: np.array
+    """
+    times = columns.times
+    values = columns.values
+    right = np.searchsorted(times, grid, side="right")
+    left = np.clip(right - 1, 0, len(times) - 1)
+    right = np.clip(right, 0, len(times) - 1)
+    span = times[right] - times[left]
+    weight = np.divide(
+        grid - times[left], span, out=np.zeros(len(grid)), where=span > 0
+    )
+    return values[left] + weight[:, None] * (values[right] - values[left])
+
+
+def time_grid(start: datetime, end: datetime, resolution: timedelta) -> np.array:
+    """Returns the grid of the interval in microseconds relative to start,
+    the grid has ceil((end - start) / resolution) + 1 points
+
+    :param start: first grid point
+    :type start: datetime
+    :param end: end of the interval
+    :type end: datetime
+    :param resolution: distance between two grid points
+    :type resolution: timedelta
+    :return: grid points in microseconds relative to start
+    :rtype: np.array
+    """
+    size = math.ceil((end - start) / resolution) + 1
+    return np.arange(size, dtype=np.float64) * (resolution // MICROSECOND)
+
+
+def data_range(sensor_data: dict) -> Tuple[datetime, datetime]:
+    """Get the earliest start time and the latest end time from a sensor data dict
+
+    :param sensor_data: dict<CollectionType, list[Dict]>
+    :type sensor_data: dict
+    :return: tuple of earliest start time and latest end time
+    :rtype: Tuple[datetime, datetime]
+    """
+    start = min(sensor_data[c_type][0]["timestamp"] for c_type in sensor_data)
+    end = max(sensor_data[c_type][-1]["timestamp"] for c_type in sensor_data)
+    return start, end
+
+
+def resample(
+    sensor_data: dict,
+    resolution: timedelta,
+    start: datetime = None,
+    end: datetime = None,
+) -> np.array:
+    """Resamples the sensor data of all collections onto one common time grid
+
+    Each collection is converted to column arrays once and all of its features are
+    interpolated with one vectorized operation. The features are ordered by
+    collection (dict order) and by name inside a collection.
+
+    :param sensor_data: dict<CollectionType, list[Dict]>, see SearchQuery docstring
+    :type sensor_data: dict
+    :param resolution: the timedelta at which interpolation takes place
+    :type resolution: timedelta
+    :param start: first grid point, defaults to the earliest timestamp of the data
+    :type start: datetime, optional
+    :param end: end of the grid, defaults to the latest timestamp of the data
+    :type end: datetime, optional
+    :return: array with shape (grid points, features)
+    :rtype: np.array
+    """
+    data_start, data_end = data_range(sensor_data)
+    start = data_start if start is None else start
+    end = data_end if end is None else end
+    grid = time_grid(start, end, resolution)
+    return np.hstack(
+        [
+            interpolate_columns(to_columns(sensor_data[c_type], start), grid)
+            for c_type in sensor_data
+        ]
+    )
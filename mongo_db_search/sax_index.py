@@ -0,0 +1,733 @@
+import heapq
+import json
+import math
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Generator, Tuple
+import numpy as np
+from scipy.stats import norm
+from mongo_db.mongodb_connection import CollectionType, MongoDBConnection
+from mongo_db_search.batch import feature_columns
+from mongo_db_search.prefetch import ResampledRange, grid_size, iter_chunks
+from mongo_db_search.pruning import envelope
+from mongo_db_search.resample import MICROSECOND
+
+# rows fetched around a verified window, multiplied by 4 until every collection has a
+# measurement before and after the window, so it equals the window of the whole session
+MARGIN = 16
+
+
+class IndexStats:
+    """Counts the work of a search with the SaxIndex"""
+
+    def __init__(self):
+        self.nodes = 0
+        self.entries = 0
+        self.candidates = 0
+
+    def __str__(self) -> str:
+        return (
+            "SAX index: visited {} nodes with {} windows, {} candidates below "
+            "the lower bound".format(self.nodes, self.entries, self.candidates)
+        )
+
+
+class SaxNode:
+    """Node of the binary iSAX tree
+
+    The word of a node is the SAX symbol of every segment at the cardinality of
+    the segment (bits). A leaf holds the windows whose words start with its word,
+    an inner node is split into two children on one more bit of the segment split.
+    """
+
+    def __init__(
+        self,
+        id: int,
+        bits: np.array,
+        symbols: np.array,
+        split: int = -1,
+        children: tuple = None,
+        count: int = 0,
+        capacity: int = 0,
+    ):
+        self.id = id
+        self.bits = bits
+        self.symbols = symbols
+        self.split = split
+        self.children = children
+        self.count = count
+        self.capacity = capacity
+
+    @property
+    def leaf(self) -> bool:
+        return self.split < 0
+
+
+def segment_bounds(length: int, segments: int) -> np.array:
+    """Returns the first row of every PAA segment of a window and the window length
+
+    :param length: number of rows of the window
+    :type length: int
+    :param segments: number of segments
+    :type segments: int
+    :return: array with segments + 1 row indices
+    :rtype: np.array
+    """
+    return np.arange(segments + 1) * length // segments
+
+
+def paa(data: np.array, length: int, segments: int, starts: np.array) -> np.array:
+    """Piecewise Aggregate Approximation of windows of a block of rows
+
+    :param data: the rows, shape (rows, features)
+    :type data: np.array
+    :param length: number of rows of a window
+    :type length: int
+    :param segments: number of segments per window
+    :type segments: int
+    :param starts: first row of every window inside data
+    :type starts: np.array
+    :return: mean of every segment, shape (len(starts), segments, features)
+    :rtype: np.array
+    """
+    sums = np.vstack([np.zeros((1, data.shape[1])), np.cumsum(data, axis=0)])
+    bounds = segment_bounds(length, segments)
+    sums = sums[starts[:, None] + bounds[None, :]]
+    return (sums[:, 1:] - sums[:, :-1]) / np.diff(bounds)[None, :, None]
+
+
+def breakpoints(mean: np.array, std: np.array, bits: int) -> np.array:
+    """SAX breakpoints of every feature, the quantiles of a normal distribution
+    with the mean and standard deviation of the feature
+
+    :param mean: mean of every feature
+    :type mean: np.array
+    :param std: standard deviation of every feature
+    :type std: np.array
+    :param bits: symbols have 2**bits values
+    :type bits: int
+    :return: edges of the symbol intervals including -inf and inf,
+    shape (features, 2**bits + 1)
+    :rtype: np.array
+    """
+    quantiles = norm.ppf(np.arange(1, 2**bits) / 2**bits)
+    edges = mean[:, None] + quantiles[None, :] * std[:, None]
+    infinity = np.full((len(mean), 1), np.inf)
+    return np.hstack([-infinity, edges, infinity])
+
+
+class SaxIndex:
+    """Index of all windows of a fixed length of the numeric time series (iSAX)
+
+    Every session is resampled on its own grid, starting at its first measurement in
+    all collections of the index, and every window (at every step-th row) is stored
+    with the SAX word of its PAA in a binary iSAX tree in a SQLite file. A search
+    traverses the tree best first by a lower bound of the dtw distance (LB_Keogh of the
+    PAA) and only fetches the windows whose lower bound is below the current best
+    results, so most of the stored data is never read.
+    A query has to use the collections and resolution of the index, a subset of
+    its features and at least length data points.
+    The index can be shared by several threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        features: dict = None,
+        resolution: timedelta = None,
+        length: int = None,
+        segments: int = 8,
+        bits: int = 8,
+        leaf_size: int = 1000,
+        step: int = 1,
+    ):
+        """Opens an index or creates a new one
+
+        :param path: path of the SQLite file, ":memory:" is not persistent
+        :type path: str
+        :param features: dict<CollectionType, list of features> to index, only needed
+        when the index is created
+        :type features: dict, optional
+        :param resolution: interpolation resolution of the windows, only needed when the
+        index is created
+        :type resolution: timedelta, optional
+        :param length: number of rows of the windows, only needed when the index is created
+        :type length: int, optional
+        :param segments: number of PAA segments per window, defaults to 8
+        :type segments: int, optional
+        :param bits: maximal cardinality of a SAX symbol in bits (at most 8), defaults to 8
+        :type bits: int, optional
+        :param leaf_size: a leaf is split when it holds more windows, defaults to 1000
+        :type leaf_size: int, optional
+        :param step: number of rows between two indexed windows, defaults to 1
+        :type step: int, optional
+        :raises exception: raise exception when a new index is created without
+        features, resolution and length
+        """
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, bits BLOB, "
+            "symbols BLOB, split INTEGER, child0 INTEGER, child1 INTEGER, "
+            "count INTEGER, capacity INTEGER)"
+        )
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (node INTEGER, session TEXT, "
+            "row INTEGER, word BLOB)"
+        )
+        self.__db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_node ON entries (node, session)"
+        )
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session TEXT PRIMARY KEY, "
+            "anchor TEXT, rows INTEGER, last INTEGER, next INTEGER)"
+        )
+        row = self.__db.execute(
+            "SELECT value FROM meta WHERE key = 'config'"
+        ).fetchone()
+        if row is None:
+            if features is None or resolution is None or length is None:
+                raise Exception("A new SaxIndex needs features, resolution and length")
+            if bits > 8:
+                raise Exception("A SAX symbol has at most 8 bits")
+            config = {
+                "features": {
+                    c_type.value: sorted(set(features[c_type]) | {"timestamp"})
+                    for c_type in features
+                },
+                "resolution": resolution // MICROSECOND,
+                "length": length,
+                "segments": min(segments, length),
+                "bits": bits,
+                "leaf_size": leaf_size,
+                "step": step,
+                "mean": None,
+                "std": None,
+            }
+            self.__db.execute(
+                "INSERT INTO meta VALUES ('config', ?)", (json.dumps(config),)
+            )
+            self.__db.commit()
+        else:
+            config = json.loads(row[0])
+        self.features = {
+            CollectionType(value): config["features"][value]
+            for value in config["features"]
+        }
+        self.resolution = config["resolution"] * MICROSECOND
+        self.length = config["length"]
+        self.segments = config["segments"]
+        self.bits = config["bits"]
+        self.leaf_size = config["leaf_size"]
+        self.step = config["step"]
+        self.__config = config
+        self.__edges = None
+        if config["mean"] is not None:
+            self.__set_breakpoints(np.array(config["mean"]), np.array(config["std"]))
+        self.__nodes = {}
+        for (
+            node_id,
+            bits,
+            symbols,
+            split,
+            child0,
+            child1,
+            count,
+            capacity,
+        ) in self.__db.execute("SELECT * FROM nodes"):
+            self.__nodes[node_id] = SaxNode(
+                node_id,
+                np.frombuffer(bits, dtype=np.uint8).copy(),
+                np.frombuffer(symbols, dtype=np.uint8).copy(),
+                split,
+                None if split < 0 else (child0, child1),
+                count,
+                capacity,
+            )
+        if not self.__nodes:
+            size = self.segments * self.__dimensions()
+            self.__nodes[0] = SaxNode(
+                0,
+                np.zeros(size, dtype=np.uint8),
+                np.zeros(size, dtype=np.uint8),
+                capacity=self.leaf_size,
+            )
+        self.__sessions = {
+            session: (datetime.fromisoformat(anchor), rows, last, next_row)
+            for session, anchor, rows, last, next_row in self.__db.execute(
+                "SELECT * FROM sessions"
+            )
+        }
+        row = self.__db.execute(
+            "SELECT value FROM meta WHERE key = 'generation'"
+        ).fetchone()
+        if row is None:
+            # a new id for every new file, the number counts the updates of a session
+            self.__generation = [uuid.uuid4().hex, 0]
+            self.__db.execute(
+                "INSERT INTO meta VALUES ('generation', ?)",
+                (json.dumps(self.__generation),),
+            )
+            self.__db.commit()
+        else:
+            self.__generation = json.loads(row[0])
+
+    @property
+    def generation(self) -> str:
+        """Changes with every update of a session and when the index is rebuilt"""
+        with self.__lock:
+            return "{}-{}".format(*self.__generation)
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __dimensions(self) -> int:
+        return sum(len(self.features[c_type]) - 1 for c_type in self.features)
+
+    def __set_breakpoints(self, mean: np.array, std: np.array) -> None:
+        std = np.where(std > 0, std, 1.0)
+        self.__config["mean"] = mean.tolist()
+        self.__config["std"] = std.tolist()
+        # the edges of every word position, a word is ordered by segment, then feature
+        self.__edges = np.tile(breakpoints(mean, std, self.bits), (self.segments, 1))
+
+    def columns(self, data_to_search: dict) -> np.array:
+        """Finds the columns of a query in the indexed features
+
+        :param data_to_search: dict<CollectionType, list[Dict]>, see SearchQuery
+        :type data_to_search: dict
+        :return: index of the indexed feature of every column of the query or None if the
+        query does not use the same collections or uses other features
+        :rtype: np.array
+        """
+        return feature_columns(self.features, data_to_search)
+
+    def sessions(self) -> dict:
+        """Returns the indexed sessions
+
+        :return: dict<session id, (start of the grid, number of rows)>
+        :rtype: dict
+        """
+        with self.__lock:
+            return {
+                session: (anchor, rows)
+                for session, (anchor, rows, _, _) in self.__sessions.items()
+            }
+
+    def update(self, connection: MongoDBConnection) -> int:
+        """Indexes the windows of new sessions and new data of known sessions
+
+        :param connection: connection to the mongoDB
+        :type connection: MongoDBConnection
+        :return: number of new windows
+        :rtype: int
+        """
+        c_type = next(iter(self.features))
+        session_ids = set(connection.get_session_ids()) | set(
+            connection.get_collection_by_type(c_type).session_ids()
+        )
+        count = 0
+        for session_id in sorted(session_ids):
+            extent = connection.get_session_extent(session_id, list(self.features))
+            if extent is not None:
+                count += self.__update_session(connection, session_id, *extent)
+        return count
+
+    def __update_session(
+        self,
+        connection: MongoDBConnection,
+        session_id: str,
+        anchor: datetime,
+        settled: datetime,
+        end: datetime,
+    ) -> int:
+        """Indexes the new windows of one session
+
+        :param anchor: first row of the grid of a new session
+        :type anchor: datetime
+        :param settled: rows up to this time have measurements of all collections
+        after them, their values do not change with new data
+        :type settled: datetime
+        :param end: time of the last measurement
+        :type end: datetime
+        :return: number of new windows
+        :rtype: int
+        """
+        with self.__lock:
+            known = self.__sessions.get(session_id)
+        next_row = 0
+        if known is not None:
+            anchor, _, _, next_row = known
+        rows = (settled - anchor) // self.resolution
+        last = grid_size(anchor, end, self.resolution) - 1
+        first = math.ceil(next_row / self.step) * self.step
+        if rows < 0 or first + self.length - 1 > rows:
+            return 0
+        start = 0
+        if first > 0:
+            # the chunks have to start before a measurement of every collection
+            start = first
+            for c_type in self.features:
+                before = connection.get_collection_by_type(c_type).latest_timestamp(
+                    anchor + first * self.resolution, session_id
+                )
+                if before is not None:
+                    start = min(start, (before - anchor) // self.resolution)
+            start = max(start, 0)
+        count = 0
+        for chunk in iter_chunks(
+            connection,
+            self.features,
+            anchor + start * self.resolution,
+            anchor + last * self.resolution,
+            self.resolution,
+            self.length - 1,
+            100000,
+            session_id,
+        ):
+            with self.__lock:
+                if self.__edges is None:
+                    self.__set_breakpoints(
+                        chunk.data.mean(axis=0), chunk.data.std(axis=0)
+                    )
+                    self.__db.execute(
+                        "UPDATE meta SET value = ? WHERE key = 'config'",
+                        (json.dumps(self.__config),),
+                    )
+            local = np.flatnonzero(chunk.valid(self.length))
+            starts = start + chunk.offset + local
+            keep = (
+                (starts >= first)
+                & (starts + self.length - 1 <= rows)
+                & (starts % self.step == 0)
+            )
+            if not np.any(keep):
+                continue
+            words = self.__words(
+                paa(chunk.data, self.length, self.segments, local[keep])
+            )
+            with self.__lock:
+                self.__insert(session_id, starts[keep], words)
+            count += int(np.sum(keep))
+        with self.__lock:
+            self.__sessions[session_id] = (anchor, rows, last, rows - self.length + 2)
+            self.__generation[1] += 1
+            self.__db.execute(
+                "UPDATE meta SET value = ? WHERE key = 'generation'",
+                (json.dumps(self.__generation),),
+            )
+            self.__db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    anchor.isoformat(),
+                    rows,
+                    last,
+                    rows - self.length + 2,
+                ),
+            )
+            self.__save_nodes()
+            self.__db.commit()
+        return count
+
+    def __words(self, means: np.array) -> np.array:
+        """Converts PAA segment means into SAX words of the maximal cardinality
+
+        :param means: shape (windows, segments, features)
+        :type means: np.array
+        :return: words, shape (windows, segments * features)
+        :rtype: np.array
+        """
+        means = means.reshape(len(means), -1)
+        words = np.empty(means.shape, dtype=np.uint8)
+        for i in range(means.shape[1]):
+            words[:, i] = np.searchsorted(
+                self.__edges[i, 1:-1], means[:, i], side="right"
+            )
+        return words
+
+    def __insert(self, session_id: str, rows: np.array, words: np.array) -> None:
+        """Inserts windows into the leaves of their words and splits full leaves"""
+        pending = [(self.__nodes[0], np.arange(len(rows)))]
+        while pending:
+            node, selected = pending.pop()
+            if not node.leaf:
+                side = self.__side(node, words[selected])
+                pending.append((self.__nodes[node.children[0]], selected[side == 0]))
+                pending.append((self.__nodes[node.children[1]], selected[side == 1]))
+                continue
+            if len(selected) == 0:
+                continue
+            self.__db.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, ?)",
+                (
+                    (node.id, session_id, int(rows[i]), words[i].tobytes())
+                    for i in selected
+                ),
+            )
+            node.count += len(selected)
+            if node.count > node.capacity:
+                self.__split(node)
+
+    def __side(self, node: SaxNode, words: np.array) -> np.array:
+        """Returns the child (0 or 1) of an inner node for every word"""
+        shift = self.bits - int(node.bits[node.split]) - 1
+        return (words[:, node.split] >> shift) & 1
+
+    def __split(self, node: SaxNode) -> None:
+        """Splits a leaf on the segment which divides its windows most evenly, a leaf
+        whose windows can not be divided doubles its capacity instead"""
+        rows = self.__db.execute(
+            "SELECT rowid, word FROM entries WHERE node = ?", (node.id,)
+        ).fetchall()
+        ids = np.array([row[0] for row in rows])
+        words = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.uint8).reshape(
+            len(rows), -1
+        )
+        best, balance = -1, 0
+        for segment in np.flatnonzero(node.bits < self.bits):
+            shift = self.bits - int(node.bits[segment]) - 1
+            ones = int(np.sum((words[:, segment] >> shift) & 1))
+            if min(ones, len(rows) - ones) > balance:
+                best, balance = int(segment), min(ones, len(rows) - ones)
+        if best < 0:
+            node.capacity *= 2
+            return
+        children = []
+        for bit in (0, 1):
+            bits = node.bits.copy()
+            bits[best] += 1
+            symbols = node.symbols.copy()
+            symbols[best] = (symbols[best] << 1) | bit
+            child = SaxNode(
+                max(self.__nodes) + 1, bits, symbols, capacity=self.leaf_size
+            )
+            self.__nodes[child.id] = child
+            children.append(child)
+        node.children = (children[0].id, children[1].id)
+        node.split = best
+        side = self.__side(node, words)
+        for bit, child in enumerate(children):
+            selected = ids[side == bit]
+            child.count = len(selected)
+            self.__db.executemany(
+                "UPDATE entries SET node = ? WHERE rowid = ?",
+                ((child.id, int(rowid)) for rowid in selected),
+            )
+        node.count = 0
+        for child in children:
+            if child.count > child.capacity:
+                self.__split(child)
+
+    def __save_nodes(self) -> None:
+        self.__db.executemany(
+            "INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    node.id,
+                    node.bits.tobytes(),
+                    node.symbols.tobytes(),
+                    node.split,
+                    None if node.leaf else node.children[0],
+                    None if node.leaf else node.children[1],
+                    node.count,
+                    node.capacity,
+                )
+                for node in self.__nodes.values()
+            ),
+        )
+
+    def candidates(
+        self,
+        seq: np.array,
+        columns: np.array,
+        threshold: callable,
+        start: datetime,
+        end: datetime,
+        window: int = None,
+        session_id: str = None,
+        stats: IndexStats = None,
+    ) -> Generator[Tuple[float, str, datetime], None, None]:
+        """Generates the indexed windows sorted by a lower bound of their dtw distance
+        to a query, until the lower bound exceeds the threshold
+
+        :param seq: the query sequence, at least length rows
+        :type seq: np.array
+        :param columns: indexed feature of every column of the query, see columns
+        :type columns: np.array
+        :param threshold: returns the distance of the worst kept result, called for
+        every window
+        :type threshold: callable
+        :param start: only windows starting at or after this time
+        :type start: datetime
+        :param end: only windows ending at or before this time (with len(seq) rows)
+        :type end: datetime
+        :param window: warping window of the dtw, None is unconstrained
+        :type window: int, optional
+        :param session_id: only windows of this session, defaults to None
+        :type session_id: str, optional
+        :param stats: counts the visited nodes and windows, defaults to None
+        :type stats: IndexStats, optional
+        :yield: lower bound, session id and start time of the window
+        :rtype: Generator[Tuple[float, str, datetime], None, None]
+        """
+        stats = IndexStats() if stats is None else stats
+        with self.__lock:
+            if self.__edges is None:
+                return
+            edges = self.__edges
+            sessions = dict(self.__sessions)
+        lower, upper = envelope(seq, window)
+        lower = np.broadcast_to(lower, seq.shape)[: self.length]
+        upper = np.broadcast_to(upper, seq.shape)[: self.length]
+        bounds = segment_bounds(self.length, self.segments)
+        dimensions = self.__dimensions()
+        segment_lower = np.full((self.segments, dimensions), -np.inf)
+        segment_upper = np.full((self.segments, dimensions), np.inf)
+        for k in range(self.segments):
+            segment_lower[k, columns] = lower[bounds[k] : bounds[k + 1]].min(axis=0)
+            segment_upper[k, columns] = upper[bounds[k] : bounds[k + 1]].max(axis=0)
+        segment_lower = segment_lower.reshape(-1)
+        segment_upper = segment_upper.reshape(-1)
+        weights = np.repeat(np.diff(bounds), dimensions).astype(np.float64)
+        positions = np.arange(len(weights))
+
+        def bound(low: np.array, high: np.array) -> np.array:
+            gap = np.maximum(np.maximum(low - segment_upper, segment_lower - high), 0.0)
+            return np.sqrt(np.sum(weights * gap**2, axis=-1))
+
+        def node_bound(node: SaxNode) -> float:
+            shift = self.bits - node.bits.astype(np.int64)
+            symbols = node.symbols.astype(np.int64)
+            return float(
+                bound(
+                    edges[positions, symbols << shift],
+                    edges[positions, (symbols + 1) << shift],
+                )
+            )
+
+        last_row = len(seq) - 1
+        counter = 0
+        root = self.__nodes[0]
+        heap = [(node_bound(root), counter, root, None)]
+        while heap:
+            lb, _, node, entry = heapq.heappop(heap)
+            if lb > threshold():
+                return
+            if entry is not None:
+                stats.candidates += 1
+                yield lb, entry[0], entry[1]
+                continue
+            stats.nodes += 1
+            if not node.leaf:
+                for child_id in node.children:
+                    child = self.__nodes[child_id]
+                    counter += 1
+                    heapq.heappush(heap, (node_bound(child), counter, child, None))
+                continue
+            with self.__lock:
+                if session_id is None:
+                    rows = self.__db.execute(
+                        "SELECT session, row, word FROM entries WHERE node = ?",
+                        (node.id,),
+                    ).fetchall()
+                else:
+                    rows = self.__db.execute(
+                        "SELECT session, row, word FROM entries "
+                        "WHERE node = ? AND session = ?",
+                        (node.id, session_id),
+                    ).fetchall()
+            if not rows:
+                continue
+            stats.entries += len(rows)
+            words = np.frombuffer(
+                b"".join(row[2] for row in rows), dtype=np.uint8
+            ).reshape(len(rows), -1)
+            words = words.astype(np.int64)
+            lbs = bound(edges[positions, words], edges[positions, words + 1])
+            limit = threshold()
+            for i in np.flatnonzero(lbs <= limit):
+                session, row, _ = rows[i]
+                anchor, session_rows, _, _ = sessions[session]
+                time = anchor + row * self.resolution
+                if (
+                    time < start
+                    or time + last_row * self.resolution > end
+                    or row + last_row > session_rows
+                ):
+                    continue
+                counter += 1
+                heapq.heappush(heap, (float(lbs[i]), counter, None, (session, time)))
+
+    def window(
+        self,
+        connection: MongoDBConnection,
+        session_id: str,
+        start: datetime,
+        length: int,
+    ) -> np.array:
+        """Fetches an indexed window, resampled on the grid of its session
+
+        :param connection: connection to the mongoDB
+        :type connection: MongoDBConnection
+        :param session_id: id of the session
+        :type session_id: str
+        :param start: start time of the window
+        :type start: datetime
+        :param length: number of rows
+        :type length: int
+        :return: the window with all indexed features or None if a collection has no
+        measurement inside the window
+        :rtype: np.array
+        """
+        with self.__lock:
+            anchor, _, last, _ = self.__sessions[session_id]
+        first = (start - anchor) // self.resolution
+        final = first + length - 1
+        margin = MARGIN
+        while True:
+            begin = max(first - margin, 0)
+            stop = min(final + margin, last)
+            chunk = self.__load(connection, session_id, anchor, begin, stop)
+            if chunk is not None and len(chunk) > final - begin:
+                before = begin == 0 or np.all(chunk.right[first - begin] > 0)
+                after = np.all(chunk.left[final - begin] < chunk.right[-1])
+                if (before and after) or (begin == 0 and stop == last):
+                    break
+            elif begin == 0 and stop == last:
+                return None
+            margin *= 4
+        if not chunk.has_data(first - begin, length):
+            return None
+        return chunk.window(first - begin, length)
+
+    def __load(
+        self,
+        connection: MongoDBConnection,
+        session_id: str,
+        anchor: datetime,
+        begin: int,
+        stop: int,
+    ) -> ResampledRange:
+        """Fetches and resamples the rows begin to stop of a session at once"""
+        for chunk in iter_chunks(
+            connection,
+            self.features,
+            anchor + begin * self.resolution,
+            anchor + stop * self.resolution,
+            self.resolution,
+            session_id=session_id,
+        ):
+            return chunk
+        return None
+
+    def close(self) -> None:
+        """Closes the SQLite file"""
+        with self.__lock:
+            self.__db.close()
@@ -4,17 +4,39 @@ import os
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.dirname(SCRIPT_DIR))
 
+import copy
+import cProfile
+import io
 import math
-from fastdtw import fastdtw
-from scipy.spatial.distance import euclidean
+import pstats
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from datetime import datetime, timedelta
 import numpy as np
 from mongo_db.mongodb_connection import MongoDBConnection
-from dtaidistance import dtw_ndim
+from mongo_db_search.resample import resample
+from mongo_db_search.prefetch import grid_size, iter_chunks, iter_windows
+from mongo_db_search.parallel import score_windows
+from mongo_db_search.pruning import PruningCascade, PruningStats, with_tolerance
+from mongo_db_search.topk import SearchResult, TopK
+from mongo_db_search.dtw_kernel import dtw_distance, numba
+from mongo_db_search.spring import SpringMatcher
+from mongo_db_search.mass import mass_candidates, mass_search
+from mongo_db_search.multiresolution import SearchLevel, candidate_regions
+from mongo_db_search.batch import BatchPattern, column_index, union_features
+from mongo_db_search.progress import Progress, ProgressTracker, print_progress
+from mongo_db_search.incremental import SearchSnapshot
+from mongo_db_search.cache import ResultCache, query_fingerprint
+from mongo_db_search.sax_index import IndexStats, SaxIndex
+from mongo_db_search.feature_store import FeatureStore
+from mongo_db_search.profiling import ProfiledConnection, SearchProfile
+from dtaidistance import dtw, dtw_ndim
+from threading import Event
 from typing import Generator, Tuple
 
-__connection = None
-__query = None
+# the C library of dtaidistance, older versions expose it in dtw_ndim, newer only in dtw
+_DTW_C = getattr(dtw_ndim, "dtw_cc", None) or getattr(dtw, "dtw_cc", None)
 
 
 class SearchQuery:
@@ -26,6 +48,19 @@ class SearchQuery:
         interpolation_resolution: timedelta,
         step: int = None,
         result_size: int = 4,
+        prefetch: bool = False,
+        chunk_size: int = 100000,
+        workers: int = 1,
+        prune: bool = True,
+        keep_ties: bool = False,
+        suppress_overlap: bool = False,
+        window: int = None,
+        mode: str = "window",
+        prefilter: int = None,
+        coarse_resolution: timedelta = None,
+        coarse_candidates: int = 4,
+        sessions=None,
+        session_workers: int = None,
     ):
         """Initializes a SearchQuery with the necessary parameters
 
@@ -45,7 +80,60 @@ class SearchQuery:
         Step 1 has the highest accuracy, but at high performance costs
         :type step: int, optional
         :param result_size: specifies the number of best results to return, defaults to 4
+        The memory usage of the search only depends on result_size, not on the search range
         :type result_size: int, optional
+        :param prefetch: fetch and resample the search range once and take the compared
+        windows as views from it instead of one database request per window, defaults to False
+        The windows are aligned to the grid of start instead of their first measurement
+        :type prefetch: bool, optional
+        :param chunk_size: number of grid points fetched at once in prefetch mode,
+        None fetches the whole search range at once, defaults to 100000
+        :type chunk_size: int, optional
+        :param workers: number of processes calculating the distances, defaults to 1
+        None uses all cores, with the parallel C implementation of dtaidistance if available
+        :type workers: int, optional
+        :param prune: reject windows with the lower bounds LB_Kim and LB_Keogh and stop distance
+        calculations early, once they can not be among the best results, defaults to True
+        The results are identical to calculating all distances
+        :type prune: bool, optional
+        :param keep_ties: return all results with the same distance as the last result,
+        even if there are more than result_size, defaults to False
+        :type keep_ties: bool, optional
+        :param suppress_overlap: drop results that overlap a better result, defaults to False
+        :type suppress_overlap: bool, optional
+        :param window: Sakoe-Chiba warping window of the dtw in interpolation_resolution steps,
+        the maximal shift from the diagonal is window - 1 (same as dtaidistance), defaults to None
+        A window reduces the cost of a dtw calculation from O(n²) to O(n * window) and makes pruning more effective
+        :type window: int, optional
+        :param mode: "window" compares the windows at every step with dtw,
+        "spring" evaluates every offset of the search range in one pass with streaming
+        subsequence dtw (step and window are ignored, the results are disjoint and can
+        differ in length from the query),
+        "mass" compares the windows by shape only with the z-normalized euclidean distance,
+        calculated for all windows of a chunk at once with the FFT (no warping, step defaults to 1),
+        defaults to "window"
+        :type mode: str, optional
+        :param prefilter: in "window" mode, only compare the prefilter windows with the smallest
+        z-normalized euclidean distance with dtw, defaults to None
+        The prefilter is a heuristic, windows that are similar with warping but not without
+        can be missed, a few times result_size candidates are usually enough
+        :type prefilter: int, optional
+        :param coarse_resolution: in "window" mode, search at this coarser resolution first
+        and compare only the neighborhoods (one coarse_resolution before and after) of the
+        best coarse windows at interpolation_resolution, defaults to None
+        The coarse level compares a window at every coarse_resolution, the fine level at every
+        step (defaults to 1). The results are near-exact at a fraction of the dtw calculations
+        :type coarse_resolution: timedelta, optional
+        :param coarse_candidates: number of coarse windows kept per result, defaults to 4
+        :type coarse_candidates: int, optional
+        :param sessions: list of session ids or "all", searches every session separately
+        inside its own extent (first to last measurement, clipped to start and end), so that
+        windows never span two sessions and the time between sessions is not searched,
+        defaults to None (the whole range regardless of sessions)
+        :type sessions: list | str, optional
+        :param session_workers: number of sessions searched at once in threads,
+        defaults to None (see concurrent.futures.ThreadPoolExecutor)
+        :type session_workers: int, optional
         :raises exception: raise exception when start time >= end time
         """
         if start >= end:
@@ -58,35 +146,33 @@ class SearchQuery:
         self.interpolation_resolution = interpolation_resolution
         self.step = step
         self.result_size = result_size
+        self.prefetch = prefetch
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.prune = prune
+        self.keep_ties = keep_ties
+        self.suppress_overlap = suppress_overlap
+        self.window = window
+        self.mode = mode
+        self.prefilter = prefilter
+        self.coarse_resolution = coarse_resolution
+        self.coarse_candidates = coarse_candidates
+        self.sessions = sessions
+        self.session_workers = session_workers
+        # set on the per session copies of a query with sessions
+        self.session_id = None
         self.search_range_size = math.ceil((end - start) / interpolation_resolution)
         self.data_to_search = data_to_search
 
 
-def __get_start_and_end_time(sensor_data: dict) -> Tuple[datetime, datetime]:
-    """Get the start and end time from a sensor data dict
-
-    :param sensor_data: CollectionType dict
-    :type sensor_data: dict
-    :return: tuple of earliest start time and latest end time
-    :rtype: Tuple[datetime, datetime]
-    """
-    start = None
-    end = None
-    for c_type in sensor_data:
-        for i in [0, -1]:
-            timestamp = sensor_data[c_type][i]["timestamp"]
-            if i == 0 and (start is None or start > timestamp):
-                start = timestamp
-            if i == -1 and (end is None or end < timestamp):
-                end = timestamp
-    return start, end
-
-
-def __timeseries_to_np_array(
+def _timeseries_to_np_array(
     sensor_data: dict, interpolation_resolution: timedelta
 ) -> np.array:
     """Convert a time series dict to a numpy array
 
+    The time grid starts at the earliest timestamp of all collections, points outside of
+    the measurements of a collection hold its first/last value, see resample.resample
+
     :param sensor_data: dict<CollectionType, list[Dict]>, see SearchQuery docstring
     :type sensor_data: dict
     :param interpolation_resolution: the timedelta at which interpolation takes place
@@ -94,162 +180,29 @@ def __timeseries_to_np_array(
     :return: the transformed time series
     :rtype: np.array
     """
+    return resample(sensor_data, interpolation_resolution)
 
-    def assign_arr_values(
-        arr: np.array, arr_i: int, feature_i: int, measurement: dict
-    ) -> None:
-        i = feature_i
-        for key in sorted(measurement):
-            if key != "timestamp":
-                arr[arr_i, i] = measurement[key]
-                i += 1
-
-    start, end = __get_start_and_end_time(sensor_data)
-    number_of_features = 0
-    collection_indices = {}
-    feature_indices = {}
-    for key in sensor_data:
-        collection_indices[key] = 0
-        feature_indices[key] = number_of_features
-        number_of_features += len(sensor_data[key][0]) - 1
-    arr = np.empty(
-        (math.ceil((end - start) / interpolation_resolution) + 1, number_of_features),
-        dtype=float,
-    )
-    time_index = start
-    arr_i = 0
-    while time_index <= end:
-        for c_type in sensor_data:
-            assigned = False
-            collection_indices[c_type]
-            while (
-                sensor_data[c_type][collection_indices[c_type]]["timestamp"]
-                <= time_index
-            ):
-                if collection_indices[c_type] + 1 < len(sensor_data[c_type]):
-                    collection_indices[c_type] = collection_indices[c_type] + 1
-                else:
-                    assign_arr_values(
-                        arr, arr_i, feature_indices[c_type], sensor_data[c_type][-1]
-                    )
-                    assigned = True
-                    break
-            if not assigned and collection_indices[c_type] == 0:
-                assign_arr_values(
-                    arr, arr_i, feature_indices[c_type], sensor_data[c_type][0]
-                )
-                assigned = True
-            if not assigned:
-                # Interpolation:
-                i = feature_indices[c_type]
-                for key in sorted(sensor_data[c_type][collection_indices[c_type]]):
-                    if key != "timestamp":
-                        arr[arr_i, i] = float(
-                            np.interp(
-                                x=time_index.timestamp(),
-                                xp=[
-                                    sensor_data[c_type][collection_indices[c_type] - 1][
-                                        "timestamp"
-                                    ].timestamp(),
-                                    sensor_data[c_type][collection_indices[c_type]][
-                                        "timestamp"
-                                    ].timestamp(),
-                                ],
-                                fp=[
-                                    sensor_data[c_type][collection_indices[c_type] - 1][
-                                        key
-                                    ],
-                                    sensor_data[c_type][collection_indices[c_type]][
-                                        key
-                                    ],
-                                ],
-                            )
-                        )
-                        i += 1
-        time_index += interpolation_resolution
-        arr_i += 1
-    return arr
-
-
-WARNING = "\033[93m"  # TODO should be replaced with logging
-ENDC = "\033[0m"
-
-seriesToSearch = None  # only for testing will be removed
-n = 0
 
-
-def __cdtw(seq1: np.array, seq2: np.array) -> float:
+def _cdtw(
+    seq1: np.array, seq2: np.array, max_dist: float = None, window: int = None
+) -> float:
     """Calls cdtw from the dtaidistance package
 
     :param seq1: first sequence for comparison
     :type seq1: np.array
     :param seq2: second sequence for comparison
     :type seq2: np.array
+    :param max_dist: stop the calculation and return inf, if the distance exceeds max_dist
+    :type max_dist: float, optional
+    :param window: warping window, None is unconstrained
+    :type window: int, optional
     :return: distance between sequences
     :rtype: float
     """
-    return dtw_ndim.distance(seq1, seq2, use_c=True, use_pruning=True)
-
-
-def __fastdtw(seq1: np.array, seq2: np.array) -> float:
-    """Calls fastdtw from the fastdtw package
-
-    :param seq1: first sequence for comparison
-    :type seq1: np.array
-    :param seq2: second sequence for comparison
-    :type seq2: np.array
-    :return: distance between sequences
-    :rtype: float
-    """
-    dis, p = fastdtw(seq1, seq2, dist=euclidean)
-    return dis
-
-
-def __search(
-    seq: np.array,
-    distance_function: callable,
-    percent_per_step: float,
-    gen: Generator,
-    duration: timedelta,
-) -> dict:
-    """Search for similar sequences to a numpy array with a given distance function
-
-    :param seq: numpy array to search for
-    :type seq: np.array
-    :param distance_function: distance function used for calculation
-    :type distance_function: callable
-    :param percent_per_step: how much progress will be done in one step
-    :type percent_per_step: float
-    :param gen: generator for the current time index
-    :type gen: Generator
-    :param duration: duration of the time series requested from __get_comparison_seq
-    :type duration: timedelta
-    :return: dict<distance, timestamp> the distance of the time series, starting with the timestamp for the given duration
-    :rtype: dict
-    """
-    d = {}
-    percent = 0.0
-    print("Progress: ")
-    timesum = timedelta(seconds=0)
-    for i in gen:
-        start = datetime.now()
-        seq2 = __get_comparison_seq(i, duration)
-        if seq2 is not None:
-            d[distance_function(seq, seq2)] = i
-        percent += percent_per_step
-        print(
-            str(int(percent))
-            + "%"
-            + " estimated time left: "
-            + str((timesum / percent) * (100 - percent)),
-            end="\r",
-        )
-        timesum += datetime.now() - start
-    print("\nDone")
-    return d
+    return dtw_ndim.distance(seq1, seq2, window=window, use_c=True, max_dist=max_dist)
 
 
-def __seq_generator(start: datetime, end: datetime, step: timedelta) -> Generator:
+def _seq_generator(start: datetime, end: datetime, step: timedelta) -> Generator:
     """Generates the times indices for time series comparisons
 
     :param start: starting time of interval to search in db, a python datetime object
@@ -267,68 +220,1180 @@ def __seq_generator(start: datetime, end: datetime, step: timedelta) -> Generato
         current += step
 
 
-def __get_comparison_seq(i: datetime, duration: timedelta) -> np.array:
-    """Requests the sequence for comparison
+def _until(generator: Generator, stop: callable) -> Generator:
+    """Passes the items of a generator through until stop returns true
 
-    :param i: current time index at which the sequence should begin
-    :type i: datetime
-    :param duration: duration of the sequence
-    :type duration: timedelta
-    :return: returns the sequence if data is found in all CollectionTypes, else return None
-    :rtype: np.array
+    :param generator: the generator
+    :type generator: Generator
+    :param stop: checked before every item
+    :type stop: callable
+    :yield: the items
+    :rtype: Generator
     """
-    result = __connection.get_numeric_sensor_data_by_time(
-        i, i + duration, __query.selected_features
-    )
-    for c_type in __query.selected_features:
-        if len(result[c_type]) == 0:
+    for item in generator:
+        if stop():
+            return
+        yield item
+
+
+class Searcher:
+    """Runs searches on a shared mongoDB connection
+
+    All state of a search is local to the call, so one Searcher (and its connection)
+    can serve several searches at once, e.g. from a thread pool.
+    Progress is reported to the progress callback, messages to the log callback.
+    """
+
+    def __init__(
+        self,
+        connection: MongoDBConnection,
+        progress: callable = None,
+        log: callable = None,
+        cache: ResultCache = None,
+        index: SaxIndex = None,
+        store: FeatureStore = None,
+        profile: SearchProfile = None,
+    ):
+        """Initializes a Searcher
+
+        :param connection: connection to the mongoDB, shared by all searches
+        :type connection: MongoDBConnection
+        :param progress: called with a progress.Progress object during a search,
+        e.g. progress.print_progress, None disables the reports, defaults to None
+        :type progress: callable, optional
+        :param log: called with messages (str) about a search, e.g. print,
+        None disables the messages, defaults to None
+        :type log: callable, optional
+        :param cache: cache for the results of Searcher.search, can be shared by several
+        Searchers, defaults to None
+        :type cache: ResultCache, optional
+        :param index: SAX index used by Searcher.search for the queries it supports
+        (see SaxIndex), defaults to None
+        :type index: SaxIndex, optional
+        :param store: pre-resampled sessions, read instead of the mongoDB by the queries
+        with sessions it contains (see FeatureStore), defaults to None
+        :type store: FeatureStore, optional
+        :param profile: collects the timings and counts of the searches, the connection
+        has to be a ProfiledConnection to count the fetches, see Searcher.explain,
+        defaults to None
+        :type profile: SearchProfile, optional
+        """
+        self.connection = connection
+        self.progress = progress
+        self.log = log
+        self.cache = cache
+        self.index = index
+        self.store = store
+        self.profile = profile
+
+    def __log(self, message: str) -> None:
+        if self.log is not None:
+            self.log(message)
+
+    def __tracker(self, stage: str, start: datetime, end: datetime) -> ProgressTracker:
+        return ProgressTracker(self.progress, stage, start, end)
+
+    def __distance(self) -> callable:
+        """Selects the dtw implementation
+
+        :return: distance function with the signature (seq1, seq2, max_dist, window)
+        :rtype: callable
+        """
+        if _DTW_C is not None:
+            return _cdtw
+        self.__log(
+            "C library for dtw not found, please install (with conda) for better results: "
+            "https://dtaidistance.readthedocs.io/en/latest/usage/installation.html"
+        )
+        self.__log(
+            "Using the built-in dtw kernel instead"
+            + (" (install numba for better results)..." if numba is None else "...")
+        )
+        return dtw_distance
+
+    def search(self, query: SearchQuery) -> list:
+        """Search the mongoDB for time series matching the query
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :return: list of the query.result_size best SearchResult objects, sorted by distance
+        :rtype: list
+        """
+        if query.sessions is not None:
+            return self.__session_search(query)
+        seq = self.__query_seq(query)
+        columns = self.__index_columns(query, seq)
+        store_columns = self.__store_columns(query)
+        if self.cache is not None:
+            generation = None
+            if columns is not None:
+                source = "index"
+                generation = self.index.generation
+            elif store_columns is not None:
+                source = "store"
+                generation = self.store.generation
+            else:
+                source = "database"
+            key = query_fingerprint(query, seq, source, generation)
+            version = {
+                c_type: self.connection.get_collection_by_type(c_type).data_version(
+                    query.start, query.end
+                )
+                for c_type in query.selected_features
+            }
+            results = self.cache.get(
+                key,
+                version,
+                query.result_size,
+                query.keep_ties,
+                query.suppress_overlap,
+            )
+            if results is not None:
+                self.__log("Using cached results")
+                return results
+        topk = TopK(query.result_size, query.keep_ties, query.suppress_overlap)
+        if query.mode == "spring":
+            self.__spring_search(seq, query, topk)
+        elif query.mode == "mass":
+            self.__mass_search(seq, query, topk)
+        elif query.coarse_resolution is not None:
+            self.__coarse_to_fine_search(seq, query, topk, self.__distance())
+        elif columns is not None:
+            self.__index_search(seq, query, topk, self.__distance(), columns)
+        elif store_columns is not None:
+            self.__store_search(seq, query, topk, self.__distance(), store_columns)
+        else:
+            self.__window_search(seq, query, topk, self.__distance())
+        results = self.__with_sessions(topk.results(), query)
+        if self.cache is not None:
+            self.cache.put(key, version, query.result_size, results)
+        return results
+
+    def explain(self, query: SearchQuery, profiler: str = None) -> SearchProfile:
+        """Runs a search and measures the time and counts of its stages
+
+        The search bypasses the cache. The kernel calls and the times per window are only
+        measured with query.workers == 1, the worker processes can not report them.
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param profiler: additionally run the search under "cprofile" or "pyinstrument"
+        (has to be installed), only the calling thread is profiled, defaults to None
+        :type profiler: str, optional
+        :raises exception: raise exception when the profiler is unknown or not installed
+        :return: the profile, its results are the results of the search
+        :rtype: SearchProfile
+        """
+        profile = SearchProfile()
+        searcher = Searcher(
+            ProfiledConnection(self.connection, profile),
+            self.progress,
+            self.log,
+            index=self.index,
+            store=self.store,
+            profile=profile,
+        )
+        if profiler is None:
+            runner = None
+        elif profiler == "cprofile":
+            runner = cProfile.Profile()
+            runner.enable()
+        elif profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise Exception("pyinstrument is not installed")
+            runner = Profiler()
+            runner.start()
+        else:
+            raise Exception("Unknown profiler: " + str(profiler))
+        begin = time.perf_counter()
+        profile.results = searcher.search(query)
+        profile.total_seconds = time.perf_counter() - begin
+        if profiler == "cprofile":
+            runner.disable()
+            output = io.StringIO()
+            pstats.Stats(runner, stream=output).sort_stats("cumulative").print_stats(30)
+            profile.profiler_output = output.getvalue()
+        elif profiler == "pyinstrument":
+            runner.stop()
+            profile.profiler_output = runner.output_text()
+        return profile
+
+    def __query_seq(self, query: SearchQuery) -> np.array:
+        """Resamples the query, see _timeseries_to_np_array
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :return: the resampled query
+        :rtype: np.array
+        """
+        begin = time.perf_counter()
+        seq = _timeseries_to_np_array(
+            query.data_to_search, query.interpolation_resolution
+        )
+        if self.profile is not None:
+            self.profile.add_resample(time.perf_counter() - begin)
+        return seq
+
+    def search_many(self, queries: list) -> list:
+        """Search the mongoDB for several time series with one pass over the data
+
+        The queries are grouped by interpolation_resolution. For every group the union of
+        the time ranges and selected features is fetched and resampled once, in chunks of
+        the smallest chunk_size, and every chunk is compared with all queries of the group.
+        The windows are aligned to the grid of the earliest start of the group, every query
+        compares its windows at its own step and keeps its own best results.
+        Only the "window" mode is supported, prefilter, coarse_resolution and sessions are
+        not used.
+
+        :param queries: list of SearchQuery objects
+        :type queries: list
+        :raises exception: raise exception when a query does not use the "window" mode
+        :return: one list of SearchResult objects per query, see search
+        :rtype: list
+        """
+        if any(query.mode != "window" for query in queries):
+            raise Exception('search_many only supports mode "window"')
+        if any(query.sessions is not None for query in queries):
+            raise Exception("search_many does not support sessions")
+        use_c = _DTW_C is not None
+        distance = _cdtw if use_c else dtw_distance
+        groups = {}
+        for query in queries:
+            groups.setdefault(query.interpolation_resolution, []).append(query)
+        patterns = {}
+        for resolution, group in groups.items():
+            start = min(query.start for query in group)
+            end = max(query.end for query in group)
+            features = union_features([query.selected_features for query in group])
+            sizes = [q.chunk_size for q in group if q.chunk_size is not None]
+            for query in group:
+                seq = _timeseries_to_np_array(query.data_to_search, resolution)
+                step = int(len(seq) / 3) if query.step is None else query.step
+                columns, collections = column_index(features, query.data_to_search)
+                first, last = BatchPattern.index_range(
+                    start, query.start, query.end, resolution, len(seq)
+                )
+                patterns[id(query)] = BatchPattern(
+                    seq,
+                    columns,
+                    collections,
+                    start,
+                    first,
+                    last,
+                    step,
+                    TopK(query.result_size, query.keep_ties, query.suppress_overlap),
+                    partial(distance, window=query.window),
+                    resolution,
+                    query.prune,
+                    query.window,
+                )
+            overlap = max(len(patterns[id(query)].seq) for query in group) - 1
+            self.__log(
+                "Searching "
+                + str(len(group))
+                + " queries with resolution "
+                + str(resolution)
+                + " in one pass"
+            )
+            tracker = self.__tracker("batch", start, end)
+            for chunk in iter_chunks(
+                self.connection,
+                features,
+                start,
+                end,
+                resolution,
+                overlap,
+                min(sizes) if sizes else None,
+            ):
+                for query in group:
+                    patterns[id(query)].score(chunk, query.workers is None and use_c)
+                tracker.update(chunk.timestamp(chunk.offset + len(chunk)))
+            tracker.finish()
+        results = []
+        for query in queries:
+            pattern = patterns[id(query)]
+            if query.prune:
+                self.__log(str(pattern.stats))
+            results.append(self.__with_sessions(pattern.topk.results(), query))
+        return results
+
+    def __with_sessions(self, results: list, query: SearchQuery) -> list:
+        """Sets the session id of the results
+
+        :param results: list of SearchResult objects
+        :type results: list
+        :param query: SearchQuery of the results
+        :type query: SearchQuery
+        :return: the results
+        :rtype: list
+        """
+        if query.session_id is not None:
+            for result in results:
+                result.session_id = query.session_id
+            return results
+        c_type = next(iter(query.selected_features))
+        collection = self.connection.get_collection_by_type(c_type)
+        for result in results:
+            if result.session_id is None:
+                result.session_id = collection.session_id_by_time(
+                    result.start, result.end
+                )
+        return results
+
+    def session_queries(self, query: SearchQuery, length: int) -> list:
+        """Creates one query per session of query.sessions, limited to the extent of the
+        session, the time between its first and last measurement in all collections
+
+        :param query: SearchQuery with sessions
+        :type query: SearchQuery
+        :param length: number of data points of the query sequence, shorter extents are skipped
+        :type length: int
+        :return: list of SearchQuery objects sorted by start
+        :rtype: list
+        """
+        if query.sessions == "all":
+            c_type = next(iter(query.selected_features))
+            session_ids = set(self.connection.get_session_ids()) | set(
+                self.connection.get_collection_by_type(c_type).session_ids(
+                    query.start, query.end
+                )
+            )
+        else:
+            session_ids = set(query.sessions)
+        queries = []
+        for session_id in session_ids:
+            extent = self.connection.get_session_extent(
+                session_id, list(query.selected_features)
+            )
+            if extent is None:
+                continue
+            start = max(query.start, extent[0])
+            end = min(query.end, extent[1])
+            if (
+                start >= end
+                or grid_size(start, end, query.interpolation_resolution) < length
+            ):
+                continue
+            session_query = copy.copy(query)
+            session_query.start = start
+            session_query.end = end
+            session_query.search_range_size = math.ceil(
+                (end - start) / query.interpolation_resolution
+            )
+            session_query.sessions = None
+            session_query.session_id = session_id
+            queries.append(session_query)
+        return sorted(queries, key=lambda session_query: session_query.start)
+
+    def __session_search(self, query: SearchQuery) -> list:
+        """Searches the sessions of query.sessions separately and in parallel threads
+        and merges their results, see SearchQuery
+
+        :param query: SearchQuery with sessions
+        :type query: SearchQuery
+        :return: list of the query.result_size best SearchResult objects, sorted by distance
+        :rtype: list
+        """
+        seq = self.__query_seq(query)
+        queries = self.session_queries(query, len(seq))
+        self.__log(
+            "Searching "
+            + str(len(queries))
+            + " sessions with "
+            + str(sum((q.end - q.start for q in queries), timedelta(0)))
+            + " of data in a range of "
+            + str(query.end - query.start)
+        )
+        # the sessions report no progress of their own, only the number of finished sessions
+        searcher = Searcher(
+            self.connection,
+            cache=self.cache,
+            index=self.index,
+            store=self.store,
+            profile=self.profile,
+        )
+        topk = TopK(query.result_size, query.keep_ties, query.suppress_overlap)
+        begin = datetime.now()
+        if self.progress is not None:
+            self.progress(Progress("sessions", "started"))
+        with ThreadPoolExecutor(query.session_workers) as executor:
+            futures = [executor.submit(searcher.search, q) for q in queries]
+            for done, future in enumerate(as_completed(futures), 1):
+                topk.merge(future.result())
+                if self.progress is not None:
+                    timesum = datetime.now() - begin
+                    self.progress(
+                        Progress(
+                            "sessions",
+                            "running",
+                            done / len(futures) * 100,
+                            timesum / done * (len(futures) - done),
+                        )
+                    )
+        if self.progress is not None:
+            self.progress(Progress("sessions", "done", 100.0, timedelta(0)))
+        return topk.results()
+
+    def __search(
+        self,
+        seq: np.array,
+        distance_function: callable,
+        windows: Generator,
+        tracker: ProgressTracker,
+        topk: TopK,
+        length: timedelta,
+        workers: int = 1,
+        prune: bool = False,
+        use_c: bool = False,
+        window: int = None,
+    ) -> TopK:
+        """Search for similar sequences to a numpy array with a given distance function
+
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :param distance_function: distance function used for calculation
+        :type distance_function: callable
+        :param windows: generator of (timestamp, sequence) tuples to compare,
+        a sequence of None is skipped
+        :type windows: Generator
+        :param tracker: reports the progress
+        :type tracker: ProgressTracker
+        :param topk: collects the best results
+        :type topk: TopK
+        :param length: duration of the compared windows
+        :type length: timedelta
+        :param workers: number of processes, None uses all cores, defaults to 1
+        :type workers: int, optional
+        :param prune: reject windows which can not be among the best results, defaults to False
+        :type prune: bool, optional
+        :param use_c: distance_function is the dtw of dtaidistance, which allows to use its
+        parallel C implementation if workers is None, defaults to False
+        :type use_c: bool, optional
+        :param window: warping window of the distance function, used for pruning
+        :type window: int, optional
+        :return: topk containing the best results
+        :rtype: TopK
+        """
+        stats = PruningStats()
+        for i, _ in self.__score(
+            seq,
+            distance_function,
+            windows,
+            topk,
+            length,
+            stats,
+            workers,
+            prune,
+            use_c,
+            window,
+        ):
+            tracker.update(i)
+        tracker.finish()
+        if prune:
+            self.__log(str(stats))
+        return topk
+
+    def __score(
+        self,
+        seq: np.array,
+        distance_function: callable,
+        windows: Generator,
+        topk: TopK,
+        length: timedelta,
+        stats: PruningStats,
+        workers: int = 1,
+        prune: bool = False,
+        use_c: bool = False,
+        window: int = None,
+    ) -> Generator[Tuple[datetime, bool], None, None]:
+        """Compares the windows and adds the best ones to topk, see __search
+
+        :param stats: collects the pruning stats
+        :type stats: PruningStats
+        :yield: time of the last compared window (of a batch if workers != 1)
+        and whether topk changed
+        :rtype: Generator[Tuple[datetime, bool], None, None]
+        """
+        if self.profile is not None:
+            windows = self.profile.windows_of(windows)
+            if workers == 1:
+                # the workers processes can not report to the profile
+                distance_function = self.profile.kernel(distance_function)
+        if workers == 1:
+            cascade = PruningCascade(seq, distance_function, window=window)
+            cascade.stats = stats
+            for i, seq2 in windows:
+                changed = False
+                if seq2 is not None:
+                    begin = time.perf_counter()
+                    if prune:
+                        distance = cascade.distance(seq2, topk.threshold)
+                    else:
+                        distance = distance_function(seq, seq2)
+                    if distance is not None:
+                        changed = topk.push(SearchResult(distance, i, length))
+                    if self.profile is not None:
+                        self.profile.add_window(time.perf_counter() - begin)
+                yield i, changed
+        else:
+            for i, batch_stats, changed in score_windows(
+                seq,
+                distance_function,
+                windows,
+                topk,
+                length,
+                workers,
+                use_c=workers is None and use_c,
+                prune=prune,
+                window=window,
+            ):
+                stats.merge(batch_stats)
+                yield i, changed
+        if self.profile is not None:
+            self.profile.add_pruning(stats)
+
+    def __window_search(
+        self, seq: np.array, query: SearchQuery, topk: TopK, distance: callable
+    ) -> TopK:
+        """Search by comparing the windows at every step with dtw
+
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param topk: collects the best results
+        :type topk: TopK
+        :param distance: distance function with the signature (seq1, seq2, max_dist, window)
+        :type distance: callable
+        :return: topk containing the best results
+        :rtype: TopK
+        """
+        duration = len(seq) * query.interpolation_resolution
+        return self.__search(
+            seq,
+            partial(distance, window=query.window),
+            self.__windows(seq, query),
+            self.__tracker("search", query.start, query.end - duration),
+            topk,
+            duration,
+            query.workers,
+            query.prune,
+            _DTW_C is not None,
+            query.window,
+        )
+
+    def __index_columns(self, query: SearchQuery, seq: np.array) -> np.array:
+        """Checks if the index supports a query
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :return: the indexed feature of every column of the query (see SaxIndex.columns)
+        or None if the query is not searched with the index
+        :rtype: np.array
+        """
+        if (
+            self.index is None
+            or query.mode != "window"
+            or query.prefilter is not None
+            or query.coarse_resolution is not None
+            or query.interpolation_resolution != self.index.resolution
+            or len(seq) < self.index.length
+        ):
+            return None
+        return self.index.columns(query.data_to_search)
+
+    def __index_search(
+        self,
+        seq: np.array,
+        query: SearchQuery,
+        topk: TopK,
+        distance: callable,
+        columns: np.array,
+    ) -> TopK:
+        """Search with the SAX index, only the windows whose lower bound is below the
+        current best results are fetched and compared with dtw
+
+        The windows are aligned to the grid of their session and the step of the index,
+        query.step and query.prefetch are not used.
+
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param topk: collects the best results
+        :type topk: TopK
+        :param distance: distance function with the signature (seq1, seq2, max_dist, window)
+        :type distance: callable
+        :param columns: indexed feature of every column of the query
+        :type columns: np.array
+        :return: topk containing the best results
+        :rtype: TopK
+        """
+        duration = len(seq) * query.interpolation_resolution
+        distance_function = partial(distance, window=query.window)
+        cascade = PruningCascade(seq, distance_function, window=query.window)
+        index_stats = IndexStats()
+        # the windows are compared in the order of their lower bound, not by time
+        tracker = self.__tracker("index", query.start, query.end - duration)
+        for lower_bound, session_id, i in self.index.candidates(
+            seq,
+            columns,
+            lambda: with_tolerance(topk.threshold),
+            query.start,
+            query.end,
+            query.window,
+            query.session_id,
+            index_stats,
+        ):
+            seq2 = self.index.window(self.connection, session_id, i, len(seq))
+            if seq2 is None:
+                continue
+            seq2 = seq2[:, columns]
+            if query.prune:
+                result = cascade.distance(seq2, topk.threshold)
+            else:
+                result = distance_function(seq, seq2)
+            if result is not None:
+                topk.push(SearchResult(result, i, duration, session_id))
+        tracker.finish()
+        self.__log(str(index_stats))
+        if query.prune:
+            self.__log(str(cascade.stats))
+        return topk
+
+    def __store_columns(self, query: SearchQuery) -> np.array:
+        """Checks if the windows of a query can be read from the feature store
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :return: the stored column of every feature of the query (see FeatureStore.columns)
+        or None if the windows are read from the mongoDB
+        :rtype: np.array
+        """
+        if (
+            self.store is None
+            or query.session_id is None
+            or query.mode != "window"
+            or query.prefilter is not None
+            or query.coarse_resolution is not None
+            or not self.store.has(query.session_id, query.interpolation_resolution)
+        ):
             return None
-    return __timeseries_to_np_array(result, __query.interpolation_resolution)
+        return self.store.columns(query.data_to_search)
+
+    def __store_search(
+        self,
+        seq: np.array,
+        query: SearchQuery,
+        topk: TopK,
+        distance: callable,
+        columns: np.array,
+    ) -> TopK:
+        """Search by comparing the windows of the feature store at every step with dtw
+
+        The windows are aligned to the grid of the session, like query.prefetch when
+        query.start is before the session.
+
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :param query: SearchQuery of one session (query.session_id)
+        :type query: SearchQuery
+        :param topk: collects the best results
+        :type topk: TopK
+        :param distance: distance function with the signature (seq1, seq2, max_dist, window)
+        :type distance: callable
+        :param columns: stored column of every feature of the query
+        :type columns: np.array
+        :return: topk containing the best results
+        :rtype: TopK
+        """
+        resolution = query.interpolation_resolution
+        step = int(len(seq) / 3) if query.step is None else query.step
+        duration = len(seq) * resolution
+        self.__log(
+            "Reading the windows of session "
+            + str(query.session_id)
+            + " from the feature store"
+        )
+        return self.__search(
+            seq,
+            partial(distance, window=query.window),
+            self.store.windows(
+                query.session_id,
+                resolution,
+                columns,
+                query.start,
+                query.end,
+                len(seq),
+                step,
+                query.chunk_size,
+            ),
+            self.__tracker("search", query.start, query.end - duration),
+            topk,
+            duration,
+            query.workers,
+            query.prune,
+            _DTW_C is not None,
+            query.window,
+        )
+
+    def __windows(
+        self,
+        seq: np.array,
+        query: SearchQuery,
+        after: datetime = None,
+        stop: callable = None,
+    ) -> Generator:
+        """Creates the windows of the "window" mode
+
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param after: only windows starting after this time, defaults to None
+        :type after: datetime, optional
+        :param stop: checked between the chunks of the prefilter scan, which runs before
+        the first window, the scan is aborted when it returns true, defaults to None
+        :type stop: callable, optional
+        :return: generator of (timestamp, sequence) tuples, a sequence of None is skipped,
+        None if the prefilter scan was aborted
+        :rtype: Generator
+        """
+        resolution = query.interpolation_resolution
+        step = int(len(seq) / 3) if query.step is None else query.step
+        duration = len(seq) * resolution
+        start = query.start
+        if after is not None:
+            # the first window after `after`, on the step grid of query.start
+            start += ((after - query.start) // (resolution * step) + 1) * (
+                resolution * step
+            )
+        self.__log(
+            "This query will run "
+            + str(max(int((query.end - start) / (resolution * step)), 0))
+            + " dtw calculations, each with "
+            + str(len(seq))
+            + " data points"
+        )
+        if query.prefilter is not None:
+            chunks = iter_chunks(
+                self.connection,
+                query.selected_features,
+                query.start,
+                query.end,
+                resolution,
+                len(seq) - 1,
+                query.chunk_size,
+                query.session_id,
+            )
+            if stop is not None:
+                chunks = _until(chunks, stop)
+            windows = mass_candidates(
+                seq,
+                chunks,
+                query.prefilter,
+                step,
+                grid_size(query.start, query.end, resolution) - len(seq),
+            )
+            if stop is not None and stop():
+                # the candidates of a partial scan are not the best of the whole range
+                return None
+            self.__log(
+                "Prefiltered "
+                + str(len(windows))
+                + " candidates with the z-normalized euclidean distance"
+            )
+            return [(i, seq2) for i, seq2 in windows if i >= start]
+        if start >= query.end:
+            return []
+        if query.prefetch:
+            return iter_windows(
+                self.connection,
+                query.selected_features,
+                start,
+                query.end,
+                resolution,
+                len(seq),
+                step,
+                query.chunk_size,
+                query.session_id,
+            )
+        return self.__fetched_seq_generator(
+            _seq_generator(start, query.end - duration, resolution * step),
+            query,
+            duration,
+        )
+
+    def iter_search(
+        self,
+        query: SearchQuery,
+        budget: timedelta = None,
+        cancel: Event = None,
+        resume: SearchSnapshot = None,
+    ) -> Generator[SearchSnapshot, None, None]:
+        """Incremental search, yields a snapshot every time the best results improve
+
+        The last snapshot contains the session ids of the results and is complete if all
+        windows were compared. The search stops early (incomplete) when the budget is
+        exceeded, when cancel is set or when the generator is closed. An incomplete
+        snapshot can be passed as resume to continue the search later.
+        Only the "window" mode without coarse_resolution and sessions is supported.
+
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param budget: stop after this time and yield the best results so far, defaults to None
+        :type budget: timedelta, optional
+        :param cancel: stop as soon as the event is set, e.g. from another thread,
+        defaults to None
+        :type cancel: Event, optional
+        :param resume: snapshot of an earlier search with the same query, the search
+        continues after its position with its results, defaults to None
+        :type resume: SearchSnapshot, optional
+        :raises exception: raise exception when the query can not be searched incrementally
+        :yield: snapshots of the best results
+        :rtype: Generator[SearchSnapshot, None, None]
+        """
+        if (
+            query.mode != "window"
+            or query.coarse_resolution is not None
+            or query.sessions is not None
+        ):
+            raise Exception(
+                'iter_search only supports mode "window" without coarse_resolution'
+                " and sessions"
+            )
+        begin = datetime.now()
+
+        def exceeded() -> bool:
+            return (budget is not None and datetime.now() - begin > budget) or (
+                cancel is not None and cancel.is_set()
+            )
+
+        seq = _timeseries_to_np_array(
+            query.data_to_search, query.interpolation_resolution
+        )
+        topk = TopK(query.result_size, query.keep_ties, query.suppress_overlap)
+        position = None
+        if resume is not None:
+            topk.merge(resume.results)
+            position = resume.position
+        duration = len(seq) * query.interpolation_resolution
+        tracker = self.__tracker("search", query.start, query.end - duration)
+        stats = PruningStats()
+        complete = True
+        windows = self.__windows(seq, query, position, exceeded)
+        if windows is None:
+            complete = False
+            windows = []
+        for i, changed in self.__score(
+            seq,
+            partial(self.__distance(), window=query.window),
+            windows,
+            topk,
+            duration,
+            stats,
+            query.workers,
+            query.prune,
+            _DTW_C is not None,
+            query.window,
+        ):
+            position = i
+            tracker.update(i)
+            if changed:
+                yield SearchSnapshot(
+                    topk.results(), position, False, datetime.now() - begin
+                )
+            if exceeded():
+                complete = False
+                break
+        tracker.finish()
+        if query.prune:
+            self.__log(str(stats))
+        yield SearchSnapshot(
+            self.__with_sessions(topk.results(), query),
+            position,
+            complete,
+            datetime.now() - begin,
+        )
+
+    def __coarse_to_fine_search(
+        self, seq: np.array, query: SearchQuery, topk: TopK, distance: callable
+    ) -> TopK:
+        """Search at query.coarse_resolution first and compare only the neighborhoods of the
+        best coarse windows at query.interpolation_resolution
+
+        :param seq: numpy array to search for, at query.interpolation_resolution
+        :type seq: np.array
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param topk: collects the best results
+        :type topk: TopK
+        :param distance: distance function with the signature (seq1, seq2, max_dist, window)
+        :type distance: callable
+        :return: topk containing the best results
+        :rtype: TopK
+        """
+        use_c = _DTW_C is not None
+        resolution = query.interpolation_resolution
+        coarse = SearchLevel("coarse", query.coarse_resolution)
+        fine = SearchLevel("fine", resolution)
+        begin = datetime.now()
+        coarse_seq = _timeseries_to_np_array(
+            query.data_to_search, query.coarse_resolution
+        )
+        coarse_duration = len(coarse_seq) * query.coarse_resolution
+        window = query.window
+        if window is not None:
+            window = max(math.ceil(window * resolution / query.coarse_resolution), 1)
+        candidates = TopK(query.result_size * query.coarse_candidates)
+        self.__search(
+            coarse_seq,
+            partial(distance, window=window),
+            coarse.count(
+                iter_windows(
+                    self.connection,
+                    query.selected_features,
+                    query.start,
+                    query.end,
+                    query.coarse_resolution,
+                    len(coarse_seq),
+                    1,
+                    query.chunk_size,
+                    query.session_id,
+                )
+            ),
+            self.__tracker("coarse", query.start, query.end - coarse_duration),
+            candidates,
+            coarse_duration,
+            query.workers,
+            query.prune,
+            use_c,
+            window,
+        )
+        coarse.candidates = len(candidates)
+        coarse.duration = datetime.now() - begin
+        self.__log(str(coarse))
+
+        begin = datetime.now()
+        duration = len(seq) * resolution
+        last = query.start + (
+            grid_size(query.start, query.end, resolution) - len(seq)
+        ) * (resolution)
+        regions = candidate_regions(
+            [result.start for result in candidates.results()],
+            query.coarse_resolution,
+            query.start,
+            last,
+            resolution,
+        )
+        step = 1 if query.step is None else query.step
+
+        def windows() -> Generator:
+            for first, end in regions:
+                yield from iter_windows(
+                    self.connection,
+                    query.selected_features,
+                    first,
+                    end + duration - resolution,
+                    resolution,
+                    len(seq),
+                    step,
+                    session_id=query.session_id,
+                )
+
+        self.__search(
+            seq,
+            partial(distance, window=query.window),
+            fine.count(windows()),
+            self.__tracker("fine", query.start, last),
+            topk,
+            duration,
+            query.workers,
+            query.prune,
+            use_c,
+            query.window,
+        )
+        fine.candidates = len(regions)
+        fine.duration = datetime.now() - begin
+        self.__log(str(fine))
+        return topk
+
+    def __spring_search(self, seq: np.array, query: SearchQuery, topk: TopK) -> TopK:
+        """Search with streaming subsequence dtw (SPRING), every offset of the search range
+        is evaluated in one pass over the resampled data, see spring.SpringMatcher
+
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param topk: collects the best results
+        :type topk: TopK
+        :return: topk containing the best results
+        :rtype: TopK
+        """
+        resolution = query.interpolation_resolution
+        matcher = SpringMatcher(seq)
+        self.__log(
+            "This query will run streaming dtw over "
+            + str(grid_size(query.start, query.end, resolution))
+            + " data points for a query of "
+            + str(len(seq))
+            + " data points"
+        )
+        tracker = self.__tracker("spring", query.start, query.end)
+
+        def push(matches: list) -> None:
+            for distance, first, last in matches:
+                topk.push(
+                    SearchResult(
+                        distance,
+                        query.start + first * resolution,
+                        (last - first + 1) * resolution,
+                    )
+                )
+
+        for chunk in iter_chunks(
+            self.connection,
+            query.selected_features,
+            query.start,
+            query.end,
+            resolution,
+            chunk_size=query.chunk_size,
+            session_id=query.session_id,
+        ):
+            push(matcher.update(chunk.data, chunk.offset))
+            tracker.update(chunk.timestamp(chunk.offset + len(chunk)))
+        push(matcher.finish())
+        tracker.finish()
+        return topk
+
+    def __mass_search(self, seq: np.array, query: SearchQuery, topk: TopK) -> TopK:
+        """Search with the z-normalized euclidean distance profile (MASS), see mass.mass_search
+
+        :param seq: numpy array to search for
+        :type seq: np.array
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param topk: collects the best results
+        :type topk: TopK
+        :return: topk containing the best results
+        :rtype: TopK
+        """
+        resolution = query.interpolation_resolution
+        step = 1 if query.step is None else query.step
+        last = grid_size(query.start, query.end, resolution) - len(seq)
+        self.__log(
+            "This query will calculate the distance profile of "
+            + str(last // step + 1)
+            + " windows, each with "
+            + str(len(seq))
+            + " data points"
+        )
+        tracker = self.__tracker("mass", query.start, query.start + last * resolution)
+        chunks = iter_chunks(
+            self.connection,
+            query.selected_features,
+            query.start,
+            query.end,
+            resolution,
+            len(seq) - 1,
+            query.chunk_size,
+            query.session_id,
+        )
+        for i, _ in mass_search(seq, chunks, topk, step, last):
+            tracker.update(i)
+        tracker.finish()
+        return topk
+
+    def __get_comparison_seq(
+        self, i: datetime, query: SearchQuery, duration: timedelta
+    ) -> np.array:
+        """Requests the sequence for comparison
+
+        :param i: current time index at which the sequence should begin
+        :type i: datetime
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param duration: duration of the sequence
+        :type duration: timedelta
+        :return: returns the sequence if data is found in all CollectionTypes, else return None
+        :rtype: np.array
+        """
+        result = self.connection.get_numeric_sensor_data_by_time(
+            i, i + duration, query.selected_features, query.session_id
+        )
+        for c_type in query.selected_features:
+            if len(result[c_type]) == 0:
+                return None
+        return _timeseries_to_np_array(result, query.interpolation_resolution)
+
+    def __fetched_seq_generator(
+        self, gen: Generator, query: SearchQuery, duration: timedelta
+    ) -> Generator:
+        """Requests the sequence for comparison for every time index of a generator
+
+        :param gen: generator for the current time index
+        :type gen: Generator
+        :param query: SearchQuery specifies the search parameters
+        :type query: SearchQuery
+        :param duration: duration of the sequence
+        :type duration: timedelta
+        :yield: current time index and the sequence, see __get_comparison_seq
+        :rtype: Generator
+        """
+        for i in gen:
+            yield i, self.__get_comparison_seq(i, query, duration)
 
 
-def search(query: SearchQuery, connection: MongoDBConnection) -> dict:
-    """Search the mongoDB for time series matching the query
+def search(query: SearchQuery, connection: MongoDBConnection) -> list:
+    """Search the mongoDB for time series matching the query,
+    prints the progress to stdout, see Searcher.search
 
     :param query: SearchQuery specifies the search parameters
     :type query: SearchQuery
     :param connection: connection to the mongoDB
     :type connection: MongoDBConnection
-    :return: dict<distance, timestamp at which the compared time series begins>, dict of search results sorted by distance
-    :rtype: dict
+    :return: list of the query.result_size best SearchResult objects, sorted by distance
+    :rtype: list
     """
-    global __query
-    global __connection
-    __query = query
-    __connection = connection
-    seq = __timeseries_to_np_array(query.data_to_search, query.interpolation_resolution)
-    step = int(len(seq) / 3) if query.step is None else query.step
-    print(
-        "This query will run "
-        + str(int((query.end - query.start) / (query.interpolation_resolution * step)))
-        + " dtw calculations, each with "
-        + str(len(seq))
-        + " data points"
-    )
-    p = (step / (query.search_range_size - len(seq))) * 100
-    duration = len(seq) * query.interpolation_resolution
-    gen = __seq_generator(
-        query.start, query.end - duration, query.interpolation_resolution * step
-    )
-    if dtw_ndim.dtw_cc is None:
-        print(
-            WARNING
-            + "C library for dtw not found, please install (with conda) for better results: "
-            "https://dtaidistance.readthedocs.io/en/latest/usage/installation.html"
-        )
-        print("Using fastdtw approximation instead..." + ENDC)
-        d = __search(seq, __fastdtw, p, gen, duration)
-    else:
-        d = __search(seq, __cdtw, p, gen, duration)
-    i = 0
-    result = {}
-    for k in sorted(d):
-        result[k] = d[k]
-        if i >= query.result_size:
-            break
-        i += 1
-    return result
+    return Searcher(connection, print_progress, print).search(query)
+
+
+def search_many(queries: list, connection: MongoDBConnection) -> list:
+    """Search the mongoDB for several time series with one pass over the data,
+    prints the progress to stdout, see Searcher.search_many
+
+    :param queries: list of SearchQuery objects
+    :type queries: list
+    :param connection: connection to the mongoDB
+    :type connection: MongoDBConnection
+    :return: one list of SearchResult objects per query, see search
+    :rtype: list
+    """
+    return Searcher(connection, print_progress, print).search_many(queries)
+
+
+def explain(
+    query: SearchQuery, connection: MongoDBConnection, profiler: str = None
+) -> SearchProfile:
+    """Runs a search and prints the timings and counts of its stages,
+    see Searcher.explain
+
+    :param query: SearchQuery specifies the search parameters
+    :type query: SearchQuery
+    :param connection: connection to the mongoDB
+    :type connection: MongoDBConnection
+    :param profiler: "cprofile" or "pyinstrument", defaults to None
+    :type profiler: str, optional
+    :return: the profile, its results are the results of the search
+    :rtype: SearchProfile
+    """
+    profile = Searcher(connection, print_progress, print).explain(query, profiler)
+    print(profile)
+    if profile.profiler_output is not None:
+        print(profile.profiler_output)
+    return profile
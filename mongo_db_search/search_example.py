@@ -39,5 +39,5 @@ result = search(
     connection,
 )
 
-for k in result:
-    print("distance: " + str(k) + " at time: " + str(result[k]))
+for r in result:
+    print("distance: " + str(r.distance) + " at time: " + str(r.start))
@@ -0,0 +1,191 @@
+import math
+from typing import List, Tuple
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _spring_numpy(
+    x: np.array,
+    first: int,
+    y: np.array,
+    d: np.array,
+    s: np.array,
+    state: np.array,
+) -> List[Tuple[float, int, int]]:
+    """Processes a block of rows with the SPRING recurrence, every row is one vectorized step
+
+    The dependency of a cell on the cell of the previous query point in the same row
+    is a (min, +) prefix scan, which is solved with a cumulative minimum.
+
+    :param x: block of data rows with shape (rows, features)
+    :type x: np.array
+    :param first: global index of the first row
+    :type first: int
+    :param y: query with shape (length, features)
+    :type y: np.array
+    :param d: accumulated squared costs of the last row, updated in place
+    :type d: np.array
+    :param s: start indices of the paths of the last row, updated in place
+    :type s: np.array
+    :param state: [best squared cost, start, end] of the pending match and the end of
+    the last reported match, updated in place
+    :type state: np.array
+    :return: list of (squared cost, start, end) of the reported matches
+    :rtype: List[Tuple[float, int, int]]
+    """
+    matches = []
+    index = np.arange(len(y))
+    for row in range(len(x)):
+        t = first + row
+        costs = np.sum((y - x[row]) ** 2, axis=1)
+        diagonal = np.concatenate(([0.0], d[:-1]))
+        diagonal_s = np.concatenate(([t], s[:-1]))
+        use_diagonal = diagonal <= d
+        previous = np.where(use_diagonal, diagonal, d)
+        previous_s = np.where(use_diagonal, diagonal_s, s)
+        cumulative = np.cumsum(costs)
+        values = previous - (cumulative - costs)
+        best = np.minimum.accumulate(values)
+        origin = np.maximum.accumulate(np.where(values <= best, index, 0))
+        d[:] = cumulative + best
+        s[:] = previous_s[origin]
+        _report(d, s, state, t, matches)
+    return matches
+
+
+def _report(d: np.array, s: np.array, state: np.array, t: int, matches: list) -> None:
+    """Reports the pending match once no overlapping path can become better and
+    updates the pending match, paths starting inside the last reported match are excluded
+    """
+    d_min, start, end, _ = state
+    if d_min < math.inf and np.all((d >= d_min) | (s > end)):
+        matches.append((float(d_min), int(start), int(end)))
+        state[0] = math.inf
+        state[3] = end
+    if d[-1] < state[0] and s[-1] > state[3]:
+        state[0], state[1], state[2] = d[-1], s[-1], t
+
+
+def _spring_numba(
+    x: np.array,
+    first: int,
+    y: np.array,
+    d: np.array,
+    s: np.array,
+    state: np.array,
+) -> np.array:
+    """Processes a block of rows with the SPRING recurrence, compiled by numba,
+    see _spring_numpy. Returns an array with one (squared cost, start, end) row per match
+    """
+    length = y.shape[0]
+    matches = np.empty((x.shape[0], 3))
+    found = 0
+    for row in range(x.shape[0]):
+        t = first + row
+        left = 0.0
+        left_s = t
+        diagonal = 0.0
+        diagonal_s = t
+        for i in range(length):
+            cost = 0.0
+            for f in range(y.shape[1]):
+                diff = y[i, f] - x[row, f]
+                cost += diff * diff
+            up = d[i]
+            up_s = s[i]
+            if diagonal <= up:
+                previous = diagonal
+                previous_s = diagonal_s
+            else:
+                previous = up
+                previous_s = up_s
+            if i > 0 and left < previous:
+                previous = left
+                previous_s = left_s
+            diagonal = up
+            diagonal_s = up_s
+            left = cost + previous
+            left_s = previous_s
+            d[i] = left
+            s[i] = left_s
+        if state[0] < np.inf:
+            report = True
+            for i in range(length):
+                if d[i] < state[0] and s[i] <= state[2]:
+                    report = False
+                    break
+            if report:
+                matches[found, 0] = state[0]
+                matches[found, 1] = state[1]
+                matches[found, 2] = state[2]
+                found += 1
+                state[0] = np.inf
+                state[3] = state[2]
+        if d[length - 1] < state[0] and s[length - 1] > state[3]:
+            state[0] = d[length - 1]
+            state[1] = s[length - 1]
+            state[2] = t
+    return matches[:found]
+
+
+if numba is not None:
+    _spring_numba = numba.njit(cache=True, nogil=True)(_spring_numba)
+
+
+class SpringMatcher:
+    """Streaming subsequence dtw (SPRING, Sakurai et al. 2007)
+
+    The data is fed row by row (in blocks), every row updates one column of the
+    dtw matrix of the query, whose paths may start at any row. For every row the best
+    subsequence ending there is known, overlapping candidates are grouped and only the
+    best subsequence of each group is reported, so the matches are disjoint.
+    Unlike the original SPRING, paths overlapping a reported match are not reset but
+    can not become a candidate, this keeps the reported distances exact.
+    The total costs are O(rows * query length), the memory O(query length).
+    The distance of a match equals the dtw distance (squared euclidean costs,
+    same as dtaidistance) of the query to the matched subsequence.
+    """
+
+    def __init__(self, query: np.array):
+        """Initializes the matcher
+
+        :param query: the query with shape (length, features)
+        :type query: np.array
+        """
+        self.query = np.ascontiguousarray(query, dtype=np.float64)
+        self.d = np.full(len(query), np.inf)
+        self.s = np.zeros(len(query), dtype=np.int64)
+        self.state = np.array([np.inf, 0.0, 0.0, -1.0])
+
+    def update(self, rows: np.array, first: int) -> List[Tuple[float, int, int]]:
+        """Processes a block of consecutive data rows
+
+        :param rows: data rows with shape (rows, features)
+        :type rows: np.array
+        :param first: global index of the first row
+        :type first: int
+        :return: list of (distance, first row, last row) of the matches found
+        :rtype: List[Tuple[float, int, int]]
+        """
+        rows = np.ascontiguousarray(rows, dtype=np.float64)
+        if numba is None:
+            matches = _spring_numpy(rows, first, self.query, self.d, self.s, self.state)
+        else:
+            matches = _spring_numba(rows, first, self.query, self.d, self.s, self.state)
+        return [(math.sqrt(m[0]), int(m[1]), int(m[2])) for m in matches]
+
+    def finish(self) -> List[Tuple[float, int, int]]:
+        """Reports the pending match at the end of the data
+
+        :return: list of (distance, first row, last row) with at most one match
+        :rtype: List[Tuple[float, int, int]]
+        """
+        d_min, start, end, _ = self.state
+        self.state[0] = np.inf
+        if math.isinf(d_min):
+            return []
+        return [(math.sqrt(d_min), int(start), int(end))]
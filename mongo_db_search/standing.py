@@ -0,0 +1,314 @@
+import math
+from datetime import datetime, timedelta
+from threading import Event
+from pymongo import ASCENDING
+from mongo_db.mongodb_connection import CollectionType, MongoDBConnection
+from mongo_db_search.resample import MICROSECOND, resample
+from mongo_db_search.search import SearchQuery, Searcher
+from mongo_db_search.topk import SearchResult
+
+QUERIES = "standing_queries"
+MATCHES = "standing_matches"
+
+# measurements inserted less than this before an evaluation are searched again by the
+# next evaluation, they may belong to an ingest that is still running or come from a
+# host with a slightly different clock
+INGEST_LAG = timedelta(minutes=1)
+
+
+class StandingQueries:
+    """Registry of standing queries, which are matched against newly ingested data
+
+    The queries and their matches are stored in the mongoDB collections
+    standing_queries and standing_matches. Every evaluation only searches the time
+    ranges of the measurements inserted since the last evaluation (see
+    MongoDBTimeSeriesData.ingested_since) plus an overlap of one query length, so the
+    costs are proportional to the new data, not to the history. Late uploads and
+    sessions older than the newest one are searched as well.
+    """
+
+    def __init__(self, connection: MongoDBConnection, searcher: Searcher = None):
+        """Initializes the registry
+
+        :param connection: connection to the mongoDB
+        :type connection: MongoDBConnection
+        :param searcher: Searcher used for the evaluation, defaults to a silent Searcher
+        :type searcher: Searcher, optional
+        """
+        self.connection = connection
+        self.searcher = Searcher(connection) if searcher is None else searcher
+        self.queries = connection.database[QUERIES]
+        self.matches = connection.database[MATCHES]
+        self.matches.create_index(
+            [("query", ASCENDING), ("start", ASCENDING)], unique=True
+        )
+
+    def register(
+        self,
+        name: str,
+        data_to_search: dict,
+        interpolation_resolution: timedelta,
+        start: datetime,
+        threshold: float = math.inf,
+        result_size: int = 100,
+        step: int = None,
+        window: int = None,
+    ) -> None:
+        """Registers a standing query or replaces the query with the same name
+
+        :param name: unique name of the query
+        :type name: str
+        :param data_to_search: dict<CollectionType, list[Dict]>, see SearchQuery
+        :type data_to_search: dict
+        :param interpolation_resolution: see SearchQuery
+        :type interpolation_resolution: timedelta
+        :param start: data before this time is not searched, the windows are aligned to it
+        :type start: datetime
+        :param threshold: only windows with a smaller or equal distance are matches,
+        defaults to inf
+        :type threshold: float, optional
+        :param result_size: maximal number of matches per searched range, only used
+        without threshold, defaults to 100
+        :type result_size: int, optional
+        :param step: see SearchQuery
+        :type step: int, optional
+        :param window: see SearchQuery
+        :type window: int, optional
+        """
+        self.queries.replace_one(
+            {"name": name},
+            {
+                "name": name,
+                "data_to_search": {
+                    c_type.value: data_to_search[c_type] for c_type in data_to_search
+                },
+                "interpolation_resolution": interpolation_resolution // MICROSECOND,
+                "start": start,
+                "threshold": threshold,
+                "result_size": result_size,
+                "step": step,
+                "window": window,
+                # insertion time up to which the measurements are evaluated
+                "ingested_until": None,
+            },
+            upsert=True,
+        )
+
+    def unregister(self, name: str) -> None:
+        """Removes a standing query and its matches
+
+        :param name: name of the query
+        :type name: str
+        """
+        self.queries.delete_one({"name": name})
+        self.matches.delete_many({"query": name})
+
+    def names(self) -> list:
+        """Returns the names of all standing queries
+
+        :return: list of names
+        :rtype: list
+        """
+        return [doc["name"] for doc in self.queries.find({}, {"name": True})]
+
+    def evaluate(self, name: str = None) -> int:
+        """Searches the data ingested since the last evaluation
+
+        :param name: name of the query to evaluate, defaults to all queries
+        :type name: str, optional
+        :return: number of new matches
+        :rtype: int
+        """
+        count = 0
+        for doc in self.queries.find({} if name is None else {"name": name}):
+            count += self.__evaluate(doc)
+        return count
+
+    def get_matches(self, name: str) -> list:
+        """Returns the matches of a standing query
+
+        :param name: name of the query
+        :type name: str
+        :return: list of SearchResult objects sorted by time
+        :rtype: list
+        """
+        return [
+            SearchResult(
+                doc["distance"],
+                doc["start"],
+                doc["end"] - doc["start"],
+                doc.get("session_id"),
+            )
+            for doc in self.matches.find({"query": name}).sort("start", ASCENDING)
+        ]
+
+    def __evaluate(self, doc: dict) -> int:
+        """Evaluates one standing query, see evaluate
+
+        :param doc: the stored query
+        :type doc: dict
+        :return: number of new matches
+        :rtype: int
+        """
+        data_to_search = {
+            CollectionType(value): doc["data_to_search"][value]
+            for value in doc["data_to_search"]
+        }
+        resolution = doc["interpolation_resolution"] * MICROSECOND
+        now = datetime.utcnow()
+        ranges = []
+        for c_type in data_to_search:
+            ranges += self.connection.get_collection_by_type(c_type).ingested_since(
+                doc.get("ingested_until"), doc["start"]
+            )
+        duration = len(resample(data_to_search, resolution)) * resolution
+        seq_length = duration // resolution
+        step = int(seq_length / 3) if doc["step"] is None else doc["step"]
+        count = 0
+        for start, end in _search_ranges(
+            ranges, doc["start"], duration, resolution * step
+        ):
+            if end - start < duration:
+                continue
+            count += self.__search(doc, data_to_search, start, end, resolution, step)
+        self.queries.update_one(
+            {"_id": doc["_id"]}, {"$set": {"ingested_until": now - INGEST_LAG}}
+        )
+        return count
+
+    def __search(
+        self,
+        doc: dict,
+        data_to_search: dict,
+        start: datetime,
+        end: datetime,
+        resolution: timedelta,
+        step: int,
+    ) -> int:
+        """Searches one range of a standing query and stores the matches
+
+        :return: number of new matches
+        :rtype: int
+        """
+        if doc["threshold"] < math.inf:
+            # every window below the threshold is a match, none may be cut off
+            result_size = math.ceil((end - start) / (resolution * step)) + 1
+        else:
+            result_size = doc["result_size"]
+        results = self.searcher.search(
+            SearchQuery(
+                data_to_search,
+                start,
+                end,
+                resolution,
+                step,
+                result_size,
+                prefetch=True,
+                suppress_overlap=True,
+                window=doc["window"],
+            )
+        )
+        count = 0
+        for result in results:
+            if result.distance <= doc["threshold"]:
+                count += self.__store(doc["name"], result)
+        return count
+
+    def __store(self, name: str, result: SearchResult) -> int:
+        """Stores a match, unless a stored match overlapping it is at least as good
+
+        The ranges searched by two evaluations overlap and their windows can be
+        shifted against each other, so the same event can be found at a slightly
+        different start. The worse of two overlapping matches is dropped.
+
+        :param name: name of the query
+        :type name: str
+        :param result: the match
+        :type result: SearchResult
+        :return: 1 if the match is new, 0 if it replaced an overlapping match or
+        was dropped
+        :rtype: int
+        """
+        overlapping = list(
+            self.matches.find(
+                {
+                    "query": name,
+                    "start": {"$lt": result.end},
+                    "end": {"$gt": result.start},
+                },
+                {"distance": True},
+            )
+        )
+        if any(match["distance"] <= result.distance for match in overlapping):
+            return 0
+        if len(overlapping) > 0:
+            self.matches.delete_many(
+                {"_id": {"$in": [match["_id"] for match in overlapping]}}
+            )
+        self.matches.insert_one(
+            {
+                "query": name,
+                "start": result.start,
+                "end": result.end,
+                "distance": result.distance,
+                "session_id": result.session_id,
+                "found": datetime.now(),
+            }
+        )
+        return 1 if len(overlapping) == 0 else 0
+
+
+def _search_ranges(
+    ranges: list, start: datetime, duration: timedelta, step: timedelta
+) -> list:
+    """Merges the ranges of new measurements into the ranges to search
+
+    Every range is extended by one query length on both sides, so that the windows
+    overlapping the new measurements are searched, and begins on the step grid of
+    start.
+
+    :param ranges: list of (session id, first timestamp, last timestamp) tuples
+    :type ranges: list
+    :param start: start of the standing query
+    :type start: datetime
+    :param duration: length of the query
+    :type duration: timedelta
+    :param step: time between two windows
+    :type step: timedelta
+    :return: sorted list of non-overlapping (start, end) tuples
+    :rtype: list
+    """
+    extended = []
+    for _, first, last in ranges:
+        first = max(first - duration, start)
+        extended.append((start + (first - start) // step * step, last + duration))
+    merged = []
+    for first, last in sorted(extended):
+        if len(merged) > 0 and first <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def poll(
+    connection: MongoDBConnection,
+    interval: timedelta = timedelta(minutes=1),
+    stop: Event = None,
+) -> None:
+    """Worker which evaluates all standing queries periodically
+
+    :param connection: connection to the mongoDB
+    :type connection: MongoDBConnection
+    :param interval: time between two evaluations, defaults to 1 minute
+    :type interval: timedelta, optional
+    :param stop: the worker returns when the event is set, defaults to None (runs forever)
+    :type stop: Event, optional
+    """
+    stop = Event() if stop is None else stop
+    standing_queries = StandingQueries(connection)
+    while not stop.is_set():
+        count = standing_queries.evaluate()
+        if count > 0:
+            print(str(count) + " new matches of standing queries")
+        stop.wait(interval.total_seconds())
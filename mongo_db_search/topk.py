@@ -0,0 +1,209 @@
+import math
+from bisect import insort
+from datetime import datetime, timedelta
+from mongo_db_search.resample import MICROSECOND
+
+# datetimes of stored results are microseconds since EPOCH, BSON dates only have
+# milliseconds
+EPOCH = datetime(1970, 1, 1)
+
+
+class SearchResult:
+    """One match of a search, ordered by distance and start time"""
+
+    def __init__(
+        self,
+        distance: float,
+        start: datetime,
+        length: timedelta,
+        session_id: str = None,
+    ):
+        """Initializes a search result
+
+        :param distance: distance of the window to the query
+        :type distance: float
+        :param start: time at which the compared window begins
+        :type start: datetime
+        :param length: duration of the compared window
+        :type length: timedelta
+        :param session_id: id of the recording session of the window, defaults to None
+        :type session_id: str, optional
+        """
+        self.distance = distance
+        self.start = start
+        self.length = length
+        self.session_id = session_id
+
+    @property
+    def end(self) -> datetime:
+        return self.start + self.length
+
+    def overlaps(self, other: "SearchResult") -> bool:
+        """Checks if the windows of two results overlap
+
+        :param other: the other result
+        :type other: SearchResult
+        :return: true if the windows overlap
+        :rtype: bool
+        """
+        return self.start < other.end and other.start < self.end
+
+    def __lt__(self, other: "SearchResult") -> bool:
+        return (self.distance, self.start) < (other.distance, other.start)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SearchResult):
+            return NotImplemented
+        return (self.distance, self.start, self.length, self.session_id) == (
+            other.distance,
+            other.start,
+            other.length,
+            other.session_id,
+        )
+
+    def __repr__(self) -> str:
+        return "SearchResult(distance={}, start={}, length={}, session_id={})".format(
+            self.distance, self.start, self.length, self.session_id
+        )
+
+    def __str__(self) -> str:
+        return "distance: " + str(self.distance) + " at time: " + str(self.start)
+
+
+class TopK:
+    """Keeps the best results of a search with a memory usage of O(size)
+
+    Results are ordered by distance, equal distances by their start time.
+    """
+
+    def __init__(
+        self, size: int, keep_ties: bool = False, suppress_overlap: bool = False
+    ):
+        """Initializes an empty TopK
+
+        :param size: number of best results to keep
+        :type size: int
+        :param keep_ties: keep all results with the same distance as the size-th best,
+        even if there are more than size results, defaults to False
+        :type keep_ties: bool, optional
+        :param suppress_overlap: drop results whose window overlaps a better result,
+        defaults to False. The results are greedy: a result that was dropped for an
+        overlapping result does not return, if that result is replaced later
+        :type suppress_overlap: bool, optional
+        """
+        self.size = size
+        self.keep_ties = keep_ties
+        self.suppress_overlap = suppress_overlap
+        self.__results = []
+
+    def __len__(self) -> int:
+        return len(self.__results)
+
+    @property
+    def threshold(self) -> float:
+        """The distance a new result must not exceed to be kept, inf until size results are kept"""
+        if len(self.__results) < self.size:
+            return math.inf
+        return self.__results[self.size - 1].distance
+
+    def push(self, result: SearchResult) -> bool:
+        """Adds a result if it is among the best results
+
+        :param result: the new result
+        :type result: SearchResult
+        :return: true if the result was kept
+        :rtype: bool
+        """
+        if result.distance > self.threshold:
+            return False
+        if self.suppress_overlap:
+            overlapping = [r for r in self.__results if r.overlaps(result)]
+            if any(r < result for r in overlapping):
+                return False
+            for r in overlapping:
+                self.__results.remove(r)
+        insort(self.__results, result)
+        if not self.keep_ties:
+            del self.__results[self.size :]
+        elif len(self.__results) > self.size:
+            last = self.__results[self.size - 1].distance
+            while self.__results[-1].distance > last:
+                self.__results.pop()
+        return result in self.__results
+
+    def empty(self) -> "TopK":
+        """Returns a new empty TopK with the same settings
+
+        :return: empty TopK
+        :rtype: TopK
+        """
+        return TopK(self.size, self.keep_ties, self.suppress_overlap)
+
+    def merge(self, results: list) -> bool:
+        """Adds a list of results
+
+        :param results: list of SearchResult objects
+        :type results: list
+        :return: true if at least one result was kept
+        :rtype: bool
+        """
+        changed = False
+        for result in results:
+            changed = self.push(result) or changed
+        return changed
+
+    def results(self) -> list:
+        """Returns the kept results
+
+        :return: list of SearchResult objects sorted by distance
+        :rtype: list
+        """
+        return list(self.__results)
+
+
+def results_to_documents(results: list) -> list:
+    """Converts SearchResult objects to BSON and JSON documents, see results_from_documents
+
+    :param results: list of SearchResult objects
+    :type results: list
+    :return: list of documents
+    :rtype: list
+    """
+    return [
+        {
+            "distance": float(result.distance),
+            "start": to_micros(result.start),
+            "length": result.length // MICROSECOND,
+            "session_id": result.session_id,
+        }
+        for result in results
+    ]
+
+
+def results_from_documents(documents: list) -> list:
+    """Rebuilds the SearchResult objects of results_to_documents
+
+    :param documents: list of documents
+    :type documents: list
+    :return: list of SearchResult objects
+    :rtype: list
+    """
+    return [
+        SearchResult(
+            float(document["distance"]),
+            from_micros(document["start"]),
+            document["length"] * MICROSECOND,
+            document["session_id"],
+        )
+        for document in documents
+    ]
+
+
+def to_micros(timestamp: datetime) -> int:
+    """Microseconds of a datetime since EPOCH, see from_micros"""
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_micros(micros: int) -> datetime:
+    """Datetime of microseconds since EPOCH, see to_micros"""
+    return EPOCH + micros * MICROSECOND
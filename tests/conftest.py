@@ -0,0 +1,62 @@
+import sys
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(SCRIPT_DIR))
+
+import random
+from datetime import datetime, timedelta
+import pytest
+from mongo_db.mongodb_connection import CollectionType, MongoDBConnection
+
+FEATURES = {
+    CollectionType.IR_DATA: ["ir_front_left", "ir_front_right", "timestamp"],
+    CollectionType.MPU_DATA: ["gyro_x_angle", "gyro_z_angle", "timestamp"],
+}
+
+START = datetime(2021, 11, 27, 19, 30)
+
+
+@pytest.fixture
+def connection() -> MongoDBConnection:
+    """Connection to an empty in-memory database"""
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    for c_type in CollectionType:
+        client.zumi.create_collection(c_type.value)
+    return MongoDBConnection(None, client)
+
+
+def write_session(
+    connection: MongoDBConnection,
+    minutes: float = 3,
+    session_id: str = "s1",
+    start: datetime = START,
+    seed: int = 0,
+) -> None:
+    """Writes a session of random ir (0.5 s) and mpu (0.1 s) measurements with jitter"""
+    rnd = random.Random(seed)
+    ir = []
+    for number in range(int(minutes * 120)):
+        ir.append(
+            {
+                "timestamp": start
+                + timedelta(milliseconds=500 * number + rnd.randint(0, 50)),
+                "session_id": session_id,
+                "ir_front_left": rnd.randint(0, 255),
+                "ir_front_right": rnd.randint(0, 255),
+            }
+        )
+    mpu = []
+    for number in range(int(minutes * 600)):
+        mpu.append(
+            {
+                "timestamp": start
+                + timedelta(milliseconds=100 * number + rnd.randint(0, 10)),
+                "session_id": session_id,
+                "gyro_x_angle": rnd.random() * 360,
+                "gyro_z_angle": (number % 300) * 1.0 + rnd.random(),
+            }
+        )
+    connection.get_collection_by_type(CollectionType.IR_DATA).write_many(ir)
+    connection.get_collection_by_type(CollectionType.MPU_DATA).write_many(mpu)
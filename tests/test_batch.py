@@ -0,0 +1,41 @@
+from datetime import timedelta
+from mongo_db.mongodb_connection import CollectionType
+from mongo_db_search.search import SearchQuery, Searcher
+from tests.conftest import FEATURES, START
+from tests.test_search import END, RESOLUTION, _assert_same, _brute_force, _query
+
+
+def _features_query(connection, features, seconds, resolution=RESOLUTION, **arguments):
+    data = connection.get_numeric_sensor_data_by_time(
+        START + timedelta(seconds=seconds),
+        START + timedelta(seconds=seconds + 8),
+        features,
+    )
+    return SearchQuery(data, START, END, resolution, **arguments)
+
+
+def test_search_many_matches_brute_force(connection):
+    queries = [
+        _query(connection, step=1, chunk_size=17),
+        _features_query(
+            connection,
+            {CollectionType.IR_DATA: FEATURES[CollectionType.IR_DATA]},
+            50,
+            step=2,
+            window=3,
+        ),
+        _features_query(
+            connection,
+            {CollectionType.MPU_DATA: ["gyro_z_angle", "timestamp"]},
+            10,
+            result_size=3,
+            prune=False,
+        ),
+        _features_query(connection, FEATURES, 70, step=1, workers=None),
+        # searched in a second pass
+        _features_query(connection, FEATURES, 20, 2 * RESOLUTION, step=1),
+    ]
+    results = Searcher(connection).search_many(queries)
+    assert len(results) == len(queries)
+    for query, result in zip(queries, results):
+        _assert_same(result, _brute_force(connection, query))
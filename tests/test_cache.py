@@ -0,0 +1,122 @@
+import json
+import pickle
+import shutil
+import sqlite3
+from datetime import timedelta
+import numpy as np
+from mongo_db_search.cache import ResultCache, query_fingerprint
+from mongo_db_search.feature_store import FeatureStore
+from mongo_db_search.sax_index import SaxIndex
+from mongo_db_search.search import SearchQuery
+from mongo_db_search.topk import SearchResult
+from tests.conftest import FEATURES, START, write_session
+
+VERSION = {"ir_data": (10, START)}
+
+
+def _results(size):
+    return [
+        SearchResult(float(number), START + timedelta(seconds=number), timedelta(1))
+        for number in range(size)
+    ]
+
+
+def test_a_larger_entry_is_kept():
+    cache = ResultCache()
+    cache.put("key", VERSION, 10, _results(10))
+    cache.put("key", VERSION, 3, _results(3))
+    assert cache.get("key", VERSION, 10) == _results(10)
+    assert cache.get("key", VERSION, 3) == _results(3)
+    # a new data version replaces the entry
+    version = {"ir_data": (11, START)}
+    cache.put("key", version, 3, _results(3))
+    assert cache.get("key", version, 10) is None
+    assert cache.get("key", version, 3) == _results(3)
+
+
+def test_results_are_stored_as_json(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    results = _results(3) + [
+        SearchResult(np.float64(0.5), START, timedelta(microseconds=1), "s1")
+    ]
+    cache = ResultCache(path)
+    cache.put("key", VERSION, 4, results)
+    cache.put("old", VERSION, 4, results)
+    cache.close()
+    db = sqlite3.connect(path)
+    [(stored,)] = db.execute("SELECT results FROM results WHERE key = 'key'")
+    assert json.loads(stored)[3] == {
+        "distance": 0.5,
+        "start": 1638041400000000,
+        "length": 1,
+        "session_id": "s1",
+    }
+    # an entry of an older version pickled the results
+    db.execute(
+        "UPDATE results SET results = ? WHERE key = 'old'", (pickle.dumps(results),)
+    )
+    db.commit()
+    db.close()
+    cache = ResultCache(path)
+    assert cache.get("key", VERSION, 4) == results
+    assert cache.get("old", VERSION, 4) is None
+    assert len(cache) == 1
+
+
+def _query(connection, **arguments):
+    data = connection.get_numeric_sensor_data_by_time(
+        START, START + timedelta(seconds=10), FEATURES
+    )
+    return SearchQuery(
+        data, START, START + timedelta(minutes=1), timedelta(seconds=1), **arguments
+    )
+
+
+def test_suppress_overlap_keys_depend_on_the_result_size(connection):
+    write_session(connection, minutes=0.5)
+    seq = np.zeros((10, 4))
+    assert query_fingerprint(_query(connection, result_size=3), seq) == (
+        query_fingerprint(_query(connection, result_size=5), seq)
+    )
+    assert query_fingerprint(
+        _query(connection, result_size=3, suppress_overlap=True), seq
+    ) != query_fingerprint(
+        _query(connection, result_size=5, suppress_overlap=True), seq
+    )
+
+
+def test_store_generation_changes_with_updates_and_rebuilds(connection, tmp_path):
+    write_session(connection, minutes=0.5)
+    path = str(tmp_path / "store")
+    store = FeatureStore(path, FEATURES, [timedelta(seconds=1)])
+    generations = [store.generation]
+    store.update(connection)
+    generations.append(store.generation)
+    assert FeatureStore(path).generation == generations[-1]
+    shutil.rmtree(path)
+    store = FeatureStore(path, FEATURES, [timedelta(seconds=1)])
+    store.update(connection)
+    generations.append(store.generation)
+    assert len(set(generations)) == 3
+    query = _query(connection)
+    seq = np.zeros((10, 4))
+    assert query_fingerprint(query, seq, "store", generations[1]) != (
+        query_fingerprint(query, seq, "store", generations[2])
+    )
+
+
+def test_index_generation_changes_with_updates_and_rebuilds(connection, tmp_path):
+    write_session(connection, minutes=0.5)
+    path = str(tmp_path / "index.sqlite")
+    index = SaxIndex(path, FEATURES, timedelta(seconds=1), 10)
+    generations = [index.generation]
+    index.update(connection)
+    generations.append(index.generation)
+    index.close()
+    assert SaxIndex(path).generation == generations[-1]
+    rebuilt = SaxIndex(
+        str(tmp_path / "rebuilt.sqlite"), FEATURES, timedelta(seconds=1), 10
+    )
+    rebuilt.update(connection)
+    generations.append(rebuilt.generation)
+    assert len(set(generations)) == 3
@@ -0,0 +1,124 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+from benchmarks.synthetic import SyntheticDataset
+from mongo_db.mongodb_connection import CollectionType
+from mongo_db_search.distributed import (
+    RUNNING,
+    SHARDS,
+    Coordinator,
+    Worker,
+    query_from_document,
+    query_to_document,
+)
+from mongo_db_search.search import SearchQuery, Searcher
+
+FEATURES = {
+    CollectionType.IR_DATA: ["ir_front_left", "ir_front_right", "timestamp"],
+    CollectionType.MPU_DATA: ["gyro_z_angle", "acc_x_axis", "timestamp"],
+}
+
+POLL = timedelta(milliseconds=20)
+
+
+@pytest.fixture
+def dataset(connection):
+    dataset = SyntheticDataset(sessions=2, minutes=3, events=2)
+    dataset.load(connection)
+    return dataset
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {"prefetch": True, "step": 1},
+        {"prefetch": False},
+        {"prefetch": True},
+        {"mode": "mass"},
+        {"prefetch": True, "sessions": "all"},
+        {"mode": "spring", "sessions": "all"},
+    ],
+)
+def test_workers_find_the_results_of_one_searcher(connection, dataset, arguments):
+    query = SearchQuery(
+        dataset.query(connection, FEATURES),
+        dataset.start,
+        dataset.end,
+        timedelta(seconds=1),
+        result_size=5,
+        **arguments
+    )
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=Worker(connection, name="w" + str(number)).run, args=(stop, POLL)
+        )
+        for number in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        results = Coordinator(connection).search(query, 5, poll_interval=POLL)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+    expected = Searcher(connection).search(query)
+    assert [(r.start, r.session_id) for r in results] == [
+        (r.start, r.session_id) for r in expected
+    ]
+    assert [r.distance for r in results] == pytest.approx(
+        [r.distance for r in expected]
+    )
+    assert connection.database[SHARDS].count_documents({}) == 0
+
+
+def test_query_documents_keep_every_argument(connection, dataset):
+    query = SearchQuery(
+        dataset.query(connection, FEATURES),
+        dataset.start + timedelta(microseconds=1234),
+        dataset.end,
+        timedelta(milliseconds=500),
+        step=3,
+        window=4,
+        coarse_resolution=timedelta(seconds=2),
+        sessions=dataset.session_ids,
+    )
+    query.session_id = "benchmark-0-1"
+    query.search_range_size = 17
+    # the shards are stored as plain documents, no python objects
+    connection.database[SHARDS].insert_one({"query": query_to_document(query)})
+    document = connection.database[SHARDS].find_one()["query"]
+    copy = query_from_document(document)
+    assert vars(copy) == vars(query)
+
+
+def test_spring_queries_are_not_split_by_time(connection, dataset):
+    query = SearchQuery(
+        dataset.query(connection, FEATURES),
+        dataset.start,
+        dataset.end,
+        timedelta(seconds=1),
+        mode="spring",
+    )
+    with pytest.raises(Exception):
+        Coordinator(connection).submit(query)
+    assert connection.database[SHARDS].count_documents({}) == 0
+
+
+def test_exhausted_shards_are_not_claimed_again(connection, dataset):
+    query = SearchQuery(
+        dataset.query(connection, FEATURES),
+        dataset.start,
+        dataset.end,
+        timedelta(seconds=1),
+    )
+    Coordinator(connection, max_attempts=1).submit(query, 1)
+    # the worker of the only attempt died
+    connection.database[SHARDS].update_one(
+        {},
+        {"$set": {"status": RUNNING, "attempts": 1, "lease": datetime.utcnow() - POLL}},
+    )
+    assert Worker(connection).claim() is None
+    connection.database[SHARDS].update_one({}, {"$set": {"max_attempts": 2}})
+    assert Worker(connection).claim()["attempts"] == 2
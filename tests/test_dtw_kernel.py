@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from dtaidistance import dtw_ndim
+from mongo_db_search.dtw_kernel import dtw_distance, dtw_numpy
+
+SHAPES = [(20, 20), (15, 25), (25, 15), (1, 8), (8, 1), (1, 1)]
+WINDOWS = [None, 1, 3, 10]
+
+
+def _pair(len1, len2, features=3, seed=0):
+    rnd = np.random.default_rng(seed)
+    return (
+        rnd.normal(size=(len1, features)).cumsum(axis=0),
+        rnd.normal(size=(len2, features)).cumsum(axis=0),
+    )
+
+
+@pytest.mark.parametrize("function", [dtw_distance, dtw_numpy])
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("shape", SHAPES)
+def test_same_distance_as_dtaidistance(function, window, shape):
+    seq1, seq2 = _pair(*shape)
+    expected = dtw_ndim.distance(seq1, seq2, window=window, use_c=False)
+    if function is dtw_numpy:
+        distance = dtw_numpy(seq1, seq2, window)
+    else:
+        distance = dtw_distance(seq1, seq2, window=window)
+    assert distance == pytest.approx(expected, rel=1e-9)
+
+
+@pytest.mark.parametrize("function", [dtw_distance, dtw_numpy])
+def test_early_abandoning(function):
+    seq1, seq2 = _pair(30, 30, seed=1)
+    expected = dtw_ndim.distance(seq1, seq2, window=5, use_c=False)
+
+    def distance(max_dist):
+        if function is dtw_numpy:
+            return dtw_numpy(seq1, seq2, 5, max_dist)
+        return dtw_distance(seq1, seq2, max_dist, 5)
+
+    assert distance(expected * 1.01) == pytest.approx(expected, rel=1e-9)
+    assert distance(expected * 0.99) == np.inf
+    assert distance(expected / 10) == np.inf
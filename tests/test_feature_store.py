@@ -0,0 +1,72 @@
+import math
+from datetime import timedelta
+import numpy as np
+import pytest
+from dtaidistance import dtw_ndim
+from mongo_db_search.feature_store import FeatureStore
+from mongo_db_search.prefetch import grid_size
+from mongo_db_search.resample import resample
+from mongo_db_search.search import SearchQuery, Searcher
+from mongo_db_search.topk import SearchResult, TopK
+from tests.conftest import FEATURES, START, write_session
+from tests.test_search import RESOLUTION, _has_data
+
+SESSIONS = {"s1": START, "s2": START + timedelta(seconds=90)}
+
+
+def _store_brute_force(connection, query):
+    """Compares every window on the float32 grid of its session with dtaidistance"""
+    seq = resample(query.data_to_search, RESOLUTION)
+    topk = TopK(query.result_size)
+    for session_id in SESSIONS:
+        start, end, _ = connection.get_session_extent(session_id, list(FEATURES))
+        data = connection.get_numeric_sensor_data_by_time(
+            start, end, FEATURES, session_id
+        )
+        grid = resample(data, RESOLUTION, start, end).astype(np.float32)
+        first = max(math.ceil((query.start - start) / RESOLUTION), 0)
+        last = min(
+            math.ceil((query.end - start) / RESOLUTION),
+            grid_size(start, end, RESOLUTION) - 1,
+        )
+        for row in range(first, last - len(seq) + 2):
+            begin = start + row * RESOLUTION
+            if row % query.step != 0 or not _has_data(
+                data, begin, begin + (len(seq) - 1) * RESOLUTION
+            ):
+                continue
+            distance = dtw_ndim.distance(
+                seq, grid[row : row + len(seq)].astype(np.float64), use_c=False
+            )
+            topk.push(SearchResult(distance, begin, len(seq) * RESOLUTION, session_id))
+    return topk.results()
+
+
+@pytest.mark.parametrize("step", [1, 2])
+def test_store_search_matches_brute_force(connection, tmp_path, step):
+    for number, (session_id, start) in enumerate(SESSIONS.items()):
+        write_session(connection, 1, session_id, start, number)
+    store = FeatureStore(str(tmp_path), FEATURES, [RESOLUTION])
+    assert store.update(connection) == 2
+    assert store.update(connection) == 0
+    data = connection.get_numeric_sensor_data_by_time(
+        START + timedelta(seconds=30), START + timedelta(seconds=40), FEATURES
+    )
+    query = SearchQuery(
+        data,
+        START + timedelta(seconds=5),
+        START + timedelta(minutes=3),
+        RESOLUTION,
+        step,
+        6,
+        chunk_size=17,
+        sessions="all",
+    )
+    results = Searcher(connection, store=store).search(query)
+    expected = _store_brute_force(connection, query)
+    assert [(r.start, r.session_id) for r in results] == [
+        (r.start, r.session_id) for r in expected
+    ]
+    assert [r.distance for r in results] == pytest.approx(
+        [r.distance for r in expected], rel=1e-9
+    )
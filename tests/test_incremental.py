@@ -0,0 +1,66 @@
+from datetime import timedelta
+from threading import Event
+from benchmarks.synthetic import SyntheticDataset
+from mongo_db.mongodb_connection import CollectionType
+from mongo_db_search.profiling import ProfiledConnection, SearchProfile
+from mongo_db_search.search import SearchQuery, Searcher
+
+FEATURES = {
+    CollectionType.IR_DATA: ["ir_front_left", "ir_front_right", "timestamp"],
+    CollectionType.MPU_DATA: ["gyro_z_angle", "acc_x_axis", "timestamp"],
+}
+
+
+def _query(connection, **arguments):
+    dataset = SyntheticDataset(sessions=1, minutes=6, events=2)
+    dataset.load(connection)
+    return SearchQuery(
+        dataset.query(connection, FEATURES),
+        dataset.start,
+        dataset.end,
+        timedelta(seconds=1),
+        step=1,
+        result_size=3,
+        prefetch=True,
+        chunk_size=30,
+        **arguments
+    )
+
+
+def test_complete_search_matches_search(connection):
+    query = _query(connection, prefilter=10)
+    snapshots = list(Searcher(connection).iter_search(query))
+    assert snapshots[-1].complete
+    assert snapshots[-1].results == Searcher(connection).search(query)
+
+
+def test_cancel_stops_the_prefilter_scan(connection):
+    query = _query(connection, prefilter=10)
+    profile = SearchProfile()
+    searcher = Searcher(ProfiledConnection(connection, profile))
+    cancel = Event()
+    cancel.set()
+    snapshots = list(searcher.iter_search(query, cancel=cancel))
+    assert len(snapshots) == 1
+    assert not snapshots[0].complete
+    assert snapshots[0].position is None
+    # one request for the first chunk, the scan of the 12 chunks stops before it
+    assert profile.fetches <= 1
+
+
+def test_budget_stops_the_prefilter_scan(connection):
+    query = _query(connection, prefilter=10)
+    snapshots = list(Searcher(connection).iter_search(query, budget=timedelta(0)))
+    assert len(snapshots) == 1
+    assert not snapshots[0].complete
+
+
+def test_resume_after_a_stopped_prefilter_scan(connection):
+    query = _query(connection, prefilter=10)
+    searcher = Searcher(connection)
+    cancel = Event()
+    cancel.set()
+    stopped = list(searcher.iter_search(query, cancel=cancel))[-1]
+    resumed = list(searcher.iter_search(query, resume=stopped))[-1]
+    assert resumed.complete
+    assert resumed.results == searcher.search(query)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from dtaidistance import dtw_ndim
+from mongo_db_search.mass import distance_profile
+from mongo_db_search.resample import resample
+from mongo_db_search.search import Searcher
+from mongo_db_search.topk import SearchResult
+from tests.test_search import _assert_same, _brute_force, _has_data, _query
+
+
+def _znormalized(seq):
+    std = seq.std(axis=0)
+    return np.where(std > 0, (seq - seq.mean(axis=0)) / np.where(std > 0, std, 1), 0.0)
+
+
+def _znormalized_distance(seq, seq2):
+    return float(np.sqrt(np.sum((_znormalized(seq) - _znormalized(seq2)) ** 2)))
+
+
+def test_distance_profile_matches_brute_force():
+    rnd = np.random.default_rng(0)
+    query = rnd.normal(size=(12, 3)).cumsum(axis=0)
+    data = rnd.normal(size=(300, 3)).cumsum(axis=0) * 100 + 1000
+    # constant windows of one feature and a constant query feature
+    data[100:130, 1] = 5.0
+    expected = [
+        _znormalized_distance(query, data[i : i + len(query)])
+        for i in range(len(data) - len(query) + 1)
+    ]
+    assert distance_profile(query, data) == pytest.approx(expected, abs=1e-6)
+    query[:, 2] = 1.0
+    expected = [
+        _znormalized_distance(query, data[i : i + len(query)])
+        for i in range(len(data) - len(query) + 1)
+    ]
+    assert distance_profile(query, data) == pytest.approx(expected, abs=1e-6)
+
+
+def _windows(connection, query):
+    """All windows of the prefetched grid with measurements of every collection"""
+    seq = resample(query.data_to_search, query.interpolation_resolution)
+    step = 1 if query.step is None else query.step
+    data = connection.get_numeric_sensor_data_by_time(
+        query.start, query.end, query.selected_features
+    )
+    grid = resample(data, query.interpolation_resolution, query.start, query.end)
+    windows = []
+    for index in range(0, len(grid) - len(seq) + 1, step):
+        begin = query.start + index * query.interpolation_resolution
+        end = begin + (len(seq) - 1) * query.interpolation_resolution
+        if _has_data(data, begin, end):
+            windows.append((begin, grid[index : index + len(seq)]))
+    return seq, windows
+
+
+@pytest.mark.parametrize("arguments", [{}, {"step": 2, "chunk_size": 13}])
+def test_mass_search_matches_brute_force(connection, arguments):
+    query = _query(connection, mode="mass", **arguments)
+    seq, windows = _windows(connection, query)
+    duration = len(seq) * query.interpolation_resolution
+    expected = sorted(
+        SearchResult(_znormalized_distance(seq, seq2), begin, duration)
+        for begin, seq2 in windows
+    )[: query.result_size]
+    results = Searcher(connection).search(query)
+    assert [r.start for r in results] == [r.start for r in expected]
+    assert [r.distance for r in results] == pytest.approx(
+        [r.distance for r in expected], abs=1e-6
+    )
+
+
+def test_prefilter_compares_the_best_candidates_with_dtw(connection):
+    query = _query(connection, prefetch=True, step=1, prefilter=10, chunk_size=13)
+    seq, windows = _windows(connection, query)
+    duration = len(seq) * query.interpolation_resolution
+    candidates = sorted(
+        windows, key=lambda window: _znormalized_distance(seq, window[1])
+    )[: query.prefilter]
+    expected = sorted(
+        SearchResult(dtw_ndim.distance(seq, seq2, use_c=False), begin, duration)
+        for begin, seq2 in candidates
+    )[: query.result_size]
+    _assert_same(Searcher(connection).search(query), expected)
+    # with all windows as candidates the prefilter is exact
+    query.prefilter = len(windows)
+    _assert_same(Searcher(connection).search(query), _brute_force(connection, query))
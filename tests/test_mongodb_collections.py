@@ -0,0 +1,206 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+import bson
+import numpy as np
+import pytest
+from pymongo import MongoClient
+from mongo_db import mongodb_collections
+from mongo_db.mongodb_collections import MongoDBTimeSeriesData
+from mongo_db.mongodb_connection import CollectionType
+from tests.conftest import FEATURES, START, write_session
+
+END = START + timedelta(minutes=1)
+
+
+def test_stream_and_columns_match_list(connection):
+    write_session(connection)
+    documents = connection.get_numeric_sensor_data_by_time(START, END, FEATURES)
+    streams = connection.get_numeric_sensor_data_by_time(
+        START, END, FEATURES, mode="stream", batch_size=7
+    )
+    columns = connection.get_numeric_sensor_data_by_time(
+        START, END, FEATURES, mode="columns", batch_size=7
+    )
+    for c_type in FEATURES:
+        assert list(streams[c_type]) == documents[c_type]
+        assert sorted(columns[c_type]) == sorted(FEATURES[c_type])
+        assert columns[c_type]["timestamp"].dtype == np.int64
+        expected = np.array(
+            [d["timestamp"] for d in documents[c_type]], dtype="datetime64[ns]"
+        ).astype(np.int64)
+        assert np.array_equal(columns[c_type]["timestamp"], expected)
+        for key in FEATURES[c_type]:
+            if key != "timestamp":
+                assert np.allclose(
+                    columns[c_type][key], [d[key] for d in documents[c_type]]
+                )
+
+
+def test_raw_batches_decode_to_the_same_timestamps(connection):
+    write_session(connection, minutes=0.1)
+    documents = connection.get_numeric_sensor_data_by_time(START, END, FEATURES)[
+        CollectionType.IR_DATA
+    ]
+    raw = b"".join(bson.encode(d) for d in documents)
+    decoded = bson.decode_all(raw, mongodb_collections._RAW_OPTIONS)
+    assert np.array_equal(
+        mongodb_collections._column([d["timestamp"] for d in decoded]),
+        mongodb_collections._column([d["timestamp"] for d in documents]),
+    )
+
+
+def test_columns_of_an_empty_range(connection):
+    assert connection.get_numeric_sensor_data_by_time(
+        START, END, FEATURES, mode="columns"
+    ) == {c_type: {} for c_type in FEATURES}
+
+
+def test_ingested_since_reads_the_ingest_log(connection):
+    collection = connection.get_collection_by_type(CollectionType.IR_DATA)
+    write_session(connection, minutes=1, session_id="old")
+    since = datetime.utcnow()
+    write_session(connection, minutes=1, session_id="s2", start=END)
+    write_session(connection, minutes=1, session_id="s2", start=START, seed=1)
+    # writes bypassing the wrapper are not logged
+    collection.collection.insert_one(
+        {"timestamp": END, "session_id": "raw", "ir_front_left": 1}
+    )
+    timestamps = [
+        d["timestamp"] for d in collection.collection.find({"session_id": "s2"})
+    ]
+    assert collection.ingested_since(since) == [
+        ("s2", min(timestamps), max(timestamps))
+    ]
+    start = START + timedelta(seconds=30)
+    [(session_id, first, last)] = collection.ingested_since(since, start)
+    assert (session_id, first) == ("s2", start)
+    assert collection.ingested_since(datetime.utcnow()) == []
+    # without a time all stored measurements are scanned
+    assert sorted(s for s, _, _ in collection.ingested_since()) == ["old", "raw", "s2"]
+
+
+def _reference(documents, key, start, resolution, buckets, aggregation):
+    """Aggregates and fills the grid point by point"""
+    groups = {}
+    for d in documents:
+        if d.get(key) is not None:
+            groups.setdefault((d["timestamp"] - start) // resolution, []).append(d[key])
+    function = {
+        "mean": lambda v: sum(v) / len(v),
+        "min": min,
+        "max": max,
+        "last": lambda v: v[-1],
+    }[aggregation]
+    values = [function(groups[k]) if k in groups else None for k in range(buckets)]
+    filled = sorted(groups)
+    for k in range(buckets):
+        if values[k] is not None or len(filled) == 0:
+            continue
+        before = [f for f in filled if f < k]
+        after = [f for f in filled if f > k]
+        if aggregation == "last":
+            values[k] = values[before[-1]] if before else None
+        elif before and after:
+            left, right = before[-1], after[0]
+            values[k] = values[left] + (values[right] - values[left]) * (k - left) / (
+                right - left
+            )
+    return values
+
+
+@pytest.mark.parametrize("aggregation", list(mongodb_collections.AGGREGATIONS))
+def test_client_resampling_matches_reference(connection, aggregation):
+    write_session(connection, minutes=1)
+    collection = connection.get_collection_by_type(CollectionType.MPU_DATA)
+    gap = {"$gte": START + timedelta(seconds=20), "$lt": START + timedelta(seconds=25)}
+    collection.collection.delete_many({"timestamp": gap})
+    start = START - timedelta(seconds=2, microseconds=1500)
+    end = START + timedelta(seconds=70)
+    resolution = timedelta(milliseconds=1000)
+    result = collection.resampled_by_time(
+        start, end, ["gyro_z_angle", "timestamp"], resolution, aggregation
+    )
+    grid_start = start.replace(microsecond=start.microsecond // 1000 * 1000)
+    documents = collection.sensor_data_by_time(
+        start, end, ["gyro_z_angle", "timestamp"]
+    )
+    documents = [d for d in documents if d["timestamp"] < end]
+    expected = _reference(
+        documents, "gyro_z_angle", grid_start, resolution, len(result), aggregation
+    )
+    assert len(result) == 73
+    assert [r["timestamp"] for r in result] == [
+        grid_start + k * resolution for k in range(73)
+    ]
+    assert [r["gyro_z_angle"] for r in result] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("aggregation", list(mongodb_collections.AGGREGATIONS))
+def test_client_resampling_of_a_missing_feature(connection, aggregation):
+    write_session(connection, minutes=0.2)
+    result = connection.get_resampled_sensor_data_by_time(
+        START, START + timedelta(seconds=5), FEATURES, timedelta(seconds=1), aggregation
+    )
+    collection = connection.get_collection_by_type(CollectionType.MPU_DATA)
+    missing = collection.resampled_by_time(
+        START,
+        START + timedelta(seconds=5),
+        ["missing"],
+        timedelta(seconds=1),
+        aggregation,
+    )
+    assert len(result[CollectionType.IR_DATA]) == 5
+    assert [d["missing"] for d in missing] == [None] * 5
+
+
+@pytest.mark.parametrize("aggregation", list(mongodb_collections.AGGREGATIONS))
+def test_server_resampling_matches_client(aggregation):
+    """Needs a MongoDB >= 5.3, e.g. MONGODB_URI=mongodb://localhost:27017"""
+    uri = os.environ.get("MONGODB_URI")
+    if uri is None:
+        pytest.skip("MONGODB_URI is not set")
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    name = "zumi_test_" + uuid.uuid4().hex
+    try:
+        data = MongoDBTimeSeriesData(client[name]["mpu_data"])
+        if not data.supports_server_resampling():
+            pytest.skip("the server does not support $densify and $fill")
+        documents = [
+            {
+                "timestamp": START + timedelta(milliseconds=100 * number + 3),
+                "session_id": "s1",
+                "gyro_z_angle": float(number % 50),
+            }
+            for number in range(600)
+            if not 200 <= number < 260
+        ]
+        data.write_many(documents)
+        for start, end, resolution in [
+            (START, START + timedelta(seconds=60), timedelta(seconds=1)),
+            (
+                START - timedelta(seconds=3, microseconds=1500),
+                START + timedelta(seconds=65),
+                timedelta(milliseconds=700),
+            ),
+            (
+                START + timedelta(hours=1),
+                START + timedelta(hours=2),
+                timedelta(minutes=1),
+            ),
+        ]:
+            features = ["gyro_z_angle", "missing", "timestamp"]
+            server = data.resampled_by_time(
+                start, end, features, resolution, aggregation, server=True
+            )
+            client = data.resampled_by_time(
+                start, end, features, resolution, aggregation, server=False
+            )
+            assert [d["timestamp"] for d in server] == [d["timestamp"] for d in client]
+            assert [d["missing"] for d in server] == [d["missing"] for d in client]
+            assert [d["gyro_z_angle"] for d in server] == pytest.approx(
+                [d["gyro_z_angle"] for d in client]
+            )
+    finally:
+        client.drop_database(name)
+        client.close()
@@ -0,0 +1,37 @@
+from datetime import timedelta
+import pytest
+from mongo_db_search.multiresolution import candidate_regions
+from mongo_db_search.search import Searcher
+from tests.conftest import START
+from tests.test_search import _assert_same, _brute_force, _query
+
+SECOND = timedelta(seconds=1)
+
+
+def test_candidate_regions():
+    last = START + 60 * SECOND
+    starts = [START + seconds * SECOND for seconds in [30, 1, 33, 59, 10]]
+    assert candidate_regions(starts, 3 * SECOND, START, last, SECOND) == [
+        (START, START + 4 * SECOND),
+        (START + 7 * SECOND, START + 13 * SECOND),
+        (START + 27 * SECOND, START + 36 * SECOND),
+        (START + 56 * SECOND, last),
+    ]
+    # neighborhoods one grid point apart are merged
+    starts = [START + 10 * SECOND, START + 17 * SECOND]
+    assert candidate_regions(starts, 3 * SECOND, START, last, SECOND) == [
+        (START + 7 * SECOND, START + 20 * SECOND)
+    ]
+
+
+@pytest.mark.parametrize("arguments", [{}, {"window": 3}])
+def test_enough_candidates_match_brute_force(connection, arguments):
+    # the neighborhoods of all coarse windows cover the whole search range
+    query = _query(
+        connection,
+        step=1,
+        coarse_resolution=3 * SECOND,
+        coarse_candidates=100,
+        **arguments
+    )
+    _assert_same(Searcher(connection).search(query), _brute_force(connection, query))
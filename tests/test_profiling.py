@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+import numpy as np
+from mongo_db_search import profiling
+from mongo_db_search.profiling import ProfiledConnection, SearchProfile
+from tests.conftest import FEATURES, START, write_session
+
+END = START + timedelta(seconds=30)
+
+
+def test_all_modes_are_passed_through(connection):
+    write_session(connection, minutes=1)
+    profile = SearchProfile()
+    profiled = ProfiledConnection(connection, profile)
+    documents = connection.get_numeric_sensor_data_by_time(START, END, FEATURES)
+    count = sum(len(docs) for docs in documents.values())
+    assert profiled.get_numeric_sensor_data_by_time(START, END, FEATURES) == documents
+    streams = profiled.get_numeric_sensor_data_by_time(
+        START, END, FEATURES, mode="stream", batch_size=10
+    )
+    assert {c_type: list(docs) for c_type, docs in streams.items()} == documents
+    columns = profiled.get_numeric_sensor_data_by_time(
+        START, END, FEATURES, None, "columns", 10
+    )
+    for c_type in FEATURES:
+        feature = FEATURES[c_type][0]
+        assert np.array_equal(
+            columns[c_type][feature], [d[feature] for d in documents[c_type]]
+        )
+    assert profile.fetches == 3
+    assert profile.documents == 3 * count
+
+
+def test_measuring_is_not_resample_time(connection, monkeypatch):
+    write_session(connection, minutes=0.5)
+    measure = profiling._measure
+
+    def slow_measure(result, mode="list"):
+        time.sleep(0.2)
+        return measure(result, mode)
+
+    monkeypatch.setattr(profiling, "_measure", slow_measure)
+    profile = SearchProfile()
+    profiled = ProfiledConnection(connection, profile)
+
+    def windows():
+        for _ in range(2):
+            yield START, profiled.get_numeric_sensor_data_by_time(START, END, FEATURES)
+
+    assert len(list(profile.windows_of(windows()))) == 2
+    assert profile.measure_seconds >= 0.4
+    assert profile.resample_seconds < 0.1
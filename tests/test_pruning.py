@@ -0,0 +1,78 @@
+import math
+import numpy as np
+import pytest
+from dtaidistance import dtw_ndim
+from mongo_db_search.pruning import PruningCascade, envelope, lb_keogh, lb_kim
+from mongo_db_search.search import SearchQuery, Searcher
+from tests.test_search import _assert_same, _brute_force, _query
+
+
+def _pairs(count=50, len1=20, len2=20, seed=0):
+    rnd = np.random.default_rng(seed)
+    for _ in range(count):
+        yield (
+            rnd.normal(size=(len1, 3)).cumsum(axis=0),
+            rnd.normal(size=(len2, 3)).cumsum(axis=0),
+        )
+
+
+def _distance(seq, seq2, max_dist=None, window=None):
+    return dtw_ndim.distance(seq, seq2, window=window, max_dist=max_dist, use_c=False)
+
+
+@pytest.mark.parametrize("window", [None, 1, 3, 10])
+def test_lower_bounds(window):
+    for seq, seq2 in _pairs():
+        distance = _distance(seq, seq2, window=window)
+        lower, upper = envelope(seq, window)
+        assert lb_kim(seq, seq2) <= distance * (1 + 1e-9)
+        assert lb_keogh(lower, upper, seq2) <= distance * (1 + 1e-9)
+
+
+def test_unconstrained_bounds_for_other_lengths():
+    for seq, seq2 in _pairs(len2=27):
+        distance = _distance(seq, seq2)
+        lower, upper = envelope(seq)
+        assert lb_kim(seq, seq2) <= distance * (1 + 1e-9)
+        assert lb_keogh(lower, upper, seq2) <= distance * (1 + 1e-9)
+
+
+def test_cascade_only_rejects_larger_distances():
+    pairs = list(_pairs(seed=1))
+    distances = sorted(_distance(seq, seq2, window=3) for seq, seq2 in pairs)
+    threshold = distances[len(distances) // 2]
+    for seq, seq2 in pairs:
+        cascade = PruningCascade(seq, lambda a, b, m: _distance(a, b, m, 3), window=3)
+        distance = _distance(seq, seq2, window=3)
+        result = cascade.distance(seq2, threshold)
+        if distance <= threshold:
+            assert result == pytest.approx(distance, rel=1e-9)
+        else:
+            assert result is None
+    # the threshold itself is kept
+    seq, seq2 = pairs[0]
+    distance = _distance(seq, seq2, window=3)
+    cascade = PruningCascade(seq, lambda a, b, m: _distance(a, b, m, 3), window=3)
+    assert cascade.distance(seq2, distance) == pytest.approx(distance, rel=1e-9)
+    assert cascade.distance(seq2, math.inf) == pytest.approx(distance, rel=1e-9)
+
+
+@pytest.mark.parametrize("window", [None, 3])
+def test_pruned_search_matches_brute_force(connection, window):
+    query = _query(connection, prefetch=True, step=1, window=window)
+    profile = Searcher(connection).explain(query)
+    _assert_same(profile.results, _brute_force(connection, query))
+    assert profile.pruning.windows > 0
+    assert profile.pruning.pruned > 0
+    unpruned = SearchQuery(
+        query.data_to_search,
+        query.start,
+        query.end,
+        query.interpolation_resolution,
+        1,
+        query.result_size,
+        prefetch=True,
+        prune=False,
+        window=window,
+    )
+    assert Searcher(connection).search(unpruned) == profile.results
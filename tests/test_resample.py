@@ -0,0 +1,52 @@
+import math
+from datetime import timedelta
+import numpy as np
+import pytest
+from mongo_db.mongodb_connection import CollectionType
+from mongo_db_search.resample import resample
+from tests.conftest import FEATURES, START, write_session
+
+RESOLUTION = timedelta(milliseconds=300)
+
+
+def _reference(data, resolution, start, end):
+    """Resamples every feature on its own with numpy.interp"""
+    size = math.ceil((end - start) / resolution) + 1
+    grid = np.arange(size) * resolution.total_seconds()
+    columns = []
+    for measurements in data.values():
+        times = [(m["timestamp"] - start).total_seconds() for m in measurements]
+        for feature in sorted(k for k in measurements[0] if k != "timestamp"):
+            values = [m[feature] for m in measurements]
+            columns.append(np.interp(grid, times, values))
+    return np.stack(columns, axis=1)
+
+
+def test_resample_matches_numpy_interp(connection):
+    write_session(connection, minutes=1)
+    data = connection.get_numeric_sensor_data_by_time(
+        START + timedelta(seconds=3), START + timedelta(seconds=40), FEATURES
+    )
+    first = min(measurements[0]["timestamp"] for measurements in data.values())
+    last = max(measurements[-1]["timestamp"] for measurements in data.values())
+    assert resample(data, RESOLUTION) == pytest.approx(
+        _reference(data, RESOLUTION, first, last)
+    )
+    # a grid reaching beyond the data holds the first and last values
+    start, end = START, START + timedelta(seconds=50)
+    result = resample(data, RESOLUTION, start, end)
+    assert result.shape == (math.ceil((end - start) / RESOLUTION) + 1, 4)
+    assert result == pytest.approx(_reference(data, RESOLUTION, start, end))
+
+
+def test_feature_order():
+    data = {
+        CollectionType.MPU_DATA: [
+            {"timestamp": START, "b": 1.0, "a": 2.0},
+            {"timestamp": START + timedelta(seconds=1), "b": 3.0, "a": 4.0},
+        ],
+        CollectionType.IR_DATA: [{"timestamp": START, "c": 5.0}],
+    }
+    result = resample(data, timedelta(milliseconds=500))
+    # by collection (dict order), by name inside a collection
+    assert result.tolist() == [[2.0, 1.0, 5.0], [3.0, 2.0, 5.0], [4.0, 3.0, 5.0]]
@@ -0,0 +1,162 @@
+import io
+import os
+from datetime import datetime, timedelta
+import pytest
+from bson.json_util import dumps, loads
+from mongo_db import save_in_mongodb
+from mongo_db.mongodb_connection import CollectionType
+from mongo_db.save_in_mongodb import (
+    DONE,
+    FAILED,
+    PARTIAL,
+    IngestManifest,
+    file_hash,
+    iter_json_array,
+    transfer_json_files,
+)
+
+START = datetime(2021, 11, 27, 19, 0)
+
+VALID = [
+    "[]",
+    " [ ] \n",
+    '[{"a": 1}]',
+    '[1, 2,3 ,{"b": [1, 2]}, "x,]"]',
+    dumps([{"t": datetime(2021, 1, 1), "s": "a" * 5000}] * 7),
+    "[123456789]\r\n",
+]
+
+INVALID = ["", "{", "[1", "[1,]", "[1 2]", '[{"a":}]', "x", "[1,2]x", "[1] [2]", "[]]"]
+
+
+@pytest.mark.parametrize("text", VALID)
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 1000])
+def test_valid_arrays(text, read_size):
+    assert list(iter_json_array(io.StringIO(text), read_size)) == loads(text)
+
+
+@pytest.mark.parametrize("text", INVALID)
+@pytest.mark.parametrize("read_size", [1, 2, 1000])
+def test_invalid_arrays(text, read_size):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), read_size))
+
+
+def _documents(count, first=0):
+    return [
+        {"timestamp": START + timedelta(seconds=number), "session_id": "s"}
+        for number in range(first, first + count)
+    ]
+
+
+def test_a_file_with_trailing_data_fails(connection, tmp_path):
+    documents = _documents(10)
+    (tmp_path / "ir_data_1.json").write_text(dumps(documents))
+    (tmp_path / "ir_data_2.json").write_text(dumps(documents) + dumps(documents))
+    stats = transfer_json_files(connection, str(tmp_path), [CollectionType.IR_DATA])
+    assert stats.files == 1
+
+
+def _ingest(connection, folder, manifest):
+    return transfer_json_files(
+        connection,
+        str(folder),
+        [CollectionType.IR_DATA],
+        batch_size=4,
+        manifest=manifest,
+    )
+
+
+def _stored(connection):
+    collection = connection.get_collection_by_type(CollectionType.IR_DATA).collection
+    return collection.count_documents({})
+
+
+def test_manifest_skips_unchanged_files(connection, tmp_path, monkeypatch):
+    for number in range(3):
+        (tmp_path / "ir_data_{}.json".format(number)).write_text(
+            dumps(_documents(10, number * 10))
+        )
+    manifest = IngestManifest(connection)
+    stats = _ingest(connection, tmp_path, manifest)
+    assert (stats.files, stats.inserted, stats.unchanged) == (3, 30, 0)
+    entries = manifest.entries()
+    assert len(entries) == 3
+    for path, entry in entries.items():
+        assert entry["status"] == DONE
+        assert entry["documents"] == 10
+        assert entry["sha256"] == file_hash(path)
+    # unchanged files are neither hashed nor opened
+    monkeypatch.setattr(save_in_mongodb, "file_hash", None)
+    stats = _ingest(connection, tmp_path, manifest)
+    assert (stats.files, stats.inserted, stats.skipped, stats.unchanged) == (0, 0, 0, 3)
+    monkeypatch.undo()
+    # a new modification time with the same content only updates the record
+    path = str(tmp_path / "ir_data_0.json")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    stats = _ingest(connection, tmp_path, manifest)
+    assert (stats.files, stats.inserted, stats.unchanged) == (0, 0, 3)
+    assert (
+        manifest.entries()[os.path.abspath(path)]["mtime"] == os.stat(path).st_mtime_ns
+    )
+    # a changed file is transferred again, its stored documents are skipped
+    (tmp_path / "ir_data_0.json").write_text(dumps(_documents(10) + _documents(5, 30)))
+    stats = _ingest(connection, tmp_path, manifest)
+    assert (stats.files, stats.inserted, stats.skipped, stats.unchanged) == (
+        1,
+        5,
+        10,
+        2,
+    )
+    assert _stored(connection) == 35
+
+
+def test_manifest_resumes_partial_files(connection, tmp_path):
+    path = tmp_path / "ir_data_0.json"
+    path.write_text(dumps(_documents(10)))
+    manifest = IngestManifest(connection)
+    # an ingest that stopped after the first two batches
+    connection.get_collection_by_type(CollectionType.IR_DATA).write_many(_documents(8))
+    manifest.record(
+        os.path.abspath(str(path)), os.stat(path), file_hash(str(path)), 4, PARTIAL
+    )
+    stats = _ingest(connection, tmp_path, manifest)
+    # the first batch is not read again, the written but unrecorded second one is skipped
+    assert (stats.files, stats.inserted, stats.skipped) == (1, 2, 4)
+    assert _stored(connection) == 10
+    assert manifest.entries()[os.path.abspath(str(path))]["status"] == DONE
+
+
+def test_manifest_records_failed_files(connection, tmp_path):
+    path = tmp_path / "ir_data_0.json"
+    path.write_text(dumps(_documents(10))[:-20])
+    manifest = IngestManifest(connection)
+    stats = _ingest(connection, tmp_path, manifest)
+    assert stats.files == 0
+    entry = manifest.entries()[os.path.abspath(str(path))]
+    assert entry["status"] == FAILED
+    assert entry["documents"] == 8
+    # a failed file is tried again
+    path.write_text(dumps(_documents(10)))
+    stats = _ingest(connection, tmp_path, manifest)
+    assert (stats.files, stats.inserted, stats.skipped) == (1, 2, 8)
+
+
+def test_stored_and_repeated_timestamps_are_skipped(connection, tmp_path):
+    collection = connection.get_collection_by_type(CollectionType.IR_DATA)
+    collection.write_many(_documents(5))
+    # repeated inside a file, across the files and already stored
+    (tmp_path / "ir_data_1.json").write_text(
+        dumps(_documents(10) + _documents(3, 8) + [{"session_id": "s"}])
+    )
+    (tmp_path / "ir_data_2.json").write_text(dumps(_documents(10, 5)))
+    stats = transfer_json_files(
+        connection, str(tmp_path), [CollectionType.IR_DATA], workers=2, batch_size=3
+    )
+    assert (stats.files, stats.inserted, stats.failed) == (2, 11, 0)
+    assert stats.skipped == 5 + 3 + 5
+    timestamps = [
+        d["timestamp"] for d in collection.collection.find({}) if "timestamp" in d
+    ]
+    assert sorted(timestamps) == [d["timestamp"] for d in _documents(15)]
@@ -0,0 +1,66 @@
+from datetime import timedelta
+import pytest
+from dtaidistance import dtw_ndim
+from mongo_db_search.prefetch import grid_size
+from mongo_db_search.resample import resample
+from mongo_db_search.sax_index import SaxIndex
+from mongo_db_search.search import SearchQuery, Searcher
+from mongo_db_search.topk import SearchResult, TopK
+from tests.conftest import FEATURES, START, write_session
+from tests.test_search import RESOLUTION, _has_data
+
+SESSIONS = {"s1": START, "s2": START + timedelta(seconds=90)}
+
+
+def _index_brute_force(connection, query, length, step=1):
+    """Compares every window on the grid of its session with dtaidistance"""
+    seq = resample(query.data_to_search, RESOLUTION)
+    topk = TopK(query.result_size)
+    for session_id in SESSIONS:
+        anchor, settled, end = connection.get_session_extent(session_id, list(FEATURES))
+        rows = (settled - anchor) // RESOLUTION
+        grid_end = anchor + (grid_size(anchor, end, RESOLUTION) - 1) * RESOLUTION
+        data = connection.get_numeric_sensor_data_by_time(
+            anchor, grid_end, FEATURES, session_id
+        )
+        grid = resample(data, RESOLUTION, anchor, grid_end)
+        for row in range(0, rows - length + 2, step):
+            begin = anchor + row * RESOLUTION
+            last = begin + (len(seq) - 1) * RESOLUTION
+            if (
+                begin < query.start
+                or last > query.end
+                or row + len(seq) - 1 > rows
+                or not _has_data(data, begin, last)
+            ):
+                continue
+            distance = dtw_ndim.distance(
+                seq, grid[row : row + len(seq)], window=query.window, use_c=False
+            )
+            topk.push(SearchResult(distance, begin, len(seq) * RESOLUTION, session_id))
+    return topk.results()
+
+
+@pytest.mark.parametrize("arguments", [{}, {"window": 3, "result_size": 10}])
+def test_index_search_matches_brute_force(connection, arguments):
+    for number, (session_id, start) in enumerate(SESSIONS.items()):
+        write_session(connection, 1, session_id, start, number)
+    data = connection.get_numeric_sensor_data_by_time(
+        START + timedelta(seconds=30), START + timedelta(seconds=40), FEATURES
+    )
+    arguments.setdefault("result_size", 5)
+    query = SearchQuery(
+        data, START, START + timedelta(minutes=3), RESOLUTION, **arguments
+    )
+    length = len(resample(query.data_to_search, RESOLUTION))
+    index = SaxIndex(":memory:", FEATURES, RESOLUTION, length, leaf_size=20)
+    assert index.update(connection) > 0
+    assert index.update(connection) == 0
+    results = Searcher(connection, index=index).search(query)
+    expected = _index_brute_force(connection, query, length)
+    assert [(r.start, r.session_id) for r in results] == [
+        (r.start, r.session_id) for r in expected
+    ]
+    assert [r.distance for r in results] == pytest.approx(
+        [r.distance for r in expected], rel=1e-9
+    )
@@ -0,0 +1,151 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import pytest
+from dtaidistance import dtw_ndim
+from mongo_db_search.resample import resample
+from mongo_db_search.search import SearchQuery, Searcher
+from mongo_db_search.topk import SearchResult
+from tests.conftest import FEATURES, START, write_session
+
+RESOLUTION = timedelta(seconds=1)
+END = START + timedelta(seconds=90)
+
+
+def _query(connection, **arguments):
+    write_session(connection)
+    data = connection.get_numeric_sensor_data_by_time(
+        START + timedelta(seconds=30), START + timedelta(seconds=40), FEATURES
+    )
+    arguments.setdefault("result_size", 5)
+    return SearchQuery(data, START, END, RESOLUTION, **arguments)
+
+
+def _has_data(data, begin, end):
+    return all(
+        any(begin <= m["timestamp"] <= end for m in measurements)
+        for measurements in data.values()
+    )
+
+
+def _brute_force(connection, query, session_id=None):
+    """Compares every window of the prefetched grid with dtaidistance"""
+    seq = resample(query.data_to_search, query.interpolation_resolution)
+    step = int(len(seq) / 3) if query.step is None else query.step
+    data = connection.get_numeric_sensor_data_by_time(
+        query.start, query.end, query.selected_features, session_id
+    )
+    grid = resample(data, query.interpolation_resolution, query.start, query.end)
+    results = []
+    for index in range(0, len(grid) - len(seq) + 1, step):
+        begin = query.start + index * query.interpolation_resolution
+        if not _has_data(
+            data, begin, begin + (len(seq) - 1) * query.interpolation_resolution
+        ):
+            continue
+        distance = dtw_ndim.distance(
+            seq, grid[index : index + len(seq)], window=query.window, use_c=False
+        )
+        results.append(
+            SearchResult(
+                distance, begin, len(seq) * query.interpolation_resolution, session_id
+            )
+        )
+    return sorted(results)[: query.result_size]
+
+
+def _fetched_brute_force(connection, query):
+    """Fetches and resamples every window on its own and compares it with dtaidistance"""
+    seq = resample(query.data_to_search, query.interpolation_resolution)
+    step = int(len(seq) / 3) if query.step is None else query.step
+    duration = len(seq) * query.interpolation_resolution
+    results = []
+    begin = query.start
+    while begin < query.end - duration:
+        data = connection.get_numeric_sensor_data_by_time(
+            begin, begin + duration, query.selected_features
+        )
+        if all(len(measurements) > 0 for measurements in data.values()):
+            distance = dtw_ndim.distance(
+                seq,
+                resample(data, query.interpolation_resolution),
+                window=query.window,
+                use_c=False,
+            )
+            results.append(SearchResult(distance, begin, duration))
+        begin += step * query.interpolation_resolution
+    return sorted(results)[: query.result_size]
+
+
+def _assert_same(results, expected):
+    assert len(expected) > 0
+    assert [r.start for r in results] == [r.start for r in expected]
+    assert [r.distance for r in results] == pytest.approx(
+        [r.distance for r in expected], rel=1e-9
+    )
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {},
+        {"step": 1, "window": 3},
+        {"step": 2, "result_size": 20},
+    ],
+)
+def test_fetched_windows_match_brute_force(connection, arguments):
+    query = _query(connection, **arguments)
+    _assert_same(
+        Searcher(connection).search(query), _fetched_brute_force(connection, query)
+    )
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {},
+        {"step": 1},
+        {"step": 1, "chunk_size": None},
+        {"step": 1, "chunk_size": 7},
+        {"step": 3, "chunk_size": 13, "result_size": 20},
+        {"step": 1, "window": 3},
+    ],
+)
+def test_prefetched_windows_match_brute_force(connection, arguments):
+    query = _query(connection, prefetch=True, **arguments)
+    _assert_same(Searcher(connection).search(query), _brute_force(connection, query))
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        {"workers": 2},
+        {"workers": 2, "prune": False, "chunk_size": 13},
+        {"workers": None},
+        {"workers": None, "prune": False, "window": 3},
+    ],
+)
+def test_parallel_search_matches_brute_force(connection, arguments):
+    query = _query(connection, prefetch=True, step=1, **arguments)
+    _assert_same(Searcher(connection).search(query), _brute_force(connection, query))
+
+
+def test_concurrent_searches_share_a_searcher(connection):
+    query = _query(connection, prefetch=True, step=1)
+    queries = [query] + [
+        SearchQuery(
+            query.data_to_search,
+            START + timedelta(seconds=seconds),
+            END,
+            RESOLUTION,
+            step,
+            prefetch=True,
+        )
+        for seconds, step in [(0, 2), (10, 1), (20, 3), (5, 1)]
+    ]
+    searcher = Searcher(connection)
+    expected = [searcher.search(q) for q in queries]
+    with ThreadPoolExecutor(len(queries)) as executor:
+        for _ in range(3):
+            assert list(executor.map(searcher.search, queries)) == expected
+    for q, results in zip(queries, expected):
+        _assert_same(results, _brute_force(connection, q))
@@ -0,0 +1,46 @@
+from datetime import timedelta
+from benchmarks.search_benchmark import (
+    EVENT_DURATION,
+    RECALL_TOLERANCE,
+    recall,
+    run_benchmarks,
+)
+from benchmarks.synthetic import SyntheticDataset
+from mongo_db_search.topk import SearchResult
+from tests.conftest import START
+
+
+def _result(start, distance=0.0):
+    return SearchResult(distance, start, EVENT_DURATION)
+
+
+def test_the_query_window_does_not_count():
+    query = (START, START + EVENT_DURATION)
+    events = [START + timedelta(minutes=1), START + timedelta(minutes=2)]
+    # the query finds itself first, the results overlapping it are dropped
+    results = [
+        _result(START),
+        _result(START + RECALL_TOLERANCE, 1.0),
+        _result(events[0], 2.0),
+        _result(events[1], 3.0),
+    ]
+    assert recall(results, events, query) == 1.0
+    # without the query window the two best results are the query itself
+    assert recall(results, events) == 0.0
+    # only the best len(events) remaining results count
+    assert (
+        recall(results[:3] + [_result(START + timedelta(minutes=5))], events, query)
+        == 0.5
+    )
+    assert recall([_result(START)], events, query) == 0.0
+
+
+def test_run_benchmarks_excludes_the_query_event(connection):
+    dataset = SyntheticDataset(sessions=1, minutes=3, events=2)
+    dataset.load(connection)
+    results = run_benchmarks(
+        connection, dataset, engines=["prefetch"], steps=[1], repeats=1
+    )
+    assert [result["events"] for result in results] == [1]
+    # the second event is found, the query window is not a hit
+    assert results[0]["recall"] == 1.0
@@ -0,0 +1,59 @@
+import copy
+from datetime import timedelta
+from mongo_db_search.search import SearchQuery, Searcher
+from mongo_db_search.topk import TopK
+from tests.conftest import FEATURES, START, write_session
+from tests.test_search import RESOLUTION, _assert_same, _brute_force
+
+SESSIONS = {
+    "s1": START,
+    "s2": START + timedelta(minutes=2),
+    "s3": START + timedelta(minutes=4),
+}
+
+
+def _session_brute_force(connection, query, session_ids):
+    """Brute force inside the extent of every session, merged"""
+    topk = TopK(query.result_size)
+    for session_id in session_ids:
+        data = connection.get_numeric_sensor_data_by_time(
+            START - timedelta(hours=1),
+            START + timedelta(hours=1),
+            query.selected_features,
+            session_id,
+        )
+        first = max(measurements[0]["timestamp"] for measurements in data.values())
+        last = min(measurements[-1]["timestamp"] for measurements in data.values())
+        session_query = copy.copy(query)
+        session_query.start = max(query.start, first)
+        session_query.end = min(query.end, last)
+        if session_query.start < session_query.end:
+            topk.merge(_brute_force(connection, session_query, session_id))
+    return topk.results()
+
+
+def test_session_search_matches_brute_force(connection):
+    for number, (session_id, start) in enumerate(SESSIONS.items()):
+        write_session(connection, 1.5, session_id, start, number)
+    data = connection.get_numeric_sensor_data_by_time(
+        START + timedelta(seconds=30), START + timedelta(seconds=40), FEATURES
+    )
+    # the search range ends in the last session
+    end = START + timedelta(minutes=5)
+    for sessions in ["all", ["s2", "s3"]]:
+        query = SearchQuery(
+            data,
+            START,
+            end,
+            RESOLUTION,
+            1,
+            result_size=6,
+            prefetch=True,
+            sessions=sessions,
+        )
+        results = Searcher(connection).search(query)
+        expected_sessions = list(SESSIONS) if sessions == "all" else sessions
+        expected = _session_brute_force(connection, query, expected_sessions)
+        _assert_same(results, expected)
+        assert [r.session_id for r in results] == [r.session_id for r in expected]
+        assert set(r.session_id for r in results) <= set(expected_sessions)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from dtaidistance import dtw_ndim
+from mongo_db_search import spring
+from mongo_db_search.resample import resample
+from mongo_db_search.search import Searcher
+from mongo_db_search.spring import SpringMatcher
+from tests.test_search import _query
+
+
+def _data(rows=80, length=8, seed=0):
+    rnd = np.random.default_rng(seed)
+    query = rnd.normal(size=(length, 2)).cumsum(axis=0)
+    data = rnd.normal(size=(rows, 2)).cumsum(axis=0)
+    # two noisy copies of the query, one of them stretched; the noise avoids ties,
+    # whose start rows can differ between the kernels
+    data[20 : 20 + 2 * length] = np.repeat(query, 2, axis=0) + rnd.normal(
+        scale=0.1, size=(2 * length, 2)
+    )
+    data[50 : 50 + length] = query + rnd.normal(scale=0.1, size=query.shape)
+    return query, data
+
+
+def _best_subsequence(query, data):
+    """Brute force: the smallest dtw distance of the query to any subsequence"""
+    return min(
+        dtw_ndim.distance(query, data[first : last + 1], use_c=True)
+        for first in range(len(data))
+        for last in range(first, len(data))
+    )
+
+
+def _matches(query, data, blocks):
+    matcher = SpringMatcher(query)
+    matches = []
+    for first in range(0, len(data), blocks):
+        matches += matcher.update(data[first : first + blocks], first)
+    return matches + matcher.finish()
+
+
+@pytest.mark.parametrize("kernel", ["numba", "numpy"])
+def test_matches_against_dtaidistance(kernel, monkeypatch):
+    if kernel == "numpy":
+        monkeypatch.setattr(spring, "numba", None)
+    query, data = _data()
+    matches = _matches(query, data, len(data))
+    assert len(matches) > 0
+    for distance, first, last in matches:
+        assert distance == pytest.approx(
+            dtw_ndim.distance(query, data[first : last + 1], use_c=True), rel=1e-9
+        )
+    # the matches are disjoint and the best one is the best subsequence
+    ranges = sorted((first, last) for _, first, last in matches)
+    assert all(a[1] < b[0] for a, b in zip(ranges, ranges[1:]))
+    assert min(m[0] for m in matches) == pytest.approx(
+        _best_subsequence(query, data), rel=1e-9
+    )
+
+
+def _assert_same(matches, expected):
+    assert [m[1:] for m in matches] == [m[1:] for m in expected]
+    assert [m[0] for m in matches] == pytest.approx([m[0] for m in expected])
+
+
+def test_blocks_and_kernels_give_the_same_matches(monkeypatch):
+    query, data = _data(seed=1)
+    expected = _matches(query, data, len(data))
+    for blocks in [1, 7, 33]:
+        _assert_same(_matches(query, data, blocks), expected)
+    monkeypatch.setattr(spring, "numba", None)
+    for blocks in [1, 7, len(data)]:
+        _assert_same(_matches(query, data, blocks), expected)
+
+
+def test_spring_search_finds_the_best_subsequence(connection):
+    query = _query(connection, mode="spring", chunk_size=13)
+    results = Searcher(connection).search(query)
+    seq = resample(query.data_to_search, query.interpolation_resolution)
+    data = connection.get_numeric_sensor_data_by_time(
+        query.start, query.end, query.selected_features
+    )
+    grid = resample(data, query.interpolation_resolution, query.start, query.end)
+    assert results[0].distance == pytest.approx(_best_subsequence(seq, grid), rel=1e-9)
+    for result in results:
+        first = (result.start - query.start) // query.interpolation_resolution
+        rows = result.length // query.interpolation_resolution
+        assert result.distance == pytest.approx(
+            dtw_ndim.distance(seq, grid[first : first + rows], use_c=True), rel=1e-9
+        )
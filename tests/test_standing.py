@@ -0,0 +1,97 @@
+from datetime import timedelta
+from benchmarks.synthetic import EVENT_DURATION, SyntheticDataset
+from mongo_db.mongodb_connection import CollectionType
+from mongo_db_search import standing
+from mongo_db_search.standing import StandingQueries
+
+FEATURES = {
+    CollectionType.IR_DATA: ["ir_front_left", "ir_front_right", "timestamp"],
+    CollectionType.MPU_DATA: ["gyro_z_angle", "acc_x_axis", "timestamp"],
+}
+
+RESOLUTION = timedelta(seconds=1)
+
+# distance of the events to the query, the other windows are above 500
+THRESHOLD = 400.0
+
+
+def _load(connection, dataset, session):
+    for c_type, measurements in dataset.generate(session).items():
+        if c_type in FEATURES:
+            connection.get_collection_by_type(c_type).write_many(measurements)
+
+
+def _query(dataset):
+    """The first event of the first session as data_to_search"""
+    data = dataset.generate(0)
+    event = dataset.events[0]
+    return {
+        c_type: [
+            {key: m[key] for key in FEATURES[c_type]}
+            for m in data[c_type]
+            if event <= m["timestamp"] <= event + EVENT_DURATION
+        ]
+        for c_type in FEATURES
+    }
+
+
+def _event_starts(matches, dataset):
+    return sorted(
+        event
+        for event in dataset.events
+        if any(abs(match.start - event) <= EVENT_DURATION / 4 for match in matches)
+    )
+
+
+def test_late_upload_of_an_older_session_is_evaluated(connection, monkeypatch):
+    monkeypatch.setattr(standing, "INGEST_LAG", timedelta(0))
+    dataset = SyntheticDataset(sessions=2, minutes=3, events=2)
+    queries = StandingQueries(connection)
+    queries.register(
+        "event", _query(dataset), RESOLUTION, dataset.start, THRESHOLD, step=1
+    )
+    # the newer session is uploaded first
+    _load(connection, dataset, 1)
+    queries.evaluate()
+    assert _event_starts(queries.get_matches("event"), dataset) == dataset.events[2:]
+    _load(connection, dataset, 0)
+    queries.evaluate()
+    assert _event_starts(queries.get_matches("event"), dataset) == dataset.events
+    # nothing new is inserted, nothing is searched
+    assert queries.evaluate() == 0
+
+
+def test_matches_are_not_capped_with_a_threshold(connection):
+    dataset = SyntheticDataset(sessions=2, minutes=3, events=2)
+    _load(connection, dataset, 0)
+    _load(connection, dataset, 1)
+    queries = StandingQueries(connection)
+    queries.register(
+        "event",
+        _query(dataset),
+        RESOLUTION,
+        dataset.start,
+        THRESHOLD,
+        result_size=1,
+        step=1,
+    )
+    queries.evaluate()
+    assert _event_starts(queries.get_matches("event"), dataset) == dataset.events
+
+
+def test_overlapping_matches_keep_the_better_one(connection):
+    dataset = SyntheticDataset(sessions=1, minutes=3, events=2)
+    _load(connection, dataset, 0)
+    queries = StandingQueries(connection)
+    queries.register(
+        "event", _query(dataset), RESOLUTION, dataset.start, THRESHOLD, step=1
+    )
+    assert queries.evaluate() == len(dataset.events)
+    matches = queries.get_matches("event")
+    # search everything again with windows shifted against the first evaluation
+    queries.queries.update_one(
+        {"name": "event"},
+        {"$set": {"ingested_until": None, "start": dataset.start + RESOLUTION / 2}},
+    )
+    assert queries.evaluate() == 0
+    assert queries.get_matches("event") == matches
@@ -0,0 +1,59 @@
+import random
+from datetime import timedelta
+from mongo_db_search.topk import SearchResult, TopK
+from tests.conftest import START
+
+LENGTH = timedelta(seconds=10)
+
+
+def _results(count, seed=0, distances=100):
+    rnd = random.Random(seed)
+    return [
+        SearchResult(
+            float(rnd.randrange(distances)), START + timedelta(seconds=number), LENGTH
+        )
+        for number in range(count)
+    ]
+
+
+def test_same_results_as_sorting():
+    results = _results(200)
+    for size in [1, 5, 50, 300]:
+        top = TopK(size)
+        top.merge(random.Random(size).sample(results, len(results)))
+        assert top.results() == sorted(results)[:size]
+
+
+def test_threshold():
+    top = TopK(3)
+    top.merge(_results(2))
+    assert top.threshold == float("inf")
+    top.merge(_results(20))
+    assert top.threshold == top.results()[2].distance
+    assert not top.push(SearchResult(top.threshold + 1, START, LENGTH))
+
+
+def test_keep_ties():
+    results = _results(100, distances=5)
+    top = TopK(3, keep_ties=True)
+    top.merge(results)
+    last = sorted(results)[2].distance
+    assert top.results() == sorted(r for r in results if r.distance <= last)
+
+
+def test_suppress_overlap():
+    results = _results(200)
+    top = TopK(5, suppress_overlap=True)
+    top.merge(sorted(results))
+    # greedy reference: the best results that do not overlap a better kept result
+    expected = []
+    for result in sorted(results):
+        if len(expected) < 5 and not any(r.overlaps(result) for r in expected):
+            expected.append(result)
+    assert top.results() == expected
+    # in any order the kept results do not overlap each other
+    top = top.empty()
+    top.merge(results)
+    kept = top.results()
+    assert len(kept) == 5
+    assert not any(a.overlaps(b) for a in kept for b in kept if a is not b)